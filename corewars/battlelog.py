@@ -0,0 +1,252 @@
+"""
+Append-only log of head-to-head round results, stored column by column in NumPy files,
+so that the history of a hill can be analysed without re-running any battles.
+
+Directory layout:
+    index.json              hashes of all warriors (a warrior's ID is its position) and the list
+                            of chunks, with IDs of the warriors and pairings each one contains
+    <chunk>/<column>.npy    one array per column, rows sorted by pairing
+    <chunk>/pairing_keys.npy, pairing_starts.npy
+                            sorted pairings in the chunk and the first row of each one
+    <chunk>/warrior_ids.npy, warrior_starts.npy, warrior_rows.npy
+                            rows of each warrior in the chunk (CSR layout)
+
+Rows are kept in memory until chunk_size of them are collected (or flush() is called), chunks
+are never modified once written. Queries only open chunks containing the requested warriors,
+memory-map their columns and read just the rows of the requested pairing.
+Chunks are named chunk-<n>-<random suffix> and only those listed in the index are part of the log,
+so a chunk left behind by a crash before the index was updated is ignored, never overwritten.
+"""
+import json
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from corewars.mars import RoundResult
+
+
+COLUMNS = {
+    # order in which the rounds were appended
+    'round': np.int64,
+    # warrior IDs, in the order the warriors were loaded in
+    'first': np.int32,
+    'second': np.int32,
+    'seed': np.uint64,
+    'first_offset': np.int32,
+    'second_offset': np.int32,
+    # warrior ID, -1 for a tie
+    'winner': np.int32,
+    'cycles': np.int32,
+    # -1 if the warrior survived
+    'first_death': np.int32,
+    'second_death': np.int32,
+}
+TIE = -1
+INDEX = 'index.json'
+
+
+def pairing_key(first: int, second: int) -> int:
+    "Key of a pairing of two warrior IDs, regardless of their order."
+    return min(first, second) << 32 | max(first, second)
+
+
+class BattleLog():
+    "Round results of a hill or tournament in the directory, reopened with all rounds logged so far."
+    def __init__(self, directory: str, chunk_size: int = 65536):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self.hashes: List[str] = []
+        self._chunks: List[dict] = []
+        path = os.path.join(directory, INDEX)
+        if os.path.exists(path):
+            with open(path) as file:
+                index = json.load(file)
+            self.hashes = index['warriors']
+            self._chunks = index['chunks']
+        self._ids = {warrior: i for i, warrior in enumerate(self.hashes)}
+        # sets of warrior IDs and pairings of each chunk, used to skip chunks
+        self._contents = [(set(chunk['warriors']), set(chunk['pairings'])) for chunk in self._chunks]
+        # memory-mapped arrays of opened chunks
+        self._loaded: Dict[str, Dict[str, np.ndarray]] = {}
+        self._buffer: Dict[str, list] = {name: [] for name in COLUMNS}
+        self._rounds = sum(chunk['rows'] for chunk in self._chunks)
+
+
+    def __len__(self):
+        "Number of logged rounds."
+        return self._rounds
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+    def warrior_id(self, warrior: str) -> Optional[int]:
+        "ID of the warrior with the given hash, None if it hasn't played any logged round."
+        return self._ids.get(warrior)
+
+
+    def append(
+        self, warriors: Tuple[str, str], seed: int, offsets: Tuple[int, int], winner: Optional[int],
+        cycles: int, deaths: Tuple[Optional[int], Optional[int]]
+    ):
+        """
+        Logs a round between two warriors (given by their hashes, in the order they were loaded in).
+        Winner is the index (0 or 1) of the warrior which won, None in case of a tie,
+        deaths are cycles in which the warriors died (None for the survivors).
+        """
+        ids = [self._register(warrior) for warrior in warriors]
+        row = {
+            'round': self._rounds,
+            'first': ids[0],
+            'second': ids[1],
+            'seed': seed,
+            'first_offset': offsets[0],
+            'second_offset': offsets[1],
+            'winner': TIE if winner is None else ids[winner],
+            'cycles': cycles,
+            'first_death': -1 if deaths[0] is None else deaths[0],
+            'second_death': -1 if deaths[1] is None else deaths[1],
+        }
+        for name, value in row.items():
+            self._buffer[name].append(value)
+        self._rounds += 1
+        if len(self._buffer['round']) >= self.chunk_size:
+            self.flush()
+
+
+    def append_result(self, warriors: Tuple[str, str], seed: int, result: RoundResult):
+        "Logs a round from its RoundResult - its warriors have to be loaded by MARS.load_warriors()."
+        first, second = result.warriors
+        winner = None if result.winner is None else result.winner.index
+        self.append(warriors, seed, (first.start_address, second.start_address), winner,
+                    result.cycles, (first.death_cycle, second.death_cycle))
+
+
+    def flush(self):
+        "Writes rounds kept in memory into a new chunk."
+        count = len(self._buffer['round'])
+        if count == 0:
+            return
+        columns = {name: np.array(values, dtype=COLUMNS[name]) for name, values in self._buffer.items()}
+        keys = (np.minimum(columns['first'], columns['second']).astype(np.int64) << 32
+                | np.maximum(columns['first'], columns['second']))
+        # stable, so that rounds of a pairing stay in the order they were played in
+        order = np.argsort(keys, kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+        keys = keys[order]
+        pairing_keys, pairing_starts = np.unique(keys, return_index=True)
+        participants = np.concatenate([columns['first'], columns['second']])
+        rows = np.concatenate([np.arange(count), np.arange(count)])
+        order = np.lexsort((rows, participants))
+        warrior_ids, warrior_starts = np.unique(participants[order], return_index=True)
+        arrays = dict(columns)
+        arrays['pairing_keys'] = pairing_keys
+        arrays['pairing_starts'] = np.append(pairing_starts, count)
+        arrays['warrior_ids'] = warrior_ids
+        arrays['warrior_starts'] = np.append(warrior_starts, 2 * count)
+        arrays['warrior_rows'] = rows[order].astype(np.int64)
+        name = f'chunk-{len(self._chunks):06d}-{uuid.uuid4().hex[:12]}'
+        # written under a temporary name, so that readers never see incomplete chunks
+        temporary = os.path.join(self.directory, f'{name}.tmp')
+        os.makedirs(temporary)
+        for array_name, values in arrays.items():
+            np.save(os.path.join(temporary, f'{array_name}.npy'), values)
+        os.rename(temporary, os.path.join(self.directory, name))
+        chunk = {
+            'name': name,
+            'rows': count,
+            'warriors': warrior_ids.tolist(),
+            'pairings': pairing_keys.tolist(),
+        }
+        self._chunks.append(chunk)
+        self._contents.append((set(chunk['warriors']), set(chunk['pairings'])))
+        self._buffer = {name: [] for name in COLUMNS}
+        self._write_index()
+
+
+    def query(
+        self, warrior: Optional[str] = None, opponent: Optional[str] = None,
+        winner: Optional[str] = None, tie: bool = False, max_cycles: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Returns columns of the rounds played by the warrior (against the opponent, if given),
+        in the order they were logged. Rounds can be further limited to those won by the given
+        warrior (or ties only) and to those which ended in less than max_cycles cycles.
+        E.g. all rounds where X lost to Y in under 5000 cycles: query(X, Y, winner=Y, max_cycles=5000).
+        Warriors are given by hashes, but columns contain their IDs (see hashes).
+        """
+        ids = [self.warrior_id(hash_) for hash_ in (warrior, opponent) if hash_ is not None]
+        if None in ids or (winner is not None and self.warrior_id(winner) is None):
+            return _empty()
+        key = pairing_key(*ids) if len(ids) == 2 else None
+        parts = []
+        for chunk, (warriors, pairings) in zip(self._chunks, self._contents):
+            if (key is not None and key not in pairings) or (ids and ids[0] not in warriors):
+                continue
+            arrays = self._load(chunk['name'])
+            rows = _chunk_rows(arrays, ids, key)
+            parts.append({name: arrays[name][rows] for name in COLUMNS})
+        buffer = {name: np.array(values, dtype=COLUMNS[name]) for name, values in self._buffer.items()}
+        if ids:
+            mask = (buffer['first'] == ids[-1]) | (buffer['second'] == ids[-1])
+            if len(ids) == 2:
+                mask &= (buffer['first'] == ids[0]) | (buffer['second'] == ids[0])
+            buffer = {name: values[mask] for name, values in buffer.items()}
+        parts.append(buffer)
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+        mask = np.ones(len(columns['round']), dtype=bool)
+        if winner is not None:
+            mask &= columns['winner'] == self.warrior_id(winner)
+        if tie:
+            mask &= columns['winner'] == TIE
+        if max_cycles is not None:
+            mask &= columns['cycles'] < max_cycles
+        order = np.argsort(columns['round'][mask], kind='stable')
+        return {name: values[mask][order] for name, values in columns.items()}
+
+
+    def _register(self, warrior: str) -> int:
+        if warrior not in self._ids:
+            self._ids[warrior] = len(self.hashes)
+            self.hashes.append(warrior)
+        return self._ids[warrior]
+
+
+    def _load(self, name: str) -> Dict[str, np.ndarray]:
+        if name not in self._loaded:
+            directory = os.path.join(self.directory, name)
+            self._loaded[name] = {
+                file[:-len('.npy')]: np.load(os.path.join(directory, file), mmap_mode='r')
+                for file in os.listdir(directory)
+            }
+        return self._loaded[name]
+
+
+    def _write_index(self):
+        path = os.path.join(self.directory, INDEX)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump({'warriors': self.hashes, 'chunks': self._chunks}, file)
+        os.replace(f'{path}.tmp', path)
+
+
+def _chunk_rows(arrays: Dict[str, np.ndarray], ids: List[int], key: Optional[int]):
+    "Rows of the chunk with the given pairing, or of the given warrior, or all of them."
+    if key is not None:
+        position = np.searchsorted(arrays['pairing_keys'], key)
+        return slice(int(arrays['pairing_starts'][position]), int(arrays['pairing_starts'][position + 1]))
+    if ids:
+        position = np.searchsorted(arrays['warrior_ids'], ids[0])
+        start, end = arrays['warrior_starts'][position], arrays['warrior_starts'][position + 1]
+        # a warrior playing against itself has each of its rows listed twice
+        return np.unique(arrays['warrior_rows'][start:end])
+    return slice(None)
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from random import Random
+from typing import Callable, List, Optional, Sequence, Tuple
+from corewars.mars import MARS
+from corewars.redcode import (
+    AddressingMode, Instruction, Modifier, OpCode, Warrior, pack_instruction, unpack_instruction
+)
+
+
+# complete state of a simulation: cycle count, packed cells, then (warrior index, processes) in turn order
+State = Tuple
+
+
+@dataclass
+class Divergence():
+    "First cycle after which the candidate engine stopped matching the reference one."
+    cycle: int
+    warriors: List[Warrior]
+    addresses: List[int]
+    reference: State
+    candidate: State
+
+
+    def describe(self) -> str:
+        "Returns a short human-readable description of the first difference between both states."
+        reference, candidate = self.reference, self.candidate
+        if reference[0] != candidate[0]:
+            return f'cycle {self.cycle}: cycle counters differ ({reference[0]} != {candidate[0]})'
+        if reference[1] != candidate[1]:
+            for address, (expected, actual) in enumerate(zip(reference[1], candidate[1])):
+                if expected != actual:
+                    return f'cycle {self.cycle}: cell {address} differs ({_format(expected)} != {_format(actual)})'
+        return f'cycle {self.cycle}: process queues differ ({reference[2]} != {candidate[2]})'
+
+
+def snapshot(engine) -> State:
+    "Captures everything which has to match between two engines after the same number of cycles."
+    cells = tuple(pack_instruction(cell) for cell in engine.core)
+    queues = tuple((warrior.index, warrior.processes) for warrior in engine.core.turn_order)
+    return (engine.cycles, cells, queues)
+
+
+def random_instruction(rng: Random, core_size: int) -> Instruction:
+    "Returns a random instruction - any OpCode, Modifier and AddressingModes are possible."
+    return Instruction(
+        rng.choice(list(OpCode)),
+        rng.choice(list(Modifier)),
+        _random_value(rng, core_size),
+        rng.choice(list(AddressingMode)),
+        _random_value(rng, core_size),
+        rng.choice(list(AddressingMode))
+    )
+
+
+def random_warrior(rng: Random, core_size: int, length: int, name: str = 'Soup') -> Warrior:
+    "Returns a warrior made up of random instructions ('instruction soup')."
+    return Warrior(name, [random_instruction(rng, core_size) for _ in range(length)])
+
+
+class ConformanceHarness():
+    """
+    Runs a candidate engine side by side with the reference MARS and compares their complete state
+    (all cells and process queues) every checkpoint_interval cycles. Once they differ, the first
+    diverging cycle is found by bisection, replaying both engines from the start.
+    Engines are created by the given factories and have to expose MARS' core, cycles and cycle(),
+    or advance(cycle) running until the given cycle (or until no warriors are left).
+    Warriors are loaded at explicit addresses, so that both engines start from identical states.
+    """
+    def __init__(
+        self, candidate_factory: Callable, reference_factory: Callable = MARS,
+        checkpoint_interval: int = 100
+    ):
+        self.candidate_factory = candidate_factory
+        self.reference_factory = reference_factory
+        self.checkpoint_interval = checkpoint_interval
+
+
+    def compare(self, warriors: List[Warrior], addresses: List[int], max_cycles: int) -> Optional[Divergence]:
+        """
+        Simulates the given warriors with both engines for up to max_cycles cycles
+        (or until no warriors are left). Returns None if the engines agree the whole time.
+        """
+        reference = self._load(self.reference_factory, warriors, addresses)
+        candidate = self._load(self.candidate_factory, warriors, addresses)
+        last_matching = 0
+        cycle = 0
+        while cycle < max_cycles and reference.core.warriors_count > 0:
+            cycle = min(cycle + self.checkpoint_interval, max_cycles)
+            _advance(reference, cycle)
+            _advance(candidate, cycle)
+            if snapshot(reference) != snapshot(candidate):
+                return self._bisect(warriors, addresses, last_matching, cycle)
+            last_matching = cycle
+        if candidate.core.warriors_count != reference.core.warriors_count:
+            return self._bisect(warriors, addresses, last_matching, cycle)
+        return None
+
+
+    def fuzz(
+        self, rounds: int, seed: int = 0, max_cycles: int = 1000, warriors_per_round: int = 2,
+        max_length: int = 20, corpus: Sequence[Warrior] = ()
+    ) -> List[Divergence]:
+        """
+        Compares both engines on the given number of rounds of randomly generated warriors,
+        mixed with warriors from the corpus (if provided), placed at random addresses.
+        """
+        rng = Random(seed)
+        divergences = []
+        core_size = self.reference_factory().core.size
+        for _ in range(rounds):
+            warriors = []
+            for i in range(warriors_per_round):
+                if corpus and rng.random() < 0.5:
+                    warriors.append(rng.choice(corpus))
+                else:
+                    warriors.append(random_warrior(rng, core_size, rng.randint(1, max_length), f'Soup {i}'))
+            addresses = [rng.randrange(core_size) for _ in warriors]
+            divergence = self.compare(warriors, addresses, max_cycles)
+            if divergence:
+                divergences.append(divergence)
+        return divergences
+
+
+    def _bisect(self, warriors: List[Warrior], addresses: List[int], matching: int, diverged: int) -> Divergence:
+        "Narrows down (matching, diverged] to the first cycle after which the states differ."
+        while diverged - matching > 1:
+            middle = (matching + diverged) // 2
+            reference, candidate = self._replay(warriors, addresses, middle)
+            if snapshot(reference) == snapshot(candidate):
+                matching = middle
+            else:
+                diverged = middle
+        reference, candidate = self._replay(warriors, addresses, diverged)
+        return Divergence(diverged, warriors, addresses, snapshot(reference), snapshot(candidate))
+
+
+    def _replay(self, warriors: List[Warrior], addresses: List[int], cycle: int):
+        reference = self._load(self.reference_factory, warriors, addresses)
+        candidate = self._load(self.candidate_factory, warriors, addresses)
+        _advance(reference, cycle)
+        _advance(candidate, cycle)
+        return reference, candidate
+
+
+    @staticmethod
+    def _load(factory: Callable, warriors: List[Warrior], addresses: List[int]):
+        engine = factory()
+        for index, (warrior, address) in enumerate(zip(warriors, addresses)):
+            engine.core.load_warrior(warrior, address).index = index
+        return engine
+
+
+def _advance(engine, cycle: int):
+    "Runs the engine until it reaches the given cycle (or runs out of warriors)."
+    if hasattr(engine, 'advance'):
+        # engines executing several cycles at once get compared that way
+        engine.advance(cycle)
+        return
+    while engine.cycles < cycle and engine.core.warriors_count > 0:
+        engine.cycle()
+
+
+def _random_value(rng: Random, core_size: int) -> int:
+    # mostly small offsets, so that warriors interact with their own code
+    if rng.random() < 0.7:
+        return rng.randint(-10, 10)
+    return rng.randrange(core_size)
+
+
+def _format(cell: int) -> str:
+    return str(unpack_instruction(cell))
@@ -1,69 +1,176 @@
-from dataclasses import field
-from typing import List, Tuple
-from random import sample
-from corewars.redcode import AddressingMode, Instruction, Modifier, OpCode, Warrior
+from collections import deque
+from colorsys import hsv_to_rgb
+from typing import Deque, List, Optional, Set, Tuple
+import random
+from random import Random
+from corewars.redcode import AddressingMode, Instruction, Modifier, OpCode, Warrior, pack_instruction
+from corewars.shared import SharedCoreBuffer
+from corewars.timeline import Timeline
+from corewars.undo import CONTINUED, SPLIT
 
 
 def default_dat():
     return Instruction(OpCode.DAT, Modifier.F, 0, AddressingMode('$'), 0, AddressingMode('$'))
 
 
+def generate_palette(count: int, offset: int = 0) -> List[Tuple[int, int, int]]:
+    """
+    Generates the given number of colours spread evenly around the colour wheel
+    (golden ratio hue steps), so that any number of warriors can be told apart.
+    Offset skips the given number of colours at the beginning of the sequence.
+    """
+    colors = []
+    for i in range(offset, offset + count):
+        hue = (i * 0.618033988749895) % 1
+        # vary saturation and brightness a bit once hues start getting close to each other
+        saturation = 0.75 - 0.25 * ((i // 8) % 2)
+        value = 0.95 - 0.2 * ((i // 16) % 2)
+        red, green, blue = hsv_to_rgb(hue, saturation, value)
+        colors.append((int(red * 255), int(green * 255), int(blue * 255)))
+    return colors
+
+
 class Core():
-    def __init__(self, size=8000):
+    """
+    Cyclic memory of the simulator.
+    With shared=True cell contents are additionally mirrored into a shared memory block
+    (see corewars.shared for its layout), which other processes can attach to
+    with a SharedCoreView using the shared_memory_name of this Core.
+    """
+    def __init__(self, size=8000, shared=False):
         self.size = size
+        self._shared: Optional[SharedCoreBuffer] = SharedCoreBuffer(size) if shared else None
         self._instructions: List[CoreInstruction]
-        self._warriors: List[CoreWarrior]
-        self._warrior_index: int
+        # scheduler - the warrior currently taking its turn is always the first one
+        self._warriors: Deque[CoreWarrior]
+        # all warriors in the order they were loaded in
+        self._loaded_warriors: List[CoreWarrior]
         self._dead_warriors: List[CoreWarrior]
+        # addresses (not necessarily normalized) of cells changed since the last clear() or reset()
+        self._dirty: Set[int]
+        # warriors of previous rounds, reused by load_warrior()
+        self._warrior_pool: List[CoreWarrior] = []
+        # default instruction shared by cells which haven't been accessed yet, None in a shared Core
+        self._blank: Optional[FrozenCoreInstruction]
         self.clear()
 
 
     def clear(self, default_instruction=default_dat()):
         "Fills core with default instruction (DAT 0,0 unless different is provided)."
-        self._instructions = []
-        for _ in range(self.size):
-            self._instructions.append(CoreInstruction(self, default_instruction))
-        self._warriors = []
-        self._warrior_index = 0
+        self._default_instruction = default_instruction
+        if self._shared:
+            self._blank = None
+            self._instructions = []
+            for address in range(self.size):
+                self._instructions.append(self._create_instruction(default_instruction, address))
+        else:
+            # cells which haven't been accessed yet all share a single frozen instance of the default
+            # instruction, __getitem__ replaces it with a cell of their own (see _materialize())
+            self._blank = FrozenCoreInstruction(self, default_instruction)
+            self._instructions = [self._blank] * self.size
+        self._dirty = set()
+        self._warriors = deque()
+        self._loaded_warriors = []
+        self._dead_warriors = []
+
+
+    def reset(self):
+        """
+        Prepares the Core for a new round - restores cells changed since the last clear()/reset()
+        to the default instruction and removes all warriors, in time proportional to the number
+        of changed cells rather than the core size. Cells are released back to the shared default
+        (a shared Core restores them in place instead). CoreWarriors of the finished round are reused
+        by following load_warrior() calls, so they shouldn't be kept around after a reset.
+        """
+        if self._blank is not None:
+            for address in self._dirty:
+                self._instructions[address % self.size] = self._blank
+        else:
+            default = self._default_instruction
+            for address in self._dirty:
+                cell = self._instructions[address % self.size]
+                cell.op_code = default.op_code
+                cell.modifier = default.modifier
+                cell.a_mode = default.a_mode
+                cell.b_mode = default.b_mode
+                cell.a_value = default.a_value
+                cell.b_value = default.b_value
+        self._dirty = set()
+        self._warrior_pool += self._loaded_warriors
+        self._warriors = deque()
+        self._loaded_warriors = []
         self._dead_warriors = []
 
 
+    def mark_dirty(self, addresses: List[int]):
+        """
+        Notes cells modified in place (through their fields), so that reset() restores them.
+        Cells assigned with core[address] = ... are tracked automatically.
+        """
+        self._dirty.update(addresses)
+
+
     def load_warrior(self, warrior: Warrior, address: int):
         """
         Loads all instructions of the given Warrior into the Core
-        starting at the given address.
+        starting at the given address. Returns the created CoreWarrior.
         """
         # create initial process for the given warrior
-        core_warrior = CoreWarrior(self, warrior.name, address)
+        if self._warrior_pool:
+            core_warrior = self._warrior_pool.pop()
+            core_warrior.reset(warrior.name, address)
+        else:
+            core_warrior = CoreWarrior(self, warrior.name, address)
+        core_warrior.source = warrior
         self._warriors.append(core_warrior)
+        self._loaded_warriors.append(core_warrior)
         # load warrior's instructions into core
         for i, instruction in enumerate(warrior.instructions):
             core_instruction = CoreInstruction(self, instruction)
             self[address + i] = core_instruction
+        return core_warrior
 
 
     def rotate_warrior(self):
         """
         Rotates current warrior's process if it has any left, otherwise removes the warrior.
         Changes the 'active' warrior to the next one on the list.
+        Both cases take constant time regardless of the number of warriors.
         """
-        if len(self.current_warrior) == 0:
-            self._remove_current_warrior()
+        warrior = self._warriors[0]
+        if len(warrior) == 0:
+            # the next warrior moves to the front by itself
+            self._dead_warriors.append(self._warriors.popleft())
         else:
-            self.current_warrior.next_process()
-        if len(self._warriors) == 0:
-            self._warrior_index = 0
+            warrior.next_process()
+            self._warriors.rotate(-1)
+
+
+    def rewind_turn(self, warrior: 'CoreWarrior'):
+        """
+        Reverts rotate_warrior() called at the end of the given warrior's turn,
+        bringing it back to life if it was removed. Used by the UndoLog.
+        """
+        if len(warrior) == 0:
+            self._dead_warriors.pop()
+            self._warriors.appendleft(warrior)
+            warrior.death_cycle = None
         else:
-            self._warrior_index = (self._warrior_index + 1) % len(self._warriors)
+            self._warriors.rotate(1)
 
 
-    def assign_colors(self, colors: List[Tuple[int, int, int]]):
+    def assign_colors(self, colors: Optional[List[Tuple[int, int, int]]] = None, rng: Optional[Random] = None):
         """
         Assigns one unique colour to each Warrior present in the Core.
         Used for the visual representation of what happends during the battle.
+        If there are more warriors than provided colours, the rest is generated.
+        Colours are shuffled with the given Random (e.g. MARS.rng), the global random module by default.
         """
-        shuffled_colors = sample(colors, len(colors))
-        for warrior in self._warriors:
+        colors = list(colors or [])
+        if len(colors) < len(self._loaded_warriors):
+            colors += generate_palette(len(self._loaded_warriors) - len(colors), len(colors))
+        shuffled_colors = (rng or random).sample(colors, len(colors))
+        for warrior in self._loaded_warriors:
             warrior.color = shuffled_colors.pop()
 
 
@@ -71,7 +178,7 @@ class Core():
     def current_warrior(self):
         if len(self._warriors) == 0:
             return None
-        return self._warriors[self._warrior_index]
+        return self._warriors[0]
 
 
     @property
@@ -79,10 +186,16 @@ class Core():
         return len(self._warriors)
 
 
-    # only used for 'leaderboard' display purposes
+    @property
+    def turn_order(self) -> List['CoreWarrior']:
+        "Alive warriors in the order of their upcoming turns, starting with the current one."
+        return list(self._warriors)
+
+
+    # only used for 'leaderboard' display purposes - alive warriors in the order they were loaded
     @property
     def warriors(self):
-        return self._warriors
+        return [warrior for warrior in self._loaded_warriors if len(warrior) > 0]
 
 
     @property
@@ -90,6 +203,19 @@ class Core():
         return self._dead_warriors
 
 
+    @property
+    def shared_memory_name(self) -> Optional[str]:
+        "Name of the shared memory block holding this Core's cells (None if it isn't shared)."
+        return self._shared.name if self._shared else None
+
+
+    def close(self):
+        "Releases (and unlinks) the shared memory block of this Core, if it has one."
+        if self._shared:
+            self._shared.close()
+            self._shared = None
+
+
     def normalize_value(self, value: int) -> int:
         "Returns a value converted into the range [0 - coreSize-1]"
         if value >= 0:
@@ -99,23 +225,9 @@ class Core():
         return value
 
 
-    def _remove_current_warrior(self):
-        """
-        Rremoves the current warrior from the core.
-        Requires next_warrior() to be called afterwards to ensure proper behaviour.
-        """
-        self._dead_warriors.append(self._warriors[self._warrior_index])
-        self._warriors.remove(self._warriors[self._warrior_index])
-        # in most cases switch backwards (turn_next() will correctly jump to next process afterwards)
-        if self._warrior_index != 0:
-            self._warrior_index -= 1
-        # removing first process - switch to the last one so that turn_next() will circle back to the beginning
-        else:
-            self._warrior_index = len(self._warriors) - 1
-
-
     def __getitem__(self, key):
         if isinstance(key, slice):
+            # read-only, like iteration - cells which haven't been accessed yet can't be changed this way
             start = 0 if key.start is None else key.start
             stop = self.size if key.stop is None else key.stop
             if start > stop:
@@ -123,17 +235,39 @@ class Core():
             else:
                 return self._instructions[start:stop]
         else:
-            return self._instructions[key % self.size]
+            address = key % self.size
+            cell = self._instructions[address]
+            if cell is self._blank:
+                cell = self._materialize(address)
+            return cell
 
 
     def __setitem__(self, key, value):
-        self._instructions[key % self.size] = value
+        address = key % self.size
+        if self._shared:
+            value = self._create_instruction(value, address)
+        self._instructions[address] = value
+        self._dirty.add(address)
+
+
+    def _create_instruction(self, instruction: Instruction, address: int):
+        if self._shared:
+            return SharedCoreInstruction(self, instruction, address)
+        return CoreInstruction(self, instruction)
 
 
     def __iter__(self):
+        # read-only - cells which haven't been accessed yet are all the same frozen instance
         return iter(self._instructions)
 
 
+    def _materialize(self, address: int) -> 'CoreInstruction':
+        # the cell might be changed through its fields, reset() gives it back to the shared default
+        cell = self._instructions[address] = CoreInstruction(self, self._default_instruction)
+        self._dirty.add(address)
+        return cell
+
+
 
 class CoreInstruction(Instruction):
     """
@@ -141,8 +275,7 @@ class CoreInstruction(Instruction):
     Takes the core size into consideration when handling A/B values
     to make sure they stay in the [0 - coreSize-1] range.
     """
-    _a_value = field(init=False, repr=False)
-    _b_value = field(init=False, repr=False)
+    __slots__ = ('_core', '_a_value', '_b_value')
 
 
     def __init__(self, core: Core, instruction: Instruction):
@@ -155,6 +288,19 @@ class CoreInstruction(Instruction):
         self.b_mode = instruction.b_mode
 
 
+    def __copy__(self):
+        # much faster than the generic copy() - instructions are copied into registers every cycle
+        copied = CoreInstruction.__new__(CoreInstruction)
+        copied._core = self._core
+        copied.op_code = self.op_code
+        copied.modifier = self.modifier
+        copied.a_mode = self.a_mode
+        copied.b_mode = self.b_mode
+        copied._a_value = self._a_value
+        copied._b_value = self._b_value
+        return copied
+
+
     @property
     def a_value(self) -> int:
         return self._a_value
@@ -175,17 +321,96 @@ class CoreInstruction(Instruction):
         self._b_value = self._core.normalize_value(value)
 
 
+class SharedCoreInstruction(CoreInstruction):
+    """
+    CoreInstruction of a shared Core - every change of its fields
+    is written through to the Core's shared memory block.
+    Reads aren't affected, so the simulation itself runs at full speed.
+    """
+    __slots__ = ('_address',)
+    _FIELDS = ('op_code', 'modifier', 'a_value', 'a_mode', 'b_value', 'b_mode')
+
+
+    def __init__(self, core: Core, instruction: Instruction, address: int):
+        # a new cell is written to shared memory all at once, not field by field
+        self._address = None
+        super().__init__(core, instruction)
+        self._address = address
+        core._shared.store(address, self)
+
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self._FIELDS and self._address is not None and self._core._shared:
+            # read the value back - A/B values get normalized by the setters
+            self._core._shared.store_field(self._address, name, getattr(self, name))
+
+
+    def __copy__(self):
+        # registers are detached from the Core, writing to them must not touch shared memory
+        return CoreInstruction(self._core, self)
+
+
+
+class FrozenCoreInstruction(CoreInstruction):
+    """
+    The default instruction shared by all cells of a Core which haven't been accessed yet.
+    It can't be changed - cells get an instance of their own through Core[address] first.
+    Equal to any CoreInstruction with the same fields.
+    """
+    __slots__ = ('_frozen',)
+
+
+    def __init__(self, core: Core, instruction: Instruction):
+        super().__init__(core, instruction)
+        object.__setattr__(self, '_frozen', True)
+
+
+    def __setattr__(self, name, value):
+        if hasattr(self, '_frozen'):
+            raise AttributeError('the shared default cell is read-only, change cells through Core[address]')
+        super().__setattr__(name, value)
+
+
+    def __eq__(self, other):
+        if not isinstance(other, CoreInstruction):
+            return NotImplemented
+        return pack_instruction(self) == pack_instruction(other)
+
+
+
 class CoreWarrior():
     """
     Represents an instance of a program (warrior) running in the Core.
     Acts as a basic process queue, keeping track of which one of its processes
     is supposed to be executed in the next turn.
+    The queue is kept rotated so that the current process is always the first one,
+    which makes every queue operation take constant time.
     """
+    __slots__ = ('_core', '_processes', 'name', 'start_address', 'index', 'source',
+                 'death_cycle', 'timeline', 'color')
+
+
     def __init__(self, core: Core, name: str, initial_address: int):
-        self.name = name
         self._core = core
-        self._current_index = 0
-        self._processes: List[int] = []
+        self._processes: Deque[int] = deque()
+        self.reset(name, initial_address)
+
+
+    def reset(self, name: str, initial_address: int):
+        "(Re)initializes the warrior with a single process - also used to reuse it in the next round."
+        self.name = name
+        # where the warrior's code has been loaded, used to align per-warrior statistics
+        self.start_address = self._core.normalize_value(initial_address)
+        # position in the list of warriors passed to MARS.load_warriors(), if loaded that way
+        self.index: Optional[int] = None
+        # the Warrior whose code has been loaded, if it was loaded with Core.load_warrior()
+        self.source: Optional[Warrior] = None
+        # number of the cycle during which the last process of the warrior was killed
+        self.death_cycle: Optional[int] = None
+        # optional downsampled history of the warrior's processes
+        self.timeline: Optional[Timeline] = None
+        self._processes.clear()
         # used for visual representation of the warriors' actions, white by default
         self.color = (255, 255, 255)
         # a list of integers - each one is an instruction pointer for one process
@@ -201,7 +426,7 @@ class CoreWarrior():
         """
         Switches this warrior's current process to the next one in the queue.
         """
-        self._current_index = (self._current_index + 1) % len(self._processes)
+        self._processes.rotate(-1)
 
 
     def add_process(self, starting_address: int):
@@ -210,9 +435,12 @@ class CoreWarrior():
         It is then added to the queue after the current process,
         but is instantly skipped over - will be first executed during the next queue 'cycle'.
         """
-        self._processes.insert(self._current_index + 1, self._core.normalize_value(starting_address))
-        # instantly switch to the 'new' process so that a next_process() afterwards will correctly 'skip' it
-        self.next_process()
+        # insert right after the current process and instantly switch to it,
+        # so that a next_process() afterwards will correctly 'skip' it
+        self._processes.rotate(-1)
+        self._processes.appendleft(self._core.normalize_value(starting_address))
+        if self.timeline is not None:
+            self.timeline.pending_births += 1
 
 
     def kill_current_process(self):
@@ -220,22 +448,44 @@ class CoreWarrior():
         Simply removes the current proccess from the list.
         Requires turn_next() to be called afterwards to ensure proper behaviour.
         """
-        self._processes.remove(self._processes[self._current_index])
-        # in most cases switch backwards (turn_next() will correctly jump to next process afterwards)
-        if self._current_index != 0:
-            self._current_index -= 1
-        # removing first process - switch to the last one so that turn_next() will circle back to the beginning
+        self._processes.popleft()
+        if self.timeline is not None:
+            self.timeline.pending_deaths += 1
+        # switch backwards (turn_next() will correctly jump to next process afterwards)
+        self._processes.rotate(1)
+
+
+    def rewind_turn(self, pointer: int, change: int):
+        """
+        Reverts changes made to the process queue during the warrior's last turn
+        (including the next_process() call ending it), restoring the given pointer
+        of the process which executed it. Used by the UndoLog.
+        """
+        if change == CONTINUED:
+            self._processes.rotate(1)
+        elif change == SPLIT:
+            self._processes.pop()
+            self._processes.rotate(1)
         else:
-            self._current_index = len(self._processes) - 1
+            # killed - its pointer simply has to be put back
+            self._processes.appendleft(pointer)
+            return
+        self._processes[0] = pointer
+
+
+    @property
+    def processes(self) -> Tuple[int, ...]:
+        "Instruction pointers of all processes, in execution order, starting with the current one."
+        return tuple(self._processes)
 
 
     @property
     def current_pointer(self) -> int:
         "Returns an instruction pointer of the process currently being executed."
-        return self._processes[self._current_index]
+        return self._processes[0]
 
 
     @current_pointer.setter
     def current_pointer(self, value: int):
         # in case we're at coreSize-1 and increment, for example
-        self._processes[self._current_index] = self._core.normalize_value(value)
+        self._processes[0] = self._core.normalize_value(value)
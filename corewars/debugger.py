@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Union
+from corewars.core import CoreWarrior
+from corewars.mars import MARS, RoundResult
+from corewars.redcode import OpCode
+
+
+@dataclass
+class Breakpoint():
+    "Fires before an instruction matching all of the given criteria is executed."
+    address: Optional[int] = None
+    op_code: Optional[OpCode] = None
+    # name of the warrior or the CoreWarrior itself
+    warrior: Union[str, CoreWarrior, None] = None
+
+
+    def matches(self, warrior: CoreWarrior, address: int, op_code: OpCode) -> bool:
+        if self.address is not None and self.address != address:
+            return False
+        if self.op_code is not None and self.op_code != op_code:
+            return False
+        if isinstance(self.warrior, str):
+            return self.warrior == warrior.name
+        return self.warrior is None or self.warrior is warrior
+
+
+@dataclass
+class Break():
+    "Describes why the Debugger stopped."
+    # 'breakpoint', 'read', 'write' or 'condition'
+    reason: str
+    cycle: int
+    warrior: Optional[CoreWarrior]
+    address: Optional[int] = None
+    description: str = ''
+
+
+class Debugger():
+    """
+    Runs a MARS until one of the breakpoints, watchpoints or conditions fires and hands control back.
+    Execution breakpoints stop before the matching instruction is executed, watchpoints
+    and conditions - right after the cycle which triggered them. Calling run() again resumes.
+    All the checks happen in a separate, instrumented run loop - MARS.cycle() isn't affected at all
+    (it only collects cells_read while there are read watchpoints), and without anything set
+    run() simply falls back to MARS.run().
+    """
+    def __init__(self, mars: MARS):
+        self.mars = mars
+        self.breakpoints: List[Breakpoint] = []
+        # normalized address -> description, for both kinds of watchpoints
+        self.read_watchpoints: Dict[int, str] = {}
+        self.write_watchpoints: Dict[int, str] = {}
+        self.conditions: List[tuple] = []
+        # breakpoint stopped at, skipped when resuming so that the instruction can get executed
+        self._stopped_at: Optional[tuple] = None
+
+
+    def add_breakpoint(
+        self, address: int = None, op_code: OpCode = None, warrior: Union[str, CoreWarrior] = None
+    ) -> Breakpoint:
+        if address is not None:
+            address = self.mars.core.normalize_value(address)
+        breakpoint = Breakpoint(address, op_code, warrior)
+        self.breakpoints.append(breakpoint)
+        return breakpoint
+
+
+    def watch(self, address: int, read: bool = False, write: bool = True):
+        "Adds a watchpoint on reads and/or writes of the cell at the given address."
+        address = self.mars.core.normalize_value(address)
+        if read:
+            self.read_watchpoints[address] = f'cell {address} read'
+        if write:
+            self.write_watchpoints[address] = f'cell {address} written'
+
+
+    def add_condition(self, predicate: Callable[[MARS], bool], description: str = 'condition met'):
+        "Adds a condition checked after every cycle, e.g. lambda mars: mars.core.warriors_count < 3"
+        self.conditions.append((predicate, description))
+
+
+    def break_on_processes(self, warrior_name: str, count: int):
+        "Stops once the process count of the warrior with the given name exceeds the given number."
+        def exceeds(mars: MARS) -> bool:
+            return any(
+                warrior.name == warrior_name and len(warrior) > count
+                for warrior in mars.core.turn_order
+            )
+        self.add_condition(exceeds, f'{warrior_name} has more than {count} processes')
+
+
+    def clear(self):
+        self.breakpoints = []
+        self.read_watchpoints = {}
+        self.write_watchpoints = {}
+        self.conditions = []
+
+
+    def run(self, max_cycles: int = 80000) -> Union[Break, RoundResult]:
+        """
+        Runs the simulation until something fires (returns a Break)
+        or the round ends (returns its RoundResult, like MARS.run()).
+        """
+        mars = self.mars
+        if not (self.breakpoints or self.read_watchpoints or self.write_watchpoints or self.conditions):
+            return mars.run(max_cycles)
+        # MARS only collects the cells it reads when asked to
+        record_reads = mars.record_reads
+        mars.record_reads = record_reads or bool(self.read_watchpoints)
+        try:
+            return self._run(max_cycles)
+        finally:
+            mars.record_reads = record_reads
+
+
+    def _run(self, max_cycles: int) -> Union[Break, RoundResult]:
+        mars = self.mars
+        core = mars.core
+        while not mars.is_over(max_cycles):
+            warrior = core.current_warrior
+            pointer = warrior.current_pointer
+            position = (mars.cycles, pointer)
+            if self.breakpoints and position != self._stopped_at:
+                op_code = core[pointer].op_code
+                for breakpoint in self.breakpoints:
+                    if breakpoint.matches(warrior, pointer, op_code):
+                        self._stopped_at = position
+                        return Break('breakpoint', mars.cycles, warrior, pointer,
+                                     f'{warrior.name} about to execute {core[pointer]}')
+            self._stopped_at = None
+            written = mars.cycle()
+            if self.write_watchpoints:
+                for address in written:
+                    address %= core.size
+                    if address in self.write_watchpoints:
+                        return Break('write', mars.cycles, warrior, address, self.write_watchpoints[address])
+            if self.read_watchpoints:
+                for address in mars.cells_read:
+                    address %= core.size
+                    if address in self.read_watchpoints:
+                        return Break('read', mars.cycles, warrior, address, self.read_watchpoints[address])
+            for predicate, description in self.conditions:
+                if predicate(mars):
+                    return Break('condition', mars.cycles, warrior, None, description)
+        return mars.result()
@@ -0,0 +1,118 @@
+import struct
+from typing import Optional
+import numpy as np
+
+
+# LZW codes of 8-bit pixels are at most 12 bits long
+MIN_CODE_SIZE = 8
+MAX_CODE = 4096
+
+
+class GifWriter():
+    """
+    Writes an animated GIF frame by frame, without any imaging library.
+    Frames are (height, width) arrays of indexes into the palette of up to 256 RGB colours.
+    Only the bounding box of pixels which changed since the previous frame gets encoded,
+    the rest is kept from the previous frame.
+    """
+    def __init__(self, path: str, width: int, height: int, palette: np.ndarray, delay: int = 4):
+        # delay between frames, in hundredths of a second
+        self.delay = delay
+        self.frames = 0
+        self._previous: Optional[np.ndarray] = None
+        self._file = open(path, 'wb')
+        colors = np.zeros((256, 3), dtype=np.uint8)
+        colors[:len(palette)] = palette
+        self._file.write(b'GIF89a')
+        # global colour table with 256 entries
+        self._file.write(struct.pack('<HHBBB', width, height, 0xF7, 0, 0))
+        self._file.write(colors.tobytes())
+        # loop forever
+        self._file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def add_frame(self, indexes: np.ndarray):
+        if self._previous is None:
+            top, left, bottom, right = 0, 0, indexes.shape[0], indexes.shape[1]
+        else:
+            rows, columns = np.nonzero(indexes != self._previous)
+            if len(rows) == 0:
+                # nothing changed - a single pixel keeps the frame (and its delay)
+                rows, columns = np.zeros(1, dtype=int), np.zeros(1, dtype=int)
+            top, left = rows.min(), columns.min()
+            bottom, right = rows.max() + 1, columns.max() + 1
+        self._previous = indexes.copy()
+        region = np.ascontiguousarray(indexes[top:bottom, left:right], dtype=np.uint8)
+        # graphic control extension - don't dispose the previous frame
+        self._file.write(struct.pack('<3sBHBB', b'!\xf9\x04', 0x04, self.delay, 0, 0))
+        self._file.write(struct.pack('<cHHHHB', b',', left, top, right - left, bottom - top, 0))
+        self._file.write(bytes([MIN_CODE_SIZE]))
+        data = lzw_encode(region.tobytes())
+        for start in range(0, len(data), 255):
+            block = data[start:start + 255]
+            self._file.write(bytes([len(block)]) + block)
+        self._file.write(b'\x00')
+        self.frames += 1
+
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write(b';')
+            self._file.close()
+
+
+def lzw_encode(data: bytes) -> bytes:
+    "Compresses 8-bit pixel data with GIF's variant of LZW."
+    clear = 1 << MIN_CODE_SIZE
+    end = clear + 1
+    output = bytearray()
+    buffer = bits = 0
+    width = MIN_CODE_SIZE + 1
+    # (prefix code << 8 | next byte) -> code, single bytes are their own codes
+    table = {}
+    next_code = end + 1
+
+    def emit(code):
+        nonlocal buffer, bits
+        buffer |= code << bits
+        bits += width
+        while bits >= 8:
+            output.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+
+    emit(clear)
+    if data:
+        prefix = data[0]
+        for byte in data[1:]:
+            key = prefix << 8 | byte
+            code = table.get(key)
+            if code is not None:
+                prefix = code
+                continue
+            emit(prefix)
+            if next_code < MAX_CODE:
+                table[key] = next_code
+                next_code += 1
+                # the decoder lags one code behind, so the width grows only after the code is used
+                if next_code > 1 << width:
+                    width += 1
+            else:
+                emit(clear)
+                table = {}
+                next_code = end + 1
+                width = MIN_CODE_SIZE + 1
+            prefix = byte
+        emit(prefix)
+    emit(end)
+    if bits:
+        output.append(buffer & 0xFF)
+    return bytes(output)
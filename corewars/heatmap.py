@@ -0,0 +1,118 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from corewars.png import write_png
+from corewars.redcode import Warrior, code_hash
+
+
+READ, WRITE, EXECUTE = 0, 1, 2
+
+
+class Heatmap():
+    """
+    Accumulates per-cell read, write and execute counts of each warrior
+    across any number of rounds (pass the same Heatmap to every MARS of a match or tournament).
+    Addresses are stored relative to the warrior's start address, so that counts from rounds
+    with different placements line up - cell 0 is always the first instruction of the warrior.
+    Warriors are told apart by hashes of their code (see redcode.code_hash), not by their names,
+    so copies of the same warrior (e.g. in a mirror match) share their counts.
+    """
+    def __init__(self, core_size: int = 8000, flush_size: int = 100000):
+        self.core_size = core_size
+        self._flush_size = flush_size
+        self._counts: Dict[str, np.ndarray] = {}
+        # addresses recorded since the last flush: warrior's hash -> (reads, writes, executes)
+        self._pending: Dict[str, Tuple[List[int], List[int], List[int]]] = {}
+        self._pending_count = 0
+        # warrior's hash -> its name, for display
+        self.names: Dict[str, str] = {}
+        # id of a loaded Warrior -> (the Warrior, its hash), so that its code isn't hashed every cycle
+        self._hashes: Dict[int, Tuple[Warrior, str]] = {}
+
+
+    def record(self, warrior, executed: int, reads: List[int], writes: List[int]):
+        """
+        Records cells accessed by the given CoreWarrior during a single cycle.
+        Called by MARS, addresses are buffered and added to the counts in bulk.
+        """
+        key = self._key(warrior)
+        buffers = self._pending.get(key)
+        if buffers is None:
+            buffers = self._pending[key] = ([], [], [])
+        start = warrior.start_address
+        buffers[READ].extend([address - start for address in reads])
+        buffers[WRITE].extend([address - start for address in writes])
+        buffers[EXECUTE].append(executed - start)
+        self._pending_count += 1
+        if self._pending_count >= self._flush_size:
+            self.flush()
+
+
+    def flush(self):
+        "Adds all buffered accesses to the counts."
+        for key, buffers in self._pending.items():
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = np.zeros((3, self.core_size), dtype=np.int64)
+            for kind, addresses in enumerate(buffers):
+                if addresses:
+                    cells = np.array(addresses, dtype=np.int64) % self.core_size
+                    counts[kind] += np.bincount(cells, minlength=self.core_size)
+        self._pending = {}
+        self._pending_count = 0
+
+
+    @property
+    def keys(self) -> List[str]:
+        "Hashes of all the recorded warriors, in the order used by to_array()."
+        self.flush()
+        return sorted(self._counts)
+
+
+    def counts(self, key: str) -> np.ndarray:
+        """
+        Returns a (3, core_size) array of counts of the warrior with the given hash,
+        indexed with READ, WRITE and EXECUTE.
+        """
+        self.flush()
+        return self._counts[key]
+
+
+    def to_array(self) -> np.ndarray:
+        "Returns counts of all warriors as one (warriors, 3, core_size) array."
+        keys = self.keys
+        if not keys:
+            return np.zeros((0, 3, self.core_size), dtype=np.int64)
+        return np.stack([self._counts[key] for key in keys])
+
+
+    def save_npy(self, path: str) -> List[str]:
+        "Saves to_array() as a .npy file. Returns hashes of the warriors in the order they were saved."
+        np.save(path, self.to_array())
+        return self.keys
+
+
+    def save_png(self, path: str, key: str, cells_per_line: int = 100, scale: int = 4):
+        """
+        Saves the given warrior's heatmap as a PNG image - one square of scale x scale pixels per cell,
+        with writes shown in the red, reads in the green and executions in the blue channel.
+        Counts are log-scaled so that rarely touched cells are still visible.
+        """
+        counts = np.log1p(self.counts(key).astype(np.float64))
+        peaks = counts.max(axis=1, keepdims=True)
+        peaks[peaks == 0] = 1
+        levels = (counts / peaks * 255).astype(np.uint8)
+        lines = -(-self.core_size // cells_per_line)
+        pixels = np.zeros((lines * cells_per_line, 3), dtype=np.uint8)
+        pixels[:self.core_size] = levels[[WRITE, READ, EXECUTE]].T
+        pixels = pixels.reshape(lines, cells_per_line, 3)
+        pixels = pixels.repeat(scale, axis=0).repeat(scale, axis=1)
+        write_png(path, pixels)
+
+
+    def _key(self, warrior) -> str:
+        source = warrior.source
+        cached = self._hashes.get(id(source))
+        if cached is None:
+            cached = self._hashes[id(source)] = (source, code_hash(source))
+            self.names.setdefault(cached[1], warrior.name)
+        return cached[1]
@@ -1,54 +1,162 @@
+import asyncio
 from copy import copy
+from dataclasses import dataclass
 import operator
-from random import randint, randrange, shuffle
-from corewars.redcode import AddressingMode, Instruction, Modifier, OpCode, Warrior
-from typing import List
-from corewars.core import Core
+import random
+from random import Random
+from corewars.redcode import AddressingMode, Instruction, Modifier, OpCode, Warrior, pack_instruction
+from typing import List, Optional, Tuple
+from corewars.core import Core, CoreWarrior
+from corewars.heatmap import Heatmap
 from corewars.parser import Parser
+from corewars.timeline import Timeline
+from corewars.undo import UndoLog
+
+
+@dataclass
+class WarriorResult():
+    """
+    A warrior as it was at the end of a round. CoreWarriors get reused by the following rounds,
+    so results keep copies of their data instead.
+    """
+    name: str
+    # see CoreWarrior for the meaning of these
+    index: Optional[int]
+    start_address: int
+    death_cycle: Optional[int]
+    source: Optional[Warrior] = None
+    timeline: Optional[Timeline] = None
+    color: Tuple[int, int, int] = (255, 255, 255)
+
+
+    @classmethod
+    def of(cls, warrior: CoreWarrior) -> 'WarriorResult':
+        return cls(warrior.name, warrior.index, warrior.start_address, warrior.death_cycle,
+                   warrior.source, warrior.timeline, warrior.color)
+
+
+@dataclass
+class RoundResult():
+    "Outcome of a single round, as returned by MARS.run()."
+    cycles: int
+    # None in case of a tie (or if there were no opponents to begin with)
+    winner: Optional[WarriorResult]
+    # all warriors taking part in the round, in the order they were passed to MARS.load_warriors()
+    warriors: List[WarriorResult]
+
+
+# addressing modes which only read the pointer cell, without modifying it
+INDIRECT_MODES = (AddressingMode.A_INDIRECT, AddressingMode.B_INDIRECT)
+# instructions which modify the cell pointed to by the B operand
+WRITING_OP_CODES = (OpCode.MOV, OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV, OpCode.MOD, OpCode.DJN)
 
 
 class MARS():
     """
     Memory Array Redcode Simulator - represents a single Core Wars simulation environment.
+    If a Heatmap is provided, every executed cycle is accumulated into it.
+    If timeline_stride is set, each loaded warrior records a Timeline
+    of its processes, sampled at most once every timeline_stride cycles.
+    With undo_capacity set, up to that many last cycles can be reverted with undo().
+    Cells read by each cycle are only collected into cells_read while record_reads is set
+    (or a Heatmap is used), so plain rounds don't pay for it.
+    Warriors are placed using the given Random (or a new one, seeded with the given seed),
+    by default using the global random module.
+    With shared=True the Core's cells are mirrored into shared memory, so that other processes
+    can watch the battle (see Core and corewars.shared) - release it with core.close() afterwards.
     """
-    def __init__(self):
-        self.core = Core()
+    def __init__(
+        self, heatmap: Optional[Heatmap] = None,
+        timeline_stride: Optional[int] = None, timeline_capacity: int = 1024,
+        undo_capacity: int = 0, rng: Optional[Random] = None, seed: Optional[int] = None,
+        shared: bool = False
+    ):
+        self.core = Core(shared=shared)
+        # source of randomness for placing warriors (and assigning their colours)
+        self.rng = rng if rng is not None else Random(seed) if seed is not None else random
+        self.heatmap = heatmap
+        self.timeline_stride = timeline_stride
+        self.timeline_capacity = timeline_capacity
+        self.undo_log = UndoLog(undo_capacity) if undo_capacity else None
+        # number of cycles executed so far
+        self.cycles = 0
+        # addresses of cells read during the last cycle, collected only while record_reads is set
+        self.record_reads = False
+        self.cells_read: List[int] = []
 
 
-    def load_warriors(self, data_arrays: List[List[str]], starting_address: int = None):
+    def load_warriors(
+        self, data_arrays: List[List[str]], starting_address: int = None, min_distance: int = None
+    ):
         """
         Parses each of the provided arrays as separate warriors and loads them into the Core.
+        Warriors are spread evenly, with start addresses at least min_distance cells apart
+        (by default - the length of the longest warrior, so that none of them overlap).
+        Raises ValueError if the Core is too small to fit all of them that way.
         """
-        warriors: List[Warrior] = []
-        for warrior_data in data_arrays:
+        warriors: List[Tuple[int, Warrior]] = []
+        for index, warrior_data in enumerate(data_arrays):
             warrior = Parser.parse_warrior(warrior_data)
             if warrior:
-                warriors.append(warrior)
+                warriors.append((index, warrior))
+        longest = max(len(warrior.instructions) for _, warrior in warriors)
+        min_distance = longest if min_distance is None else max(min_distance, longest)
         spacing = self.core.size // len(warriors)
+        if spacing < min_distance:
+            raise ValueError(
+                f'{len(warriors)} warriors cannot be placed {min_distance} cells apart '
+                f'in a core of size {self.core.size}'
+            )
+        # random offsets can bring two neighbours closer by at most twice this value
+        max_offset = min(50, (spacing - min_distance) // 2)
         if starting_address is None:
-            starting_address = randrange(0, self.core.size)
+            starting_address = self.rng.randrange(0, self.core.size)
         # randomize order in which warriors are loaded
-        shuffle(warriors)
-        for i, warrior in enumerate(warriors):
+        self.rng.shuffle(warriors)
+        for i, (index, warrior) in enumerate(warriors):
             # add small random offset to each starting address apart from the 1st one
-            spacing_offset = 0 if i == 0 else randint(-50, 50)
-            address = starting_address + i * (spacing + spacing_offset)
-            self.core.load_warrior(warrior, address)
+            spacing_offset = 0 if i == 0 else self.rng.randint(-max_offset, max_offset)
+            address = starting_address + i * spacing + spacing_offset
+            core_warrior = self.core.load_warrior(warrior, address)
+            core_warrior.index = index
+            if self.timeline_stride:
+                core_warrior.timeline = Timeline(self.timeline_capacity, self.timeline_stride)
+
+
+    def reset(self, seed: Optional[int] = None):
+        """
+        Prepares the simulator for a new round (load_warriors() has to be called next),
+        reusing the Core - see Core.reset(). Heatmap keeps accumulating across rounds.
+        With a seed the round gets a random stream of its own, so it can be replayed exactly.
+        """
+        if seed is not None:
+            self.rng = Random(seed)
+        self.core.reset()
+        self.cycles = 0
+        self.cells_read = []
+        if self.undo_log is not None:
+            self.undo_log.clear()
 
 
     def cycle(self) -> List[int]:
         """
         Runs one simulation cycle - executes one task of the currently active warrior.
-        Returns addresses of memory cells which were accessed during the cycle.
+        Returns addresses of memory cells which were written to during the cycle
+        (destinations of instructions modifying them and pre/post-incremented pointers).
         """
         temp_pointer: int = 0 # used for keeping addresses in case we need to post-increment
         cells_written = [] # keeps track of what cells we've written data to
+        # and which ones were read from, if anything is interested
+        cells_read = [] if self.record_reads or self.heatmap is not None else None
         # determine the current warrior
         warrior = self.core.current_warrior
         if not warrior:
             return
         # determine address of the instruction that we want to execute
         inst_pointer = warrior.current_pointer
+        undo_log = self.undo_log
+        if undo_log is not None:
+            undo_log.begin(warrior, inst_pointer)
         # copy it to the instruction register
         inst_reg = copy(self.core[inst_pointer])
         # evaluating the A operand
@@ -61,6 +169,10 @@ class MARS():
             if inst_reg.a_mode != AddressingMode.DIRECT:
                 # first, save the current pointer in case it's needed for post-increments
                 temp_pointer = inst_pointer + a_pointer
+                if cells_read is not None:
+                    cells_read.append(temp_pointer)
+                if undo_log is not None and inst_reg.a_mode not in INDIRECT_MODES:
+                    undo_log.save_cell(temp_pointer, self.core[temp_pointer])
                 # pre-decrement if necessary
                 if inst_reg.a_mode == AddressingMode.A_PREDEC:
                     self.core[temp_pointer].a_value -= 1
@@ -77,6 +189,8 @@ class MARS():
         # copy source instruction to register
         source_address = inst_pointer + a_pointer
         source_reg = copy(self.core[source_address])
+        if cells_read is not None and inst_reg.a_mode != AddressingMode.IMMEDIATE:
+            cells_read.append(source_address)
         # post-increment if necessary
         if inst_reg.a_mode == AddressingMode.A_POSTINC:
             self.core[temp_pointer].a_value += 1
@@ -94,6 +208,10 @@ class MARS():
             if inst_reg.b_mode != AddressingMode.DIRECT:
                 # first, save the current pointer in case it's needed for post-increments
                 temp_pointer = inst_pointer + b_pointer
+                if cells_read is not None:
+                    cells_read.append(temp_pointer)
+                if undo_log is not None and inst_reg.b_mode not in INDIRECT_MODES:
+                    undo_log.save_cell(temp_pointer, self.core[temp_pointer])
                 # pre-decrement if necessary
                 if inst_reg.b_mode == AddressingMode.A_PREDEC:
                     self.core[temp_pointer].a_value -= 1
@@ -110,8 +228,11 @@ class MARS():
         # copy source instruction to register
         dest_address = inst_pointer + b_pointer
         dest_reg = copy(self.core[dest_address])
-        # for simplicity let's assume that the destination address is always written to
-        cells_written.append(dest_address)
+        if cells_read is not None and inst_reg.b_mode != AddressingMode.IMMEDIATE:
+            cells_read.append(dest_address)
+        # only some instructions write to the destination, the rest just read it (or jump)
+        if inst_reg.op_code in WRITING_OP_CODES:
+            cells_written.append(dest_address)
         # post-increment if necessary
         if inst_reg.b_mode == AddressingMode.A_POSTINC:
             self.core[temp_pointer].a_value += 1
@@ -122,6 +243,8 @@ class MARS():
 
         # actual execution phase
         op_code, modifier = inst_reg.op_code, inst_reg.modifier
+        if undo_log is not None:
+            undo_log.save_cell(dest_address, self.core[dest_address])
         # increment current process' pointer (might be overwritten by a JMP instruction)
         self.core.current_warrior.current_pointer += 1
         if op_code == OpCode.DAT:
@@ -191,12 +314,93 @@ class MARS():
             self.core.current_warrior.add_process(source_address)
         elif op_code == OpCode.NOP:
             pass
+        self.cycles += 1
+        if cells_read is not None:
+            self.cells_read = cells_read
+        self.core.mark_dirty(cells_written)
+        if undo_log is not None:
+            undo_log.commit()
+        if self.heatmap is not None:
+            self.heatmap.record(warrior, inst_pointer, cells_read, cells_written)
+        if warrior.timeline is not None:
+            warrior.timeline.tick(self.cycles, warrior)
+        if len(warrior) == 0:
+            warrior.death_cycle = self.cycles
         # move to the next warrior (automatically kills ones without any processes left)
         self.core.rotate_warrior()
         # return address written to during execution
         return cells_written
 
 
+    def undo(self) -> List[int]:
+        """
+        Reverts the last executed cycle, as long as it's still kept in the undo log.
+        Returns addresses of the restored cells (an empty list if there was nothing left to revert).
+        """
+        if self.undo_log is None:
+            return []
+        restored = self.undo_log.undo(self.core)
+        if restored:
+            self.cycles -= 1
+        return restored
+
+
+    def run(self, max_cycles: int = 80000) -> RoundResult:
+        """
+        Runs the round until only one warrior is left (none, if only one was loaded)
+        or until max_cycles cycles have been executed in total.
+        """
+        while not self.is_over(max_cycles):
+            self.cycle()
+        return self.result()
+
+
+    async def run_async(
+        self, max_cycles: int = 80000, slice_cycles: int = 1000, timeout: Optional[float] = None
+    ) -> RoundResult:
+        """
+        Same as run(), but executes the round in slices of slice_cycles cycles,
+        yielding to the event loop in between - many battles can share a single asyncio loop.
+        Can be cancelled like any other task. If timeout (in seconds of wall-clock time) passes
+        before the round ends, asyncio.TimeoutError is raised - the simulation is left as it was,
+        so it can still be inspected or continued.
+        Raises ValueError if max_cycles or slice_cycles isn't positive - the round would never end.
+        """
+        if max_cycles <= 0 or slice_cycles <= 0:
+            raise ValueError(
+                f'max_cycles and slice_cycles have to be positive, got {max_cycles} and {slice_cycles}'
+            )
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while not self.is_over(max_cycles):
+            slice_end = min(self.cycles + slice_cycles, max_cycles)
+            while self.cycles < slice_end and not self.is_over(max_cycles):
+                self.cycle()
+            if deadline is not None and loop.time() >= deadline and not self.is_over(max_cycles):
+                raise asyncio.TimeoutError(f'round not finished after {timeout}s ({self.cycles} cycles)')
+            await asyncio.sleep(0)
+        return self.result()
+
+
+    def is_over(self, max_cycles: int = 80000) -> bool:
+        "Whether the round has ended - see run()."
+        # a single warrior is allowed to run on its own until it dies
+        loaded = self.core.warriors_count + len(self.core.dead_warriors)
+        warriors_left = 1 if loaded > 1 else 0
+        return self.cycles >= max_cycles or self.core.warriors_count <= warriors_left
+
+
+    def result(self) -> RoundResult:
+        "Returns the outcome of the round as of now."
+        warriors = self.core.warriors + self.core.dead_warriors
+        warriors.sort(key=lambda warrior: -1 if warrior.index is None else warrior.index)
+        results = [WarriorResult.of(warrior) for warrior in warriors]
+        winner = None
+        if len(warriors) > 1 and self.core.warriors_count == 1:
+            winner = results[warriors.index(self.core.current_warrior)]
+        return RoundResult(self.cycles, winner, results)
+
+
     def _perform_math(
         self, opr: operator, address: int, modifier: Modifier, src_reg: Instruction, dest_reg: Instruction
     ):
@@ -243,14 +447,16 @@ class MARS():
             return opr(src_reg.a_value, dest_reg.b_value)
         elif modifier == Modifier.BA:
             return opr(src_reg.b_value, dest_reg.a_value)
-        elif modifier == Modifier.F:
+        elif modifier == Modifier.F or (modifier == Modifier.I and opr == operator.lt):
+            # SLT.I has nothing else to compare than values
             return (opr(src_reg.a_value, dest_reg.a_value) and
                     opr(src_reg.b_value, dest_reg.b_value))
         elif modifier == Modifier.X:
             return (opr(src_reg.a_value, dest_reg.b_value) and
                     opr(src_reg.b_value, dest_reg.a_value))
         elif modifier == Modifier.I:
-            return src_reg == dest_reg
+            # whole instructions, compared as single integers
+            return opr(pack_instruction(src_reg), pack_instruction(dest_reg))
 
 
     def _should_jump(self, modifier: Modifier, dest_reg: Instruction) -> bool:
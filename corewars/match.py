@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from math import sqrt
+from statistics import NormalDist
+from typing import Callable, List, Optional, Tuple
+from corewars.mars import MARS
+from corewars.seeding import round_seed
+
+
+@dataclass
+class MatchResult():
+    "Outcome of a head-to-head match, counted from the first warrior's point of view."
+    wins: int
+    losses: int
+    ties: int
+    # confidence interval of the first warrior's score rate (ties counting as half a win)
+    lower: float
+    upper: float
+    # False if the round cap was hit before the outcome became clear
+    decided: bool
+
+
+    @property
+    def rounds(self) -> int:
+        "Number of rounds actually played."
+        return self.wins + self.losses + self.ties
+
+
+    @property
+    def score(self) -> float:
+        return (self.wins + self.ties / 2) / self.rounds if self.rounds else 0.5
+
+
+def wilson_interval(score: float, rounds: int, confidence: float) -> Tuple[float, float]:
+    "Wilson score interval of a proportion, given the summed up score of the given number of rounds."
+    if rounds == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    rate = score / rounds
+    center = (rate + z * z / (2 * rounds)) / (1 + z * z / rounds)
+    spread = z * sqrt(rate * (1 - rate) / rounds + z * z / (4 * rounds * rounds)) / (1 + z * z / rounds)
+    return max(center - spread, 0.0), min(center + spread, 1.0)
+
+
+def run_match(
+    warrior: List[str], opponent: List[str], margin: float = 0.05, confidence: float = 0.99,
+    max_rounds: int = 250, batch_size: int = 1, max_cycles: int = 80000,
+    mars_factory: Callable[[], MARS] = MARS, seed: Optional[int] = None
+) -> MatchResult:
+    """
+    Plays rounds between two warriors (given as lines of Redcode) until the outcome is statistically clear,
+    updating the confidence interval of the first warrior's score rate after every batch of rounds.
+    The match stops as soon as the interval lies entirely outside 0.5 +/- margin (one warrior is better
+    by at least the margin) or entirely inside it (the warriors are even), or after max_rounds rounds.
+    Lopsided pairings are thus decided in a handful of rounds, leaving the rounds for the close ones.
+    Note that the interval is checked repeatedly, so the actual error rate is somewhat higher
+    than the confidence level alone would suggest - hence the rather strict default.
+    With a seed, every round gets an independent random stream derived from it (see round_seed()),
+    so the whole match - or any single round - can be replayed.
+    """
+    wins = losses = ties = 0
+    lower, upper = 0.0, 1.0
+    mars = mars_factory()
+    while wins + losses + ties < max_rounds:
+        for _ in range(min(batch_size, max_rounds - wins - losses - ties)):
+            mars.reset(None if seed is None else round_seed(seed, wins + losses + ties))
+            mars.load_warriors([warrior, opponent])
+            winner = mars.run(max_cycles).winner
+            if winner is None:
+                ties += 1
+            elif winner.index == 0:
+                wins += 1
+            else:
+                losses += 1
+        rounds = wins + losses + ties
+        lower, upper = wilson_interval(wins + ties / 2, rounds, confidence)
+        if lower > 0.5 + margin or upper < 0.5 - margin:
+            return MatchResult(wins, losses, ties, lower, upper, True)
+        if lower >= 0.5 - margin and upper <= 0.5 + margin:
+            return MatchResult(wins, losses, ties, lower, upper, True)
+    return MatchResult(wins, losses, ties, lower, upper, False)
@@ -0,0 +1,65 @@
+"""
+Memory budget of concurrently running battles - measures how many bytes a single live battle
+takes (MARS, its 8000-cell Core, warriors and their processes) with tracemalloc, so that servers
+can be sized and regressions caught. Run with python -m corewars.memory.
+"""
+import argparse
+import glob
+import os
+import random
+import tracemalloc
+from typing import List, Optional
+from corewars.mars import MARS
+from corewars.pool import MARSPool
+
+
+def bytes_per_battle(
+    warriors_data: List[List[str]], battles: int = 100, cycles: int = 1000,
+    pool: Optional[MARSPool] = None, seed: int = 0
+) -> float:
+    """
+    Starts the given number of battles between random pairs of the warriors, keeping all of them
+    alive, runs each for the given number of cycles and returns the average number of bytes
+    allocated per battle. Simulators are taken from the pool if one is given.
+    """
+    rng = random.Random(seed)
+    pairs = [rng.sample(warriors_data, 2) for _ in range(battles)]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        simulators = []
+        for pair in pairs:
+            mars = pool.acquire() if pool is not None else MARS()
+            mars.load_warriors(pair)
+            for _ in range(cycles):
+                if mars.is_over(cycles):
+                    break
+                mars.cycle()
+            simulators.append(mars)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    if pool is not None:
+        for mars in simulators:
+            pool.release(mars)
+    return allocated / battles
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory taken by a single live battle')
+    parser.add_argument('--warriors', type=str, default='warriors', help='Folder containing warrior files')
+    parser.add_argument('--battles', type=int, default=200, help='Number of battles kept alive at once')
+    parser.add_argument('--cycles', type=int, default=1000, help='Cycles run in every battle')
+    args = parser.parse_args()
+    warriors_data = [open(path).readlines() for path in sorted(glob.glob(os.path.join(args.warriors, '*.red')))]
+    fresh = bytes_per_battle(warriors_data, args.battles, args.cycles)
+    print(f'{fresh:10.0f} bytes per battle')
+    pool = MARSPool()
+    # the first pass fills the pool, the second one reuses its simulators
+    bytes_per_battle(warriors_data, args.battles, args.cycles, pool)
+    pooled = bytes_per_battle(warriors_data, args.battles, args.cycles, pool)
+    print(f'{pooled:10.0f} bytes per battle, reusing pooled simulators')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import struct
+import zlib
+import numpy as np
+
+
+def write_png(path: str, pixels: np.ndarray):
+    """
+    Saves an (height, width, 3) array of uint8 RGB values as a PNG file.
+    Minimal encoder, so that image export doesn't require any imaging library.
+    """
+    height, width, _ = pixels.shape
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    # every scanline is prefixed with its filter type (0 - none)
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = pixels.reshape(height, width * 3)
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        _write_chunk(file, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        _write_chunk(file, b'IDAT', zlib.compress(scanlines.tobytes()))
+        _write_chunk(file, b'IEND', b'')
+
+
+def _write_chunk(file, chunk_type: bytes, data: bytes):
+    file.write(struct.pack('>I', len(data)))
+    file.write(chunk_type)
+    file.write(data)
+    file.write(struct.pack('>I', zlib.crc32(chunk_type + data)))
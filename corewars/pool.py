@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+from corewars.mars import MARS
+
+
+class MARSPool():
+    """
+    Idle simulators kept for reuse by following battles - a server running many battles at once
+    acquires a MARS for each one and releases it once the battle is over, instead of allocating
+    a new Core every time. Released simulators are reset(), which gives their cells back
+    to the shared default instruction and keeps their CoreWarriors for the next warriors loaded.
+    """
+    def __init__(self, factory: Callable[[], MARS] = MARS, max_idle: int = 256):
+        self.factory = factory
+        # simulators beyond this number are left to the garbage collector when released
+        self.max_idle = max_idle
+        self._idle: List[MARS] = []
+
+
+    def __len__(self):
+        "Number of idle simulators."
+        return len(self._idle)
+
+
+    def acquire(self) -> MARS:
+        "Returns an empty simulator, ready for load_warriors()."
+        if self._idle:
+            return self._idle.pop()
+        return self.factory()
+
+
+    def release(self, mars: MARS):
+        "Takes back a simulator which isn't used anymore - results of its round mustn't be kept."
+        mars.reset()
+        if len(self._idle) < self.max_idle:
+            self._idle.append(mars)
+
+
+    @contextmanager
+    def battle(self) -> Iterator[MARS]:
+        "acquire() and release() around a with block."
+        mars = self.acquire()
+        try:
+            yield mars
+        finally:
+            self.release(mars)
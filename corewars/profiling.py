@@ -0,0 +1,105 @@
+import cProfile
+import os
+import pstats
+from typing import Callable, Dict, List, Tuple
+from corewars.mars import MARS
+
+
+# modules whose functions are listed by top_functions() by default
+SIMULATOR_MODULES = (os.path.join('corewars', 'mars.py'), os.path.join('corewars', 'core.py'))
+# stacks with a smaller share of their function's time aren't followed any deeper
+MIN_SHARE = 1e-4
+MAX_DEPTH = 64
+
+
+def profile_rounds(
+    warriors_data: List[List[str]], path: str, rounds: int = 1, max_cycles: int = 80000,
+    mars_factory: Callable[[], MARS] = MARS
+) -> pstats.Stats:
+    """
+    Plays the given number of rounds under cProfile, saving the profile as <path>.pstats
+    and its folded stacks (for flame graph tools) as <path>.folded. Returns the statistics.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    mars = mars_factory()
+    profile = cProfile.Profile()
+    profile.enable()
+    for _ in range(rounds):
+        mars.reset()
+        mars.load_warriors(warriors_data)
+        mars.run(max_cycles)
+    profile.disable()
+    profile.dump_stats(f'{path}.pstats')
+    stats = pstats.Stats(profile)
+    with open(f'{path}.folded', 'w') as file:
+        file.writelines(f'{line}\n' for line in folded_stacks(stats))
+    return stats
+
+
+def folded_stacks(stats: pstats.Stats) -> List[str]:
+    """
+    Converts the statistics into the folded stack format ('outer;inner;innermost microseconds').
+    cProfile only records caller -> callee pairs, so full stacks are reconstructed from the roots,
+    splitting the time of every function between its callers in proportion to the time
+    spent in the calls made by each of them. Recursive calls are folded into the outermost one.
+    """
+    callees: Dict[tuple, Dict[tuple, float]] = {}
+    roots = []
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            roots.append(function)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[function] = edge[3]
+    folded: Dict[str, float] = {}
+
+    def walk(function, stack: List[tuple], share: float):
+        total = stats.stats[function][2]
+        stack = stack + [function]
+        name = ';'.join(_label(frame) for frame in stack)
+        folded[name] = folded.get(name, 0) + total * share
+        if len(stack) >= MAX_DEPTH:
+            return
+        for callee, time in callees.get(function, {}).items():
+            callee_cumulative = stats.stats[callee][3]
+            if callee in stack or callee_cumulative <= 0:
+                continue
+            callee_share = share * time / callee_cumulative
+            if callee_share >= MIN_SHARE:
+                walk(callee, stack, callee_share)
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return [f'{name} {round(time * 1e6)}' for name, time in sorted(folded.items()) if round(time * 1e6) > 0]
+
+
+def top_functions(
+    stats: pstats.Stats, modules: Tuple[str, ...] = SIMULATOR_MODULES, limit: int = 15
+) -> List[Tuple[str, int, float, float]]:
+    """
+    Returns (function, number of calls, own time, cumulative time) of the functions from the given
+    modules which took the most time on their own, times are in seconds.
+    """
+    entries = []
+    for function, (_, calls, total, cumulative, _) in stats.stats.items():
+        if function[0].endswith(modules):
+            entries.append((_label(function), calls, total, cumulative))
+    entries.sort(key=lambda entry: entry[2], reverse=True)
+    return entries[:limit]
+
+
+def format_summary(stats: pstats.Stats, limit: int = 15) -> str:
+    "Table of top_functions(), preceded by the total profiled time."
+    lines = [f'total time: {stats.total_tt:.3f}s', f'{"calls":>10} {"own [s]":>9} {"cum. [s]":>9}  function']
+    for name, calls, total, cumulative in top_functions(stats, limit=limit):
+        lines.append(f'{calls:>10} {total:>9.3f} {cumulative:>9.3f}  {name}')
+    return '\n'.join(lines)
+
+
+def _label(function: tuple) -> str:
+    filename, line, name = function
+    if filename == '~':
+        # built-in functions have no file
+        return name
+    return f'{name} ({os.path.basename(filename)}:{line})'
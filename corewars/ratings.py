@@ -0,0 +1,235 @@
+from dataclasses import dataclass
+from heapq import nlargest
+from math import log, pi, sqrt
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from corewars.mars import RoundResult
+from corewars.redcode import code_hash
+
+
+INITIAL_RATING = 1500.0
+INITIAL_DEVIATION = 350.0
+
+
+@dataclass
+class Rating():
+    value: float = INITIAL_RATING
+    # Glicko rating deviation - how uncertain the value still is
+    deviation: float = INITIAL_DEVIATION
+    games: int = 0
+
+
+class Elo():
+    "Classic Elo rating system with a constant K-factor."
+    def __init__(self, k_factor: float = 32):
+        self.k_factor = k_factor
+
+
+    def expected(self, rating: Rating, opponent: Rating) -> float:
+        "Expected score of the first warrior against the second."
+        return 1 / (1 + 10 ** ((opponent.value - rating.value) / 400))
+
+
+    def uncertainty(self, rating: Rating) -> float:
+        # Elo itself doesn't track it - assume it shrinks with the number of games played
+        return INITIAL_DEVIATION / sqrt(1 + rating.games)
+
+
+    def update(self, rating: Rating, opponent: Rating, score: float):
+        "Updates both ratings after a single game in which the first warrior scored the given score."
+        change = self.k_factor * (score - self.expected(rating, opponent))
+        rating.value += change
+        opponent.value -= change
+
+
+class Glicko():
+    """
+    Glicko rating system, with every game treated as a separate rating period,
+    so that ratings can be updated one result at a time.
+    Deviations never drop below min_deviation, which keeps the ratings able to follow changes.
+    """
+    Q = log(10) / 400
+
+
+    def __init__(self, min_deviation: float = 30):
+        self.min_deviation = min_deviation
+
+
+    def _g(self, deviation: float) -> float:
+        return 1 / sqrt(1 + 3 * (self.Q * deviation) ** 2 / pi ** 2)
+
+
+    def expected(self, rating: Rating, opponent: Rating) -> float:
+        "Expected score of the first warrior against the second."
+        g = self._g(opponent.deviation)
+        return 1 / (1 + 10 ** (-g * (rating.value - opponent.value) / 400))
+
+
+    def uncertainty(self, rating: Rating) -> float:
+        return rating.deviation
+
+
+    def update(self, rating: Rating, opponent: Rating, score: float):
+        "Updates both ratings after a single game in which the first warrior scored the given score."
+        # both updates have to use the ratings from before the game
+        first = self._updated(rating, opponent, score)
+        second = self._updated(opponent, rating, 1 - score)
+        rating.value, rating.deviation = first
+        opponent.value, opponent.deviation = second
+
+
+    def _updated(self, rating: Rating, opponent: Rating, score: float) -> Tuple[float, float]:
+        g = self._g(opponent.deviation)
+        expected = self.expected(rating, opponent)
+        d_squared = 1 / (self.Q ** 2 * g ** 2 * expected * (1 - expected))
+        precision = 1 / rating.deviation ** 2 + 1 / d_squared
+        value = rating.value + self.Q / precision * g * (score - expected)
+        deviation = max(sqrt(1 / precision), self.min_deviation)
+        return value, deviation
+
+
+
+class RatingEngine():
+    """
+    Incrementally rates a (possibly very large) pool of warriors from a stream of results.
+    Head-to-head records are kept in a sparse pairing matrix - only pairs which actually
+    played each other take up memory - and every result updates just the two ratings involved,
+    so nothing ever has to be recomputed from scratch.
+    """
+    def __init__(self, system=None):
+        self.system = Glicko() if system is None else system
+        self._ratings: Dict[Hashable, Rating] = {}
+        # (a, b) -> [wins of a, wins of b, ties], for a < b (see _pair)
+        self._pairings: Dict[Tuple[Hashable, Hashable], List[int]] = {}
+        self._opponents: Dict[Hashable, Set[Hashable]] = {}
+
+
+    def add_warrior(self, warrior: Hashable):
+        "Adds a warrior to the pool without any games played, so that it can be paired up."
+        if warrior not in self._ratings:
+            self._ratings[warrior] = Rating()
+            self._opponents[warrior] = set()
+
+
+    def add_result(self, warrior: Hashable, opponent: Hashable, score: float):
+        "Records a single game - score is 1 for a win of the first warrior, 0.5 for a tie and 0 for a loss."
+        if warrior == opponent:
+            raise ValueError(f"{warrior!r} can't play against itself")
+        self.add_warrior(warrior)
+        self.add_warrior(opponent)
+        rating, opponent_rating = self._ratings[warrior], self._ratings[opponent]
+        self.system.update(rating, opponent_rating, score)
+        rating.games += 1
+        opponent_rating.games += 1
+        pair = self._pair(warrior, opponent)
+        record = self._pairings.get(pair)
+        if record is None:
+            record = self._pairings[pair] = [0, 0, 0]
+            self._opponents[warrior].add(opponent)
+            self._opponents[opponent].add(warrior)
+        if score == 0.5:
+            record[2] += 1
+        elif (score == 1) == (pair[0] == warrior):
+            record[0] += 1
+        else:
+            record[1] += 1
+
+
+    def consume(self, result: RoundResult, key: Optional[Callable] = None):
+        """
+        Records a round played by MARS. Every pair of its warriors counts as one game:
+        a survivor beats a dead warrior, two survivors tie and of two dead ones
+        the one which lasted longer wins. Warriors are identified by the given key,
+        by default by the hash of their code (names aren't unique, many warriors have none).
+        Pairs of warriors with the same key (e.g. mirror matches) are skipped.
+        """
+        key = warrior_key if key is None else key
+        warriors = result.warriors
+        keys = [key(warrior) for warrior in warriors]
+        for i, warrior in enumerate(warriors):
+            for j in range(i + 1, len(warriors)):
+                if keys[i] != keys[j]:
+                    self.add_result(keys[i], keys[j], _survival_score(warrior, warriors[j]))
+
+
+    def consume_all(self, results: Iterable[RoundResult], key: Optional[Callable] = None):
+        for result in results:
+            self.consume(result, key)
+
+
+    def rating(self, warrior: Hashable) -> Rating:
+        return self._ratings[warrior]
+
+
+    def record(self, warrior: Hashable, opponent: Hashable) -> Tuple[int, int, int]:
+        "Returns (wins, losses, ties) of the first warrior against the second one."
+        pair = self._pair(warrior, opponent)
+        wins, losses, ties = self._pairings.get(pair, (0, 0, 0))
+        if pair[0] != warrior:
+            wins, losses = losses, wins
+        return wins, losses, ties
+
+
+    def opponents(self, warrior: Hashable) -> Set[Hashable]:
+        return self._opponents[warrior]
+
+
+    def leaderboard(self) -> List[Tuple[Hashable, Rating]]:
+        return sorted(self._ratings.items(), key=lambda item: item[1].value, reverse=True)
+
+
+    def next_pairings(self, count: int, window: int = 8) -> List[Tuple[Hashable, Hashable]]:
+        """
+        Chooses up to 'count' pairings which are expected to change the rankings the most:
+        evenly matched (an uncertain outcome tells the most) warriors whose ratings
+        are still uncertain, preferring pairs which haven't played each other much yet.
+        Only warriors within 'window' places of each other in the ranking are considered,
+        so the number of candidates is linear in the size of the pool - sorting the pool
+        by rating takes O(n log n) on top of that.
+        """
+        ranking = [warrior for warrior, _ in self.leaderboard()]
+        candidates = []
+        for i, warrior in enumerate(ranking):
+            for opponent in ranking[i + 1:i + 1 + window]:
+                candidates.append((self._information(warrior, opponent), warrior, opponent))
+        best = nlargest(count, candidates, key=lambda candidate: candidate[0])
+        return [(warrior, opponent) for _, warrior, opponent in best]
+
+
+    def _information(self, warrior: Hashable, opponent: Hashable) -> float:
+        rating, opponent_rating = self._ratings[warrior], self._ratings[opponent]
+        expected = self.system.expected(rating, opponent_rating)
+        uncertainty = (self.system.uncertainty(rating) ** 2 +
+                       self.system.uncertainty(opponent_rating) ** 2)
+        played = sum(self._pairings.get(self._pair(warrior, opponent), ()))
+        return expected * (1 - expected) * uncertainty / (1 + played)
+
+
+    @staticmethod
+    def _pair(warrior: Hashable, opponent: Hashable) -> Tuple[Hashable, Hashable]:
+        if type(warrior) is type(opponent):
+            try:
+                return (warrior, opponent) if warrior <= opponent else (opponent, warrior)
+            except TypeError:
+                pass
+        # keys which can't be compared with each other are ordered by their type and representation,
+        # falling back to their hashes for different keys which look the same
+        first, second = (type(warrior).__name__, repr(warrior)), (type(opponent).__name__, repr(opponent))
+        if first < second or (first == second and hash(warrior) <= hash(opponent)):
+            return warrior, opponent
+        return opponent, warrior
+
+
+def warrior_key(warrior) -> str:
+    "Default key of a warrior of a RoundResult - the hash of its code (see redcode.code_hash)."
+    return code_hash(warrior.source)
+
+
+def _survival_score(warrior, opponent) -> float:
+    "Score of the first warrior of a RoundResult against the second one, based on how long they survived."
+    if warrior.death_cycle == opponent.death_cycle:
+        return 0.5
+    if warrior.death_cycle is None:
+        return 1
+    if opponent.death_cycle is None:
+        return 0
+    return 1 if warrior.death_cycle > opponent.death_cycle else 0
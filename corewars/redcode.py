@@ -1,3 +1,5 @@
+import hashlib
+import struct
 from dataclasses import dataclass
 from enum import Enum
 from typing import List
@@ -52,6 +54,8 @@ class AddressingMode(Enum):
 
 @dataclass
 class Instruction():
+    # no per-instance __dict__ - a Core holds thousands of instructions
+    __slots__ = ('op_code', 'modifier', 'a_value', 'a_mode', 'b_value', 'b_mode')
     op_code: OpCode
     modifier: Modifier
     a_value: int
@@ -72,3 +76,63 @@ class Instruction():
 class Warrior():
     name: str
     instructions: List[Instruction]
+
+
+# Packed representation of an Instruction - a single 64-bit integer:
+#   bits 57-61  OpCode (OpCode.value)
+#   bits 54-56  Modifier (Modifier.value)
+#   bits 51-53  A addressing mode (index in ADDRESSING_MODES)
+#   bits 48-50  B addressing mode
+#   bits 24-47  A value (24-bit two's complement)
+#   bits 0-23   B value
+# Two instructions are equal exactly when their packed values are.
+ADDRESSING_MODES = list(AddressingMode)
+MODE_CODES = {mode: i for i, mode in enumerate(ADDRESSING_MODES)}
+VALUE_BITS = 24
+VALUE_MASK = (1 << VALUE_BITS) - 1
+VALUE_LIMIT = 1 << (VALUE_BITS - 1)
+_OP_CODES = list(OpCode)
+_MODIFIERS = list(Modifier)
+_OP_CODE_BITS = {op_code: op_code.value << 57 for op_code in OpCode}
+_MODIFIER_BITS = {modifier: modifier.value << 54 for modifier in Modifier}
+_A_MODE_BITS = {mode: code << 51 for mode, code in MODE_CODES.items()}
+_B_MODE_BITS = {mode: code << 48 for mode, code in MODE_CODES.items()}
+
+
+def pack_instruction(instruction: Instruction) -> int:
+    "Returns the packed representation of an instruction, values have to fit in 24 bits."
+    a_value, b_value = instruction.a_value, instruction.b_value
+    if not (-VALUE_LIMIT <= a_value < VALUE_LIMIT and -VALUE_LIMIT <= b_value < VALUE_LIMIT):
+        raise ValueError(f'values of {instruction} don\'t fit in {VALUE_BITS} bits')
+    return (_OP_CODE_BITS[instruction.op_code] | _MODIFIER_BITS[instruction.modifier]
+            | _A_MODE_BITS[instruction.a_mode] | _B_MODE_BITS[instruction.b_mode]
+            | (a_value & VALUE_MASK) << VALUE_BITS | b_value & VALUE_MASK)
+
+
+def unpack_instruction(packed: int) -> Instruction:
+    a_value = packed >> VALUE_BITS & VALUE_MASK
+    b_value = packed & VALUE_MASK
+    return Instruction(
+        _OP_CODES[packed >> 57 & 0x1F],
+        _MODIFIERS[packed >> 54 & 0x7],
+        a_value - (VALUE_LIMIT << 1 if a_value >= VALUE_LIMIT else 0),
+        ADDRESSING_MODES[packed >> 51 & 0x7],
+        b_value - (VALUE_LIMIT << 1 if b_value >= VALUE_LIMIT else 0),
+        ADDRESSING_MODES[packed >> 48 & 0x7]
+    )
+
+
+def pack_warrior(warrior: Warrior) -> bytes:
+    "Compiled form of a warrior's code (without its name) - little-endian packed instructions."
+    packed = [pack_instruction(instruction) for instruction in warrior.instructions]
+    return struct.pack(f'<{len(packed)}Q', *packed)
+
+
+def unpack_warrior(data: bytes, name: str = 'Warrior') -> Warrior:
+    packed = struct.unpack(f'<{len(data) // 8}Q', data)
+    return Warrior(name, [unpack_instruction(instruction) for instruction in packed])
+
+
+def code_hash(warrior: Warrior) -> str:
+    "Hash of the warrior's compiled code - equal for warriors differing only in formatting or name."
+    return hashlib.sha1(pack_warrior(warrior)).hexdigest()[:16]
@@ -0,0 +1,13 @@
+from typing import Sequence
+import numpy as np
+
+
+def round_seed(seed: int, round_number: int, key: Sequence[int] = ()) -> int:
+    """
+    Seed of an independent random stream of a single round, derived from the given seed
+    the way SeedSequence.spawn() derives its children - the round gets the sequence
+    with the spawn key (*key, round_number). The key keeps apart streams of e.g. different pairings.
+    A round can then be replayed from its seed alone (MARS.reset(seed)), wherever it was played.
+    """
+    sequence = np.random.SeedSequence(seed, spawn_key=(*key, round_number))
+    return int(sequence.generate_state(1, np.uint64)[0])
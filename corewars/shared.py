@@ -0,0 +1,163 @@
+from multiprocessing import shared_memory
+from typing import Optional
+from corewars.redcode import ADDRESSING_MODES, MODE_CODES, Instruction, Modifier, OpCode
+
+
+# Layout of a shared Core block (all integers in native byte order):
+#
+#   offset                 type          contents
+#   0                      int32[4]      header: MAGIC, LAYOUT_VERSION, core size, reserved (0)
+#   16                     int32[size]   A-field values
+#   16 + 4*size            int32[size]   B-field values
+#   16 + 8*size            uint8[size]   OpCode values (OpCode.value)
+#   16 + 9*size            uint8[size]   Modifier values (Modifier.value)
+#   16 + 10*size           uint8[size]   A addressing modes (index in ADDRESSING_MODES)
+#   16 + 11*size           uint8[size]   B addressing modes (index in ADDRESSING_MODES)
+#
+# Values are stored already normalized into the [0 - coreSize-1] range.
+MAGIC = 0x52454443 # 'CDER' - just a recognisable constant
+LAYOUT_VERSION = 1
+HEADER_SIZE = 16
+
+
+def block_size(core_size: int) -> int:
+    "Returns the number of bytes needed to store a Core of the given size."
+    return HEADER_SIZE + 12 * core_size
+
+
+class SharedCoreBuffer():
+    """
+    Cell arrays of a Core placed in a multiprocessing.shared_memory block.
+    Written to by the Core which owns it, see the layout description above.
+    """
+    def __init__(self, size: int, name: Optional[str] = None):
+        self.size = size
+        self._memory = shared_memory.SharedMemory(name=name, create=True, size=block_size(size))
+        _map_arrays(self, self._memory.buf, size)
+        header = self._memory.buf[:HEADER_SIZE].cast('i')
+        header[0], header[1], header[2], header[3] = MAGIC, LAYOUT_VERSION, size, 0
+        header.release()
+
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+
+    def store(self, address: int, instruction: Instruction):
+        "Writes all fields of the given instruction into the cell at the given address."
+        self.op_codes[address] = instruction.op_code.value
+        self.modifiers[address] = instruction.modifier.value
+        self.a_modes[address] = MODE_CODES[instruction.a_mode]
+        self.b_modes[address] = MODE_CODES[instruction.b_mode]
+        self.a_values[address] = instruction.a_value
+        self.b_values[address] = instruction.b_value
+
+
+    def store_field(self, address: int, field_name: str, value):
+        "Writes a single instruction field (e.g. 'a_value') of the cell at the given address."
+        if field_name == 'a_value':
+            self.a_values[address] = value
+        elif field_name == 'b_value':
+            self.b_values[address] = value
+        elif field_name == 'op_code':
+            self.op_codes[address] = value.value
+        elif field_name == 'modifier':
+            self.modifiers[address] = value.value
+        elif field_name == 'a_mode':
+            self.a_modes[address] = MODE_CODES[value]
+        elif field_name == 'b_mode':
+            self.b_modes[address] = MODE_CODES[value]
+
+
+    def close(self, unlink: bool = True):
+        """
+        Releases the block. Unless told otherwise it is also unlinked,
+        so views attached by other processes keep working only until they close.
+        """
+        _release_arrays(self)
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+
+
+
+class SharedCoreView():
+    """
+    Read-only view of a Core living in shared memory, meant to be used by other processes
+    (monitoring tools, heatmaps etc.) which want to look at a running battle without copying it.
+    The raw arrays (a_values, b_values, op_codes, modifiers, a_modes, b_modes) are exposed
+    as read-only memoryviews, indexing the view returns a decoded Instruction.
+    """
+    def __init__(self, name: str):
+        memory = shared_memory.SharedMemory(name=name)
+        _untrack(memory)
+        self._memory = memory
+        header = memory.buf[:HEADER_SIZE].cast('i')
+        magic, version, size = header[0], header[1], header[2]
+        header.release()
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            memory.close()
+            raise ValueError(f'{name} does not contain a shared Core (layout version {LAYOUT_VERSION})')
+        self.size = size
+        _map_arrays(self, memory.buf.toreadonly(), size)
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __getitem__(self, key) -> Instruction:
+        address = key % self.size
+        return Instruction(
+            OpCode(self.op_codes[address]),
+            Modifier(self.modifiers[address]),
+            self.a_values[address],
+            ADDRESSING_MODES[self.a_modes[address]],
+            self.b_values[address],
+            ADDRESSING_MODES[self.b_modes[address]]
+        )
+
+
+    def close(self):
+        _release_arrays(self)
+        self._memory.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _map_arrays(target, buffer: memoryview, size: int):
+    "Sets up typed memoryviews over each of the cell arrays of the given buffer."
+    offset = HEADER_SIZE
+    target.a_values = buffer[offset:offset + 4 * size].cast('i')
+    target.b_values = buffer[offset + 4 * size:offset + 8 * size].cast('i')
+    offset += 8 * size
+    target.op_codes = buffer[offset:offset + size].cast('B')
+    target.modifiers = buffer[offset + size:offset + 2 * size].cast('B')
+    target.a_modes = buffer[offset + 2 * size:offset + 3 * size].cast('B')
+    target.b_modes = buffer[offset + 3 * size:offset + 4 * size].cast('B')
+
+
+def _release_arrays(target):
+    # exported memoryviews have to be released before the shared block can be closed
+    for array in (target.a_values, target.b_values, target.op_codes,
+                  target.modifiers, target.a_modes, target.b_modes):
+        array.release()
+
+
+def _untrack(memory: shared_memory.SharedMemory):
+    """
+    Attaching to an existing block registers it with this process' resource tracker,
+    which would then unlink it on exit - a view must never destroy the Core it's watching.
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    except (ImportError, AttributeError, KeyError):
+        pass
@@ -0,0 +1,257 @@
+"""
+Solo trajectories - until warriors interact, each one of them runs exactly as if it were alone
+in the Core. A warrior's solo run is simulated (and recorded relative to its load address) only once,
+the first part of every round is then composed from the recorded runs of its warriors
+at any offsets, and MARS takes over only at the first cycle in which a warrior touches a cell
+which another warrior has touched (or loaded its code into) before.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from corewars.core import Core, CoreWarrior
+from corewars.mars import MARS
+from corewars.parser import Parser
+from corewars.redcode import Warrior, code_hash, pack_instruction, unpack_instruction
+
+
+# number of turns by which trajectories get extended when they're too short
+EXTEND_TURNS = 256
+
+
+class Trajectory():
+    """
+    Solo run of a single warrior, loaded at address 0 of an otherwise empty Core.
+    For every turn of the warrior it keeps the cells it touched (executed, read or wrote to),
+    the contents of the cells it wrote to after the turn and how its process queue changed:
+    () if the current process was killed, (pointer,) if it continued at the given address
+    and (pointer, new process) if it split. Turns are simulated lazily, as far as they're needed.
+    """
+    def __init__(self, warrior: Warrior, core_size: int = 8000):
+        self.length = len(warrior.instructions)
+        self._mars = MARS()
+        self._mars.record_reads = True
+        if self._mars.core.size != core_size:
+            self._mars.core = Core(core_size)
+        self._warrior = self._mars.core.load_warrior(warrior, 0)
+        self.touched: List[Tuple[int, ...]] = []
+        self.writes: List[Tuple[Tuple[int, int], ...]] = []
+        self.events: List[Tuple[int, ...]] = []
+        # turn during which the last process of the warrior was killed
+        self.death_turn: Optional[int] = None
+
+
+    def __len__(self):
+        "Number of recorded turns."
+        return len(self.events)
+
+
+    def extend(self, turns: int):
+        "Simulates the warrior until the given number of turns is recorded or until it dies."
+        mars, warrior = self._mars, self._warrior
+        core = mars.core
+        size = core.size
+        processes = warrior._processes
+        while len(self.events) < turns and self.death_turn is None:
+            touched = {warrior.current_pointer}
+            before = len(processes)
+            written = {address % size for address in mars.cycle()}
+            touched.update(address % size for address in mars.cells_read)
+            touched.update(written)
+            self.touched.append(tuple(touched))
+            self.writes.append(tuple((address, pack_instruction(core[address])) for address in written))
+            if len(processes) < before:
+                self.events.append(())
+            elif len(processes) > before:
+                self.events.append((processes[-2], processes[-1]))
+            else:
+                self.events.append((processes[-1],))
+            if not processes:
+                self.death_turn = len(self.events) - 1
+
+
+class SoloCache():
+    "Trajectories of warriors by the hash of their code, shared by rounds against any opponents."
+    def __init__(self):
+        self._trajectories: Dict[Tuple[str, int], Trajectory] = {}
+
+
+    def __len__(self):
+        return len(self._trajectories)
+
+
+    def trajectory(self, warrior: Warrior, core_size: int = 8000) -> Trajectory:
+        key = (code_hash(warrior), core_size)
+        if key not in self._trajectories:
+            self._trajectories[key] = Trajectory(warrior, core_size)
+        return self._trajectories[key]
+
+
+class _Composition():
+    "State of a round being composed from trajectories."
+    def __init__(self, warriors: List[CoreWarrior], trajectories: List[Trajectory]):
+        # warrior -> its position in the lists below
+        self.slots = {warrior: i for i, warrior in enumerate(warriors)}
+        self.warriors = warriors
+        self.trajectories = trajectories
+        # turns taken by each warrior, and how many of them have their writes in the Core already
+        self.turns = [0] * len(warriors)
+        self.applied = [0] * len(warriors)
+        # address -> position of the warrior which touched it first
+        self.owners: Dict[int, int] = {}
+
+
+class SoloMARS(MARS):
+    """
+    MARS which composes the beginning of each round from solo trajectories of its warriors,
+    running the rest as usual from the first interaction on. Results are exactly the same.
+    Trajectories are kept in the cache, so rounds of a match (reusing a single SoloMARS
+    with reset(), like match.run_match does) and sweeps over offsets share them.
+    Only used for rounds without a Heatmap, Timelines, the UndoLog or a shared Core,
+    of warriors loaded with Core.load_warrior() (or load_warriors()).
+    cells_read isn't updated by composed cycles.
+    """
+    def __init__(self, *args, cache: Optional[SoloCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache if cache is not None else SoloCache()
+        self._composition: Optional[_Composition] = None
+        # cycle before which the warriors first interacted, None until they do
+        self.interaction_cycle: Optional[int] = None
+
+
+    def reset(self, seed: Optional[int] = None):
+        super().reset(seed)
+        self._composition = None
+        self.interaction_cycle = None
+
+
+    def cycle(self) -> List[int]:
+        # any cycle executed directly puts an end to the composition
+        self._composition = None
+        return super().cycle()
+
+
+    def run(self, max_cycles: int = 80000):
+        # a single warrior is allowed to run on its own until it dies
+        loaded = self.core.warriors_count + len(self.core.dead_warriors)
+        self._compose(max_cycles, 1 if loaded > 1 else 0)
+        return super().run(max_cycles)
+
+
+    def advance(self, cycle: int):
+        "Runs until the given cycle or until no warriors are left - like calling cycle() repeatedly."
+        self._compose(cycle, 0)
+        while self.cycles < cycle and self.core.warriors_count > 0:
+            self.cycle()
+
+
+    def _can_compose(self) -> bool:
+        return (self.heatmap is None and self.undo_log is None and not self.core._shared
+                and all(warrior.timeline is None and warrior.source is not None
+                        for warrior in self.core.turn_order))
+
+
+    def _start(self) -> Optional[_Composition]:
+        "Starts composing a round which hasn't started yet, None if the warriors' code overlaps."
+        core = self.core
+        warriors = list(core._warriors)
+        trajectories = [self.cache.trajectory(warrior.source, core.size) for warrior in warriors]
+        composition = _Composition(warriors, trajectories)
+        for slot, warrior in enumerate(warriors):
+            for i in range(trajectories[slot].length):
+                address = (warrior.start_address + i) % core.size
+                if composition.owners.setdefault(address, slot) != slot:
+                    return None
+        return composition
+
+
+    def _compose(self, max_cycles: int, warriors_left: int):
+        "Composes cycles of the round until the warriors interact or until the round is over."
+        composition = self._composition
+        if composition is None:
+            if self.cycles != 0 or self.interaction_cycle is not None or not self._can_compose():
+                return
+            composition = self._start()
+            if composition is None:
+                self.interaction_cycle = 0
+                return
+            self._composition = composition
+        core = self.core
+        size = core.size
+        warriors = core._warriors
+        slots, trajectories, turns, owners = (
+            composition.slots, composition.trajectories, composition.turns, composition.owners
+        )
+        cycles = self.cycles
+        while cycles < max_cycles and len(warriors) > warriors_left:
+            warrior = warriors[0]
+            slot = slots[warrior]
+            trajectory = trajectories[slot]
+            turn = turns[slot]
+            if turn == len(trajectory):
+                trajectory.extend(turn + EXTEND_TURNS)
+            start = warrior.start_address
+            interacted = False
+            for cell in trajectory.touched[turn]:
+                if owners.setdefault((start + cell) % size, slot) != slot:
+                    interacted = True
+                    break
+            if interacted:
+                self.interaction_cycle = cycles
+                self._composition = None
+                break
+            event = trajectory.events[turn]
+            if not event:
+                warrior.kill_current_process()
+            else:
+                warrior.current_pointer = start + event[0]
+                if len(event) == 2:
+                    warrior.add_process(start + event[1])
+            turns[slot] = turn + 1
+            cycles += 1
+            if len(warrior) == 0:
+                warrior.death_cycle = cycles
+            core.rotate_warrior()
+        self.cycles = cycles
+        self._apply_writes(composition)
+
+
+    def _apply_writes(self, composition: _Composition):
+        "Copies the latest contents of cells written to by the composed turns into the Core."
+        core = self.core
+        for slot, warrior in enumerate(composition.warriors):
+            writes = composition.trajectories[slot].writes
+            latest = {}
+            for turn in range(composition.applied[slot], composition.turns[slot]):
+                latest.update(writes[turn])
+            composition.applied[slot] = composition.turns[slot]
+            for cell, packed in latest.items():
+                address = core.normalize_value(warrior.start_address + cell)
+                instruction = unpack_instruction(packed)
+                target = core[address]
+                target.op_code = instruction.op_code
+                target.modifier = instruction.modifier
+                target.a_mode = instruction.a_mode
+                target.b_mode = instruction.b_mode
+                target.a_value = instruction.a_value
+                target.b_value = instruction.b_value
+                core.mark_dirty([address])
+
+
+def position_sweep(
+    warrior: List[str], opponent: List[str], offsets: Iterable[int], max_cycles: int = 80000,
+    cache: Optional[SoloCache] = None
+) -> List[Tuple[int, Optional[int], int]]:
+    """
+    Plays one round for each offset of the opponent (given as lines of Redcode) from the warrior,
+    which is loaded at address 0 and moves first. Returns (offset, index of the winner or None
+    in case of a tie, number of cycles) for each offset.
+    """
+    warriors = [Parser.parse_warrior(warrior), Parser.parse_warrior(opponent)]
+    mars = SoloMARS(cache=cache)
+    results = []
+    for offset in offsets:
+        mars.reset()
+        for index, (parsed, address) in enumerate(zip(warriors, (0, offset))):
+            mars.core.load_warrior(parsed, address).index = index
+        result = mars.run(max_cycles)
+        winner = None if result.winner is None else result.winner.index
+        results.append((offset, winner, result.cycles))
+    return results
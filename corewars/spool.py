@@ -0,0 +1,316 @@
+"""
+File-spool tournaments - a full pairing schedule is split into job files in a shared directory,
+from which any number of workers (on any number of machines) claim jobs, run them with MARS
+and write result shards, which are finally merged into the score table.
+
+Directory layout:
+    warriors/<hash>.red     sources of all warriors, named by their content hash
+    pending/<job>.json      jobs waiting to be claimed
+    claimed/<job>.<claim>.json
+                            jobs being run, named by the claim's unique token -
+                            the file's mtime serves as the worker's heartbeat
+    done/<job>.json         finished jobs
+    results/<job>.json      result shard of each finished job
+    logged/<job>            empty markers of shards already appended to the battle log
+
+Claiming is a rename from pending/ to claimed/, which is atomic on a shared filesystem,
+so each job is run by exactly one worker. Jobs of crashed workers are put back with requeue_stale().
+A worker whose claim was requeued in the meantime abandons the job, leaving it to the next one -
+even if it has been claimed again already, as every claim gets a file name of its own.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import socket
+import time
+import uuid
+from itertools import combinations
+from typing import Dict, List, Optional
+from corewars.battlelog import BattleLog
+from corewars.mars import MARS
+from corewars.parser import Parser
+from corewars.redcode import code_hash
+from corewars.seeding import round_seed as spawn_seed
+
+
+PENDING, CLAIMED, DONE, RESULTS, WARRIORS, LOGGED = 'pending', 'claimed', 'done', 'results', 'warriors', 'logged'
+
+
+def warrior_hash(lines: List[str]) -> str:
+    "Returns a hash of the warrior's compiled code, so that differently formatted copies are run once."
+    return code_hash(Parser.parse_warrior(lines))
+
+
+def round_seed(seed: int, pairing: List[str], round_number: int) -> int:
+    "Deterministic seed of a single round, derived from the tournament seed - independent for each pairing."
+    return spawn_seed(seed, round_number, [int(warrior, 16) for warrior in pairing])
+
+
+def create_jobs(
+    directory: str, warrior_files: List[str], rounds: int, seed: int = 0,
+    rounds_per_job: int = 50, max_cycles: int = 80000
+) -> int:
+    """
+    Creates the spool for a round robin tournament between the given warriors (or adds jobs to an existing one):
+    every pairing plays the given number of rounds, split into jobs of up to rounds_per_job rounds.
+    Returns the number of created jobs.
+    """
+    for subdirectory in (PENDING, CLAIMED, DONE, RESULTS, WARRIORS, LOGGED):
+        os.makedirs(os.path.join(directory, subdirectory), exist_ok=True)
+    hashes = []
+    for path in warrior_files:
+        with open(path) as file:
+            lines = file.readlines()
+        warrior = warrior_hash(lines)
+        if warrior not in hashes:
+            hashes.append(warrior)
+            _write_atomically(os.path.join(directory, WARRIORS, f'{warrior}.red'), ''.join(lines))
+    jobs = 0
+    # jobs added to an existing spool are numbered after the ones already there
+    first_job = _next_job_number(directory)
+    for pairing in combinations(sorted(hashes), 2):
+        for first_round in range(0, rounds, rounds_per_job):
+            job = {
+                'id': f'job-{first_job + jobs:06d}',
+                'pairing': list(pairing),
+                'seeds': [round_seed(seed, pairing, i)
+                          for i in range(first_round, min(first_round + rounds_per_job, rounds))],
+                'max_cycles': max_cycles,
+            }
+            _write_atomically(os.path.join(directory, PENDING, f'{job["id"]}.json'), json.dumps(job))
+            jobs += 1
+    return jobs
+
+
+def claim_job(directory: str, worker: str = '') -> Optional[dict]:
+    """
+    Claims one of the pending jobs, returns None if there are none left.
+    The job's 'claim' is the token identifying this claim of it, used by run_job().
+    """
+    for path in sorted(glob.glob(os.path.join(directory, PENDING, '*.json'))):
+        job_id = os.path.basename(path)[:-len('.json')]
+        token = f'{worker or socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex}'.replace('.', '-')
+        claimed = _claimed_path(directory, job_id, token)
+        try:
+            # the heartbeat starts now, not when the job was created - rename keeps the mtime,
+            # so the claim never shows up in claimed/ looking stale
+            os.utime(path)
+            os.rename(path, claimed)
+            with open(claimed) as file:
+                job = json.load(file)
+        except FileNotFoundError:
+            # some other worker was faster (or the claim was requeued already)
+            continue
+        job['claim'] = token
+        return job
+    return None
+
+
+def run_job(directory: str, job: dict, worker: str = '') -> Optional[dict]:
+    """
+    Runs all rounds of a claimed job, writes and returns its result shard.
+    Returns None if the claim was lost - the job was requeued by requeue_stale() in the meantime.
+    """
+    claimed = _claimed_path(directory, job['id'], job['claim'])
+    sources = []
+    for warrior in job['pairing']:
+        with open(os.path.join(directory, WARRIORS, f'{warrior}.red')) as file:
+            sources.append(file.readlines())
+    rounds = []
+    mars = MARS()
+    for seed in job['seeds']:
+        # placement is the only random part of a round, each one has a random stream of its own
+        mars.reset(seed)
+        mars.load_warriors(sources)
+        result = mars.run(job['max_cycles'])
+        winner = None if result.winner is None else job['pairing'][result.winner.index]
+        rounds.append({
+            'seed': seed, 'winner': winner, 'cycles': result.cycles,
+            'offsets': [warrior.start_address for warrior in result.warriors],
+            'deaths': [warrior.death_cycle for warrior in result.warriors],
+        })
+        if not _heartbeat(claimed):
+            return None
+    shard = {'id': job['id'], 'pairing': job['pairing'], 'worker': worker, 'rounds': rounds}
+    _write_atomically(os.path.join(directory, RESULTS, f'{job["id"]}.json'), json.dumps(shard))
+    try:
+        os.rename(claimed, os.path.join(directory, DONE, f'{job["id"]}.json'))
+    except FileNotFoundError:
+        # requeued just now - whoever runs it again writes the same results
+        return None
+    return shard
+
+
+def run_worker(directory: str, worker: Optional[str] = None, max_jobs: Optional[int] = None) -> int:
+    "Keeps claiming and running jobs until there are none left. Returns the number of finished jobs."
+    worker = worker or f'{socket.gethostname()}-{os.getpid()}'
+    jobs = 0
+    while max_jobs is None or jobs < max_jobs:
+        job = claim_job(directory, worker)
+        if job is None:
+            break
+        if run_job(directory, job, worker) is not None:
+            jobs += 1
+    return jobs
+
+
+def requeue_stale(directory: str, timeout: float) -> List[str]:
+    """
+    Puts jobs whose workers haven't shown any sign of life for 'timeout' seconds back into pending/,
+    so they can be resumed by other workers. Returns IDs of the requeued jobs.
+    """
+    requeued = []
+    for path in glob.glob(os.path.join(directory, CLAIMED, '*.json')):
+        # job IDs don't contain dots, claim tokens follow them
+        job_id = os.path.basename(path).split('.')[0]
+        try:
+            if time.time() - os.path.getmtime(path) < timeout:
+                continue
+            if os.path.exists(os.path.join(directory, RESULTS, f'{job_id}.json')):
+                # crashed after writing its results - nothing to run again
+                os.rename(path, os.path.join(directory, DONE, f'{job_id}.json'))
+            else:
+                os.rename(path, os.path.join(directory, PENDING, f'{job_id}.json'))
+                requeued.append(job_id)
+        except FileNotFoundError:
+            # finished (or requeued by someone else) in the meantime
+            continue
+    return requeued
+
+
+def status(directory: str) -> Dict[str, int]:
+    "Returns the number of jobs in each state."
+    return {
+        state: len(glob.glob(os.path.join(directory, state, '*.json')))
+        for state in (PENDING, CLAIMED, DONE)
+    }
+
+
+def merge_results(directory: str) -> List[dict]:
+    """
+    Combines all result shards into the score table (3 points per win, 1 per tie),
+    sorted from the best warrior. Entries contain the warrior's hash, name and its record.
+    """
+    table: Dict[str, dict] = {}
+    for path in glob.glob(os.path.join(directory, WARRIORS, '*.red')):
+        warrior = os.path.basename(path)[:-len('.red')]
+        with open(path) as file:
+            name = Parser.parse_warrior(file.readlines()).name
+        table[warrior] = {'hash': warrior, 'name': name, 'wins': 0, 'losses': 0, 'ties': 0, 'score': 0}
+    for path in sorted(glob.glob(os.path.join(directory, RESULTS, '*.json'))):
+        with open(path) as file:
+            shard = json.load(file)
+        for played in shard['rounds']:
+            for warrior in shard['pairing']:
+                entry = table[warrior]
+                if played['winner'] is None:
+                    entry['ties'] += 1
+                    entry['score'] += 1
+                elif played['winner'] == warrior:
+                    entry['wins'] += 1
+                    entry['score'] += 3
+                else:
+                    entry['losses'] += 1
+    return sorted(table.values(), key=lambda entry: entry['score'], reverse=True)
+
+
+def log_results(directory: str, log: BattleLog) -> int:
+    """
+    Appends rounds of result shards which haven't been logged yet to the battle log,
+    so it can be called repeatedly while the tournament goes on. Returns the number of appended rounds.
+    """
+    logged_directory = os.path.join(directory, LOGGED)
+    # spools created before logged/ existed
+    os.makedirs(logged_directory, exist_ok=True)
+    logged = set(os.listdir(logged_directory))
+    appended = 0
+    shards = []
+    for path in sorted(glob.glob(os.path.join(directory, RESULTS, '*.json'))):
+        job_id = os.path.basename(path)[:-len('.json')]
+        if job_id in logged:
+            continue
+        with open(path) as file:
+            shard = json.load(file)
+        shards.append(job_id)
+        pairing = shard['pairing']
+        for played in shard['rounds']:
+            winner = None if played['winner'] is None else pairing.index(played['winner'])
+            log.append(tuple(pairing), played['seed'], tuple(played['offsets']), winner,
+                       played['cycles'], tuple(played['deaths']))
+            appended += 1
+    log.flush()
+    # marked only once the rounds are safely in the log
+    for job_id in shards:
+        open(os.path.join(logged_directory, job_id), 'w').close()
+    return appended
+
+
+def _next_job_number(directory: str) -> int:
+    numbers = [-1]
+    for state in (PENDING, CLAIMED, DONE, RESULTS, LOGGED):
+        for name in os.listdir(os.path.join(directory, state)):
+            match = re.match(r'job-(\d+)', name)
+            if match:
+                numbers.append(int(match.group(1)))
+    return max(numbers) + 1
+
+
+def _claimed_path(directory: str, job_id: str, token: str) -> str:
+    return os.path.join(directory, CLAIMED, f'{job_id}.{token}.json')
+
+
+def _heartbeat(claimed: str) -> bool:
+    "Refreshes the claim's mtime, returns False if the claim is gone."
+    try:
+        os.utime(claimed)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _write_atomically(path: str, content: str):
+    # readers never see partially written files
+    temporary = f'{path}.{socket.gethostname()}-{os.getpid()}.tmp'
+    with open(temporary, 'w') as file:
+        file.write(content)
+    os.replace(temporary, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Core Wars file-spool tournaments')
+    parser.add_argument('directory', help='Shared spool directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help='Create jobs of a round robin tournament')
+    create.add_argument('warriors', nargs='+', help='Warrior files')
+    create.add_argument('--rounds', type=int, default=100)
+    create.add_argument('--seed', type=int, default=0)
+    create.add_argument('--rounds-per-job', type=int, default=50)
+    create.add_argument('--cycles', type=int, default=80000)
+    commands.add_parser('worker', help='Run pending jobs')
+    requeue = commands.add_parser('requeue', help='Requeue jobs of crashed workers')
+    requeue.add_argument('--timeout', type=float, default=600, help='Seconds without a heartbeat')
+    commands.add_parser('merge', help='Print the score table')
+    log = commands.add_parser('log', help='Append all results to a battle log')
+    log.add_argument('log_directory', help='Directory of the battle log')
+    args = parser.parse_args()
+    if args.command == 'create':
+        jobs = create_jobs(args.directory, args.warriors, args.rounds, args.seed,
+                           args.rounds_per_job, args.cycles)
+        print(f'{jobs} jobs created')
+    elif args.command == 'worker':
+        print(f'{run_worker(args.directory)} jobs finished')
+    elif args.command == 'requeue':
+        print(f'{len(requeue_stale(args.directory, args.timeout))} jobs requeued')
+    elif args.command == 'log':
+        print(f'{log_results(args.directory, BattleLog(args.log_directory))} rounds logged')
+    else:
+        print(status(args.directory))
+        for place, entry in enumerate(merge_results(args.directory), 1):
+            print(f'{place:3}. {entry["name"]:<24} {entry["score"]:6}  '
+                  f'{entry["wins"]}/{entry["losses"]}/{entry["ties"]}  {entry["hash"]}')
+
+
+if __name__ == '__main__':
+    main()
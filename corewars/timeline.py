@@ -0,0 +1,96 @@
+from typing import Dict
+import numpy as np
+
+
+class Timeline():
+    """
+    Downsampled history of a single warrior - its process count, number of processes
+    created (births) and killed (deaths) since the previous sample and the region of the Core
+    its current process is in. A sample is taken at most once every 'stride' cycles
+    (and always when the warrior dies) into preallocated ring buffers,
+    so only the last 'capacity' samples are kept and memory use stays bounded.
+    """
+    def __init__(self, capacity: int = 1024, stride: int = 100, region_size: int = 100):
+        self.capacity = capacity
+        self.stride = stride
+        self.region_size = region_size
+        self._cycles = np.zeros(capacity, dtype=np.int64)
+        self._processes = np.zeros(capacity, dtype=np.int32)
+        self._births = np.zeros(capacity, dtype=np.int32)
+        self._deaths = np.zeros(capacity, dtype=np.int32)
+        self._regions = np.zeros(capacity, dtype=np.int32)
+        # index the next sample will be written to and the number of samples stored
+        self._position = 0
+        self._count = 0
+        self._next_sample = 0
+        # counted by CoreWarrior since the last sample
+        self.pending_births = 0
+        self.pending_deaths = 0
+
+
+    def __len__(self):
+        return self._count
+
+
+    def tick(self, cycle: int, warrior):
+        "Called by MARS after each of the warrior's turns, takes a sample if one is due."
+        if cycle >= self._next_sample or len(warrior) == 0:
+            self.sample(cycle, warrior)
+
+
+    def sample(self, cycle: int, warrior):
+        "Stores the current state of the given CoreWarrior, overwriting the oldest sample if full."
+        i = self._position
+        self._cycles[i] = cycle
+        self._processes[i] = len(warrior)
+        self._births[i] = self.pending_births
+        self._deaths[i] = self.pending_deaths
+        # -1 marks a dead warrior
+        self._regions[i] = warrior.current_pointer // self.region_size if len(warrior) else -1
+        self.pending_births = self.pending_deaths = 0
+        self._position = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self._next_sample = cycle + self.stride
+
+
+    def _ordered(self, array: np.ndarray) -> np.ndarray:
+        # oldest sample first
+        if self._count < self.capacity:
+            return array[:self._count].copy()
+        return np.roll(array, -self._position)
+
+
+    @property
+    def cycles(self) -> np.ndarray:
+        return self._ordered(self._cycles)
+
+
+    @property
+    def processes(self) -> np.ndarray:
+        return self._ordered(self._processes)
+
+
+    @property
+    def births(self) -> np.ndarray:
+        return self._ordered(self._births)
+
+
+    @property
+    def deaths(self) -> np.ndarray:
+        return self._ordered(self._deaths)
+
+
+    @property
+    def regions(self) -> np.ndarray:
+        return self._ordered(self._regions)
+
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        "Returns all the stored samples in chronological order."
+        return {
+            'cycles': self.cycles,
+            'processes': self.processes,
+            'births': self.births,
+            'deaths': self.deaths,
+            'regions': self.regions,
+        }
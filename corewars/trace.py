@@ -0,0 +1,337 @@
+from typing import Callable, Dict, List, Optional
+from corewars.mars import MARS
+from corewars.redcode import AddressingMode, Instruction, Modifier, OpCode, pack_instruction
+
+
+# instructions which can change the number of processes - always executed by MARS.cycle()
+FALLBACK_OP_CODES = (OpCode.DAT, OpCode.SPL, OpCode.DIV, OpCode.MOD)
+# backward jumps to an address after which a loop starting there gets recorded (then after 8, 16...)
+HOT_LOOP = 4
+MAX_TRACE_LENGTH = 32
+
+A_FIELD_MODES = (AddressingMode.A_INDIRECT, AddressingMode.A_PREDEC, AddressingMode.A_POSTINC)
+PREDEC_MODES = (AddressingMode.A_PREDEC, AddressingMode.B_PREDEC)
+POSTINC_MODES = (AddressingMode.A_POSTINC, AddressingMode.B_POSTINC)
+MATH_OPERATORS = {OpCode.ADD: '+', OpCode.SUB: '-', OpCode.MUL: '*'}
+SKIP_OPERATORS = {OpCode.SEQ: '==', OpCode.CMP: '==', OpCode.SNE: '!=', OpCode.SLT: '<'}
+# (source field, destination field) pairs used by each modifier
+FIELD_PAIRS = {
+    Modifier.A: (('a', 'a'),),
+    Modifier.B: (('b', 'b'),),
+    Modifier.AB: (('a', 'b'),),
+    Modifier.BA: (('b', 'a'),),
+    Modifier.F: (('a', 'a'), ('b', 'b')),
+    Modifier.I: (('a', 'a'), ('b', 'b')),
+    Modifier.X: (('a', 'b'), ('b', 'a')),
+}
+
+_MISSING = object()
+
+
+class TraceMARS(MARS):
+    """
+    MARS which executes rounds (run()) faster, giving exactly the same results.
+    Every instruction gets compiled into a Python function specialised for its op code, modifier,
+    modes and values, so that it doesn't have to be decoded every time it's executed. While only
+    a single process is left in the whole Core (nothing can interleave with it), hot loops
+    are additionally recorded and fused into one function executing the whole loop body per call.
+    Writing to a compiled cell discards its code (and fused loops containing it) right away.
+    Instructions which can change the number of processes (DAT, SPL, DIV, MOD) are left
+    to MARS.cycle(), and so are whole rounds if a Heatmap, Timelines, the UndoLog or a shared Core
+    are used. cycle() itself is unchanged, cells_read isn't updated by compiled instructions.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # packed instruction -> function executing it at any address, None if it's left to MARS.cycle()
+        self._steps: Dict[int, Optional[Callable]] = {}
+        # address -> step function of the cell's current contents
+        self._handlers: Dict[int, Optional[Callable]] = {}
+        # address of a loop's first instruction -> fused function running the loop
+        self._traces: Dict[int, Callable] = {}
+        # addresses of compiled cells -> first addresses of fused loops they're a part of
+        self._watched: Dict[int, List[int]] = {}
+        # number of backward jumps to each address
+        self._heat: Dict[int, int] = {}
+        # globals of the generated code
+        self._namespace = {'watched': self._watched, 'invalidate': self._invalidate}
+
+
+    def run(self, max_cycles: int = 80000):
+        if not self._can_compile():
+            return super().run(max_cycles)
+        # a single warrior is allowed to run on its own until it dies
+        loaded = self.core.warriors_count + len(self.core.dead_warriors)
+        self._execute(max_cycles, 1 if loaded > 1 else 0)
+        return self.result()
+
+
+    def advance(self, cycle: int):
+        "Runs until the given cycle or until no warriors are left - like calling cycle() repeatedly."
+        if not self._can_compile():
+            while self.cycles < cycle and self.core.warriors_count > 0:
+                self.cycle()
+            return
+        self._execute(cycle, 0)
+
+
+    def _can_compile(self) -> bool:
+        return (self.heatmap is None and self.undo_log is None and not self.core._shared
+                and all(warrior.timeline is None for warrior in self.core.turn_order))
+
+
+    def _execute(self, max_cycles: int, warriors_left: int):
+        self._prepare()
+        warriors = self.core._warriors
+        handlers = self._handlers
+        cycles = self.cycles
+        while cycles < max_cycles and len(warriors) > warriors_left:
+            processes = warriors[0]._processes
+            if len(processes) == 1 and len(warriors) == 1:
+                self.cycles = cycles
+                self._run_alone(processes, max_cycles)
+                cycles = self.cycles
+                continue
+            pointer = processes[0]
+            handler = handlers.get(pointer, _MISSING)
+            if handler is _MISSING:
+                handler = self._handler(pointer)
+            if handler is None:
+                self.cycles = cycles
+                self._fallback()
+                cycles = self.cycles
+                continue
+            processes[0] = handler(pointer)
+            # same as Core.rotate_warrior() for a warrior which still has processes
+            processes.rotate(-1)
+            warriors.rotate(-1)
+            cycles += 1
+        self.cycles = cycles
+
+
+    def _run_alone(self, processes, max_cycles: int):
+        "Runs the only process in the Core until max_cycles or until MARS.cycle() is needed."
+        handlers, traces, heat = self._handlers, self._traces, self._heat
+        pointer = processes[0]
+        cycles = self.cycles
+        recording = None
+        while cycles < max_cycles:
+            trace = traces.get(pointer)
+            if trace is not None:
+                recording = None
+                pointer, executed = trace(max_cycles - cycles)
+                if executed:
+                    cycles += executed
+                    continue
+            handler = handlers.get(pointer, _MISSING)
+            if handler is _MISSING:
+                handler = self._handler(pointer)
+            if handler is None:
+                processes[0] = pointer
+                self.cycles = cycles
+                self._fallback()
+                return
+            next_pointer = handler(pointer)
+            cycles += 1
+            if recording is not None:
+                if next_pointer == recording[0]:
+                    self._fuse(recording)
+                    recording = None
+                elif len(recording) == MAX_TRACE_LENGTH:
+                    recording = None
+                else:
+                    recording.append(next_pointer)
+            elif next_pointer <= pointer:
+                count = heat.get(next_pointer, 0) + 1
+                heat[next_pointer] = count
+                # back off exponentially for loops which keep modifying themselves
+                if count >= HOT_LOOP and count & (count - 1) == 0:
+                    recording = [next_pointer]
+            pointer = next_pointer
+        processes[0] = pointer
+        self.cycles = cycles
+
+
+    def _prepare(self):
+        core = self.core
+        # compiled code accesses the list of cells directly, giving cells an instance of their own
+        # only before writing to them (like Core[address] does), so reset() stays cheap
+        self._namespace.update(cells=core._instructions, size=core.size, mark=core._dirty.add,
+                               blank=core._blank, materialize=core._materialize)
+        # cells might have been changed by anything since the last run
+        self._handlers.clear()
+        self._traces.clear()
+        self._watched.clear()
+        self._heat.clear()
+
+
+    def _handler(self, address: int) -> Optional[Callable]:
+        cell = self.core._instructions[address]
+        packed = pack_instruction(cell)
+        if packed not in self._steps:
+            self._steps[packed] = self._compile_step(cell)
+        handler = self._handlers[address] = self._steps[packed]
+        self._watched.setdefault(address, [])
+        return handler
+
+
+    def _invalidate(self, address: int) -> bool:
+        self._handlers.pop(address, None)
+        for head in self._watched.pop(address):
+            self._traces.pop(head, None)
+        return True
+
+
+    def _fallback(self):
+        size = self.core.size
+        for address in MARS.cycle(self):
+            address %= size
+            if address in self._watched:
+                self._invalidate(address)
+
+
+    def _compile_step(self, cell: Instruction) -> Optional[Callable]:
+        if cell.op_code in FALLBACK_OP_CODES:
+            return None
+        lines = instruction_code(cell, None, self.core.size)
+        source = 'def step(p):\n    stale = False\n' + _indent(lines, 1) + '    return n\n'
+        return self._define(source, 'step')
+
+
+    def _fuse(self, addresses: List[int]):
+        "Compiles the loop going through the given addresses into a single function."
+        if not all(self._handlers.get(address) for address in addresses):
+            # contains an instruction left to MARS.cycle() or was modified in the meantime
+            return
+        head, length = addresses[0], len(addresses)
+        lines = ['done = 0', 'stale = False', f'while done + {length} <= limit:']
+        for i, address in enumerate(addresses):
+            expected = addresses[(i + 1) % length]
+            lines += _indent(instruction_code(self.core._instructions[address], address, self.core.size), 1, False)
+            lines.append(f'    if stale or n != {expected}:')
+            lines.append(f'        return n, done + {i + 1}')
+        lines += [f'    done += {length}', f'return {head}, done']
+        source = 'def trace(limit):\n' + _indent(lines, 1)
+        self._traces[head] = self._define(source, 'trace')
+        for address in addresses:
+            self._watched[address].append(head)
+
+
+    def _define(self, source: str, name: str) -> Callable:
+        exec(compile(source, f'<{name}>', 'exec'), self._namespace)
+        return self._namespace.pop(name)
+
+
+def instruction_code(instruction: Instruction, address: Optional[int], size: int) -> List[str]:
+    """
+    Returns lines of Python code executing the given instruction exactly like MARS.cycle() would,
+    apart from process queue changes - the next instruction pointer is left in n.
+    The instruction's address is either known (an int) or given by p at runtime.
+    Expects cells, size, mark (adds to Core's dirty cells), blank (Core's shared default cell),
+    materialize (Core._materialize), watched and invalidate to be defined.
+    """
+    here = 'p' if address is None else str(address)
+    lines: List[str] = []
+
+    def offset(value: int) -> str:
+        if address is None:
+            return f'(p + {value}) % size'
+        return str((address + value) % size)
+
+    def writable(variable: str) -> List[str]:
+        # the shared default cell can't be changed, the cell gets an instance of its own first
+        return [f'c = cells[{variable}]', 'if c is blank:', f'    c = materialize({variable})']
+
+    def written(variable: str) -> List[str]:
+        return [f'mark({variable})', f'if {variable} in watched:', f'    stale = invalidate({variable})']
+
+    def operand(prefix: str, mode: AddressingMode, value: int):
+        "Evaluates an operand, returns the variable holding its address and its post-increment code."
+        if mode == AddressingMode.IMMEDIATE:
+            lines.append(f'{prefix}x = {here}')
+            return []
+        if mode == AddressingMode.DIRECT:
+            lines.append(f'{prefix}x = {offset(value)}')
+            return []
+        pointer = f'{prefix}t'
+        field = '_a_value' if mode in A_FIELD_MODES else '_b_value'
+        lines.append(f'{pointer} = {offset(value)}')
+        if mode in PREDEC_MODES:
+            lines.extend(writable(pointer))
+            lines.append(f'c.{field} = (c.{field} - 1) % size')
+            lines.extend(written(pointer))
+        lines.append(f'{prefix}x = ({pointer} + cells[{pointer}].{field}) % size')
+        if mode in POSTINC_MODES:
+            return writable(pointer) + [f'c.{field} = (c.{field} + 1) % size'] + written(pointer)
+        return []
+
+    def register(name: str, address_variable: str, whole: bool):
+        # registers are copies taken right after the operand is evaluated
+        lines.append(f'r = cells[{address_variable}]')
+        lines.append(f'{name}a, {name}b = r._a_value, r._b_value')
+        if whole:
+            lines.append(f'{name}op, {name}mod, {name}am, {name}bm = r.op_code, r.modifier, r.a_mode, r.b_mode')
+
+    op_code, modifier = instruction.op_code, instruction.modifier
+    whole = modifier == Modifier.I and op_code in (OpCode.MOV, OpCode.SEQ, OpCode.CMP, OpCode.SNE)
+    uses_source = op_code == OpCode.MOV or op_code in MATH_OPERATORS or op_code in SKIP_OPERATORS
+    uses_destination = uses_source and op_code != OpCode.MOV or op_code in (OpCode.JMZ, OpCode.JMN)
+    post = operand('a', instruction.a_mode, instruction.a_value)
+    if uses_source:
+        register('s', 'ax', whole)
+    lines.extend(post)
+    post = operand('b', instruction.b_mode, instruction.b_value)
+    if uses_destination:
+        register('d', 'bx', whole)
+    lines.extend(post)
+    lines.append(f'n = {offset(1)}')
+    pairs = FIELD_PAIRS[modifier]
+    if op_code == OpCode.MOV:
+        lines.extend(writable('bx'))
+        if modifier == Modifier.I:
+            lines.append('c.op_code, c.modifier, c.a_mode, c.b_mode = sop, smod, sam, sbm')
+        for source, destination in pairs:
+            lines.append(f'c._{destination}_value = s{source}')
+        lines.extend(written('bx'))
+    elif op_code in MATH_OPERATORS:
+        operator = MATH_OPERATORS[op_code]
+        lines.extend(writable('bx'))
+        for source, destination in pairs:
+            lines.append(f'c._{destination}_value = (d{destination} {operator} s{source}) % size')
+        lines.extend(written('bx'))
+    elif op_code == OpCode.JMP:
+        lines.append('n = ax')
+    elif op_code in (OpCode.JMZ, OpCode.JMN):
+        zero = _zero_condition(modifier, 'da', 'db')
+        lines.append(f'if {"" if op_code == OpCode.JMZ else "not "}({zero}):')
+        lines.append('    n = ax')
+    elif op_code == OpCode.DJN:
+        lines.extend(writable('bx'))
+        if modifier in (Modifier.A, Modifier.BA, Modifier.X, Modifier.F, Modifier.I):
+            lines.append('c._a_value = (c._a_value - 1) % size')
+        if modifier in (Modifier.B, Modifier.AB, Modifier.X, Modifier.F, Modifier.I):
+            lines.append('c._b_value = (c._b_value - 1) % size')
+        lines.extend(written('bx'))
+        lines.append(f'if not ({_zero_condition(modifier, "c._a_value", "c._b_value")}):')
+        lines.append('    n = ax')
+    elif op_code in SKIP_OPERATORS:
+        operator = SKIP_OPERATORS[op_code]
+        if whole:
+            condition = f'(sop, smod, sa, sam, sb, sbm) {operator} (dop, dmod, da, dam, db, dbm)'
+        else:
+            condition = ' and '.join(f's{source} {operator} d{destination}' for source, destination in pairs)
+        lines.append(f'if {condition}:')
+        lines.append(f'    n = {offset(2)}')
+    return lines
+
+
+def _zero_condition(modifier: Modifier, a_value: str, b_value: str) -> str:
+    if modifier in (Modifier.A, Modifier.BA):
+        return f'{a_value} == 0'
+    elif modifier in (Modifier.B, Modifier.AB):
+        return f'{b_value} == 0'
+    return f'{a_value} == 0 and {b_value} == 0'
+
+
+def _indent(lines: List[str], level: int, join: bool = True):
+    indented = ['    ' * level + line for line in lines]
+    return ''.join(line + '\n' for line in indented) if join else indented
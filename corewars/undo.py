@@ -0,0 +1,105 @@
+from array import array
+from typing import List
+from corewars.redcode import pack_instruction, unpack_instruction
+
+
+# how a cycle changed the process queue of the warrior which executed it
+CONTINUED, SPLIT, KILLED = 0, 1, 2
+# cells which can be modified in a single cycle: A-operand pointer, B-operand pointer, destination
+CELLS_PER_CYCLE = 3
+
+
+class UndoLog():
+    """
+    Bounded log of changes made by the last 'capacity' cycles of a MARS, allowing them to be reverted.
+    For every cycle it keeps the previous contents of modified cells and how the process queue
+    of the executing warrior has changed. Everything is stored in preallocated arrays (cells packed
+    into single integers), once full the oldest cycles are overwritten.
+    Heatmaps and timelines aren't affected by reverting cycles.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._warriors: List = [None] * capacity
+        self._pointers = array('l', [0] * capacity)
+        self._kinds = array('b', [0] * capacity)
+        self._cell_counts = array('b', [0] * capacity)
+        slots = capacity * CELLS_PER_CYCLE
+        self._addresses = array('l', [0] * slots)
+        self._cells = array('Q', [0] * slots)
+        self._start = 0
+        self._length = 0
+        # slot of the cycle currently being recorded
+        self._current = 0
+        self._processes_before = 0
+
+
+    def __len__(self):
+        return self._length
+
+
+    def begin(self, warrior, pointer: int):
+        "Starts recording a cycle about to be executed by the given CoreWarrior."
+        if self._length == self.capacity:
+            # overwrite the oldest cycle
+            self._start = (self._start + 1) % self.capacity
+            self._length -= 1
+        self._current = (self._start + self._length) % self.capacity
+        self._warriors[self._current] = warrior
+        self._pointers[self._current] = pointer
+        self._cell_counts[self._current] = 0
+        self._processes_before = len(warrior)
+
+
+    def save_cell(self, address: int, cell):
+        "Saves contents of a cell before it's modified."
+        i = self._current
+        slot = i * CELLS_PER_CYCLE + self._cell_counts[i]
+        self._addresses[slot] = address
+        self._cells[slot] = pack_instruction(cell)
+        self._cell_counts[i] += 1
+
+
+    def commit(self):
+        "Finishes recording the cycle, must be called before the warriors are rotated."
+        i = self._current
+        processes = len(self._warriors[i])
+        if processes > self._processes_before:
+            self._kinds[i] = SPLIT
+        elif processes < self._processes_before:
+            self._kinds[i] = KILLED
+        else:
+            self._kinds[i] = CONTINUED
+        self._length += 1
+
+
+    def undo(self, core) -> List[int]:
+        """
+        Reverts the last recorded cycle in the given Core.
+        Returns addresses of the restored cells, an empty list if there was nothing to revert.
+        """
+        if self._length == 0:
+            return []
+        self._length -= 1
+        i = (self._start + self._length) % self.capacity
+        warrior = self._warriors[i]
+        self._warriors[i] = None
+        core.rewind_turn(warrior)
+        warrior.rewind_turn(self._pointers[i], self._kinds[i])
+        # restore in reverse order, so that the oldest saved contents of each cell win
+        restored = []
+        for slot in reversed(range(i * CELLS_PER_CYCLE, i * CELLS_PER_CYCLE + self._cell_counts[i])):
+            restored.append(self._addresses[slot])
+            cell = core[self._addresses[slot]]
+            saved = unpack_instruction(self._cells[slot])
+            cell.op_code = saved.op_code
+            cell.modifier = saved.modifier
+            cell.a_mode = saved.a_mode
+            cell.b_mode = saved.b_mode
+            cell.a_value = saved.a_value
+            cell.b_value = saved.b_value
+        return restored
+
+
+    def clear(self):
+        self._warriors = [None] * self.capacity
+        self._start = self._length = 0
@@ -0,0 +1,139 @@
+import os
+from typing import List
+import numpy as np
+from corewars.mars import MARS
+from corewars.gif import GifWriter
+from corewars.png import write_png
+from main import BASE_CELL_COLOUR, CELL_SIZE, CELLS_PER_LINE, COLOURS, SPACING, get_position
+
+
+# palette indexes, warriors' colours follow
+BACKGROUND, BASE_CELL, CURSOR = 0, 1, 2
+WARRIOR_COLOURS = 3
+# pixels are bytes (and GIFs have at most 256 colours), warriors beyond that share colours
+PALETTE_SIZE = 256
+
+
+def export_battle(
+    warriors_data: List[List[str]], path: str, max_cycles: int = 80000, every: int = 100,
+    cell_size: int = CELL_SIZE, spacing: int = SPACING, delay: int = 4
+) -> int:
+    """
+    Simulates a round without opening a window, saving every Nth cycle as a frame -
+    into an animated GIF if the path ends with .gif, otherwise into a directory of PNG files.
+    Returns the number of saved frames.
+    """
+    mars = MARS()
+    mars.load_warriors(warriors_data)
+    mars.core.assign_colors(COLOURS, mars.rng)
+    renderer = FrameRenderer(mars, cell_size, spacing)
+    if path.lower().endswith('.gif'):
+        with GifWriter(path, renderer.width, renderer.height, renderer.palette, delay) as gif:
+            save = gif.add_frame
+            _record(renderer, max_cycles, every, lambda: save(renderer.frame()))
+            return gif.frames
+    os.makedirs(path, exist_ok=True)
+    frames = []
+
+    def save_png():
+        write_png(os.path.join(path, f'frame_{len(frames):05d}.png'), renderer.rgb())
+        frames.append(mars.cycles)
+
+    _record(renderer, max_cycles, every, save_png)
+    return len(frames)
+
+
+def _record(renderer, max_cycles: int, every: int, save):
+    mars = renderer.mars
+    save()
+    while not mars.is_over(max_cycles):
+        renderer.cycle()
+        if mars.cycles % every == 0:
+            save()
+    if mars.cycles % every != 0:
+        save()
+
+
+def warrior_colour(index: int) -> int:
+    "Palette index of the warrior with the given index."
+    return WARRIOR_COLOURS + index % (PALETTE_SIZE - WARRIOR_COLOURS)
+
+
+class FrameRenderer():
+    """
+    Off-screen counterpart of the pygame viewer, drawing the core into a NumPy array
+    using the same layout (one block per cell, placed by get_position()).
+    Cycles only note which cells they touched, those cells are drawn once the next frame is requested.
+    Pixels are palette indexes, rgb() converts them into colours.
+    """
+    def __init__(self, mars: MARS, cell_size: int = CELL_SIZE, spacing: int = SPACING):
+        self.mars = mars
+        size = mars.core.size
+        lines = -(-size // CELLS_PER_LINE)
+        self.width = spacing + CELLS_PER_LINE * (cell_size + spacing)
+        self.height = spacing + lines * (cell_size + spacing)
+        positions = np.array([get_position(address, size, cell_size, spacing) for address in range(size)])
+        self._x, self._y = positions[:, 0], positions[:, 1]
+        self._dy, self._dx = np.mgrid[0:cell_size, 0:cell_size]
+        # written cells are crossed out, like in the viewer
+        self._cross = (self._dy == self._dx) | (self._dy == cell_size - 1 - self._dx)
+        warriors = mars.core.turn_order
+        self.palette = np.zeros((min(WARRIOR_COLOURS + len(warriors), PALETTE_SIZE), 3), dtype=np.uint8)
+        self.palette[BASE_CELL] = BASE_CELL_COLOUR
+        self.palette[CURSOR] = (255, 255, 255)
+        # the first warrior given each palette entry decides its colour
+        for warrior in sorted(warriors, key=lambda warrior: warrior.index, reverse=True):
+            self.palette[warrior_colour(warrior.index)] = warrior.color
+        # colour of every cell, the lowest bit marks cells which were written to (not executed)
+        self.states = np.full(size, BASE_CELL << 1, dtype=np.uint16)
+        self.pixels = np.full((self.height, self.width), BACKGROUND, dtype=np.uint8)
+        self._changes = {}
+        self._cursor = None
+        self._draw(np.arange(size))
+
+
+    def cycle(self) -> List[int]:
+        "Runs a single cycle of the simulation, noting the cells it has touched."
+        core = self.mars.core
+        warrior = core.current_warrior
+        color = warrior_colour(warrior.index) << 1
+        pointer = warrior.current_pointer
+        self._changes[pointer] = color
+        addresses = self.mars.cycle()
+        for address in addresses:
+            address %= core.size
+            if address != pointer:
+                self._changes[address] = color | 1
+        return addresses
+
+
+    def frame(self) -> np.ndarray:
+        "Draws cells touched since the previous frame and the cursor, returns palette indexes of pixels."
+        touched = list(self._changes)
+        if self._cursor is not None:
+            touched.append(self._cursor)
+        if self._changes:
+            self.states[list(self._changes)] = list(self._changes.values())
+            self._changes = {}
+        if touched:
+            self._draw(np.array(touched))
+        warrior = self.mars.core.current_warrior
+        self._cursor = warrior.current_pointer if warrior else None
+        if self._cursor is not None:
+            self.pixels[self._y[self._cursor] + self._dy, self._x[self._cursor] + self._dx] = CURSOR
+        return self.pixels
+
+
+    def rgb(self) -> np.ndarray:
+        "Returns the current frame as an (height, width, 3) array of RGB values."
+        return self.palette[self.frame()]
+
+
+    def _draw(self, addresses: np.ndarray):
+        states = self.states[addresses]
+        colors = (states >> 1).astype(np.uint8)[:, None, None]
+        written = (states & 1).astype(bool)[:, None, None]
+        blocks = np.where(written & ~self._cross, BACKGROUND, colors)
+        rows = self._y[addresses][:, None, None] + self._dy
+        columns = self._x[addresses][:, None, None] + self._dx
+        self.pixels[rows, columns] = blocks
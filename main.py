@@ -1,8 +1,13 @@
 import os
 import glob
 import argparse
-from typing import List
-import pygame
+from collections import deque
+from typing import List, Optional, Tuple
+try:
+    import pygame
+except ImportError:
+    # not needed by the terminal viewer
+    pygame = None
 from corewars.mars import MARS
 from corewars.core import CoreWarrior
 
@@ -18,6 +23,8 @@ WINDOW_HEIGHT = SPACING + (LINES * (CELL_SIZE + SPACING))
 SIDEBAR_START = WINDOW_WIDTH - SIDEBAR_WIDTH
 INFO_MARGIN = 20
 ENTRY_SPACING = (WINDOW_WIDTH - 200) // 15
+# how many warrior entries fit in the sidebar, between the header and the footer
+MAX_ENTRIES = (WINDOW_HEIGHT - 200 - 80) // ENTRY_SPACING
 
 COLOURS = [
     (55, 183, 106), # green
@@ -32,6 +39,13 @@ BASE_CELL_COLOUR = (30, 30, 30)
 SIDEBAR_COLOUR = (20, 20, 20)
 FONT_SIZE = 20
 
+# process count history shown in the sidebar - one sample per 50 cycles, last 250 samples
+TIMELINE_STRIDE = 50
+TIMELINE_CAPACITY = 250
+TIMELINE_HEIGHT = 25
+# number of last cycles which can be stepped back through
+UNDO_CAPACITY = 10000
+
 
 def main():
     parser = argparse.ArgumentParser(description='Core Wars')
@@ -39,47 +53,91 @@ def main():
                         default=80000, help='Max sim. cycles before round end')
     parser.add_argument('--warriors', type=str, default='warriors',
                         help='Name of the folder containing warrior files')
+    parser.add_argument('--terminal', action='store_true',
+                        help='Show the simulation in the terminal (curses) instead of a window')
+    parser.add_argument('--fps', type=int, default=20,
+                        help='Max frames per second drawn by the terminal viewer')
+    parser.add_argument('--export', type=str, default=None,
+                        help='Save the battle without opening a window - as a GIF (*.gif) or a folder of PNGs')
+    parser.add_argument('--every', type=int, default=100,
+                        help='Number of cycles between exported frames')
+    parser.add_argument('--cell-size', type=int, default=CELL_SIZE,
+                        help='Size of a cell in exported frames, in pixels')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='Play rounds without a window under cProfile, saving PROFILE.pstats and PROFILE.folded')
+    parser.add_argument('--rounds', type=int, default=1,
+                        help='Number of rounds played with --profile')
     args = parser.parse_args()
     # laod warriors
-    warrior_files = glob.glob(os.path.join(os.getcwd(), "warriors", "*.red"))
+    warrior_files = glob.glob(os.path.join(os.getcwd(), args.warriors, "*.red"))
     if not warrior_files:
         print('ERROR: No warrior files found. Aborting...')
         return
-    elif not (2 <= len(warrior_files) <= 6):
-        print('ERROR: Only battles between 2-6 warriors are supported.')
+    elif len(warrior_files) < 2:
+        print('ERROR: At least 2 warriors are needed for a battle.')
+        return
+    warriors_data = [open(file).readlines() for file in warrior_files]
+    if args.profile:
+        from corewars.profiling import format_summary, profile_rounds
+        stats = profile_rounds(warriors_data, args.profile, args.rounds, args.cycles)
+        print(format_summary(stats))
+        print(f'profile saved to {args.profile}.pstats, folded stacks to {args.profile}.folded')
+        return
+    if args.export:
+        from export import export_battle
+        frames = export_battle(warriors_data, args.export, args.cycles, args.every,
+                               args.cell_size, min(SPACING, args.cell_size // 5))
+        print(f'{frames} frames saved to {args.export}')
+        return
+    if args.terminal:
+        from terminal import run_terminal
+        run_terminal(warriors_data, args.cycles, args.fps)
+        return
+    if pygame is None:
+        print('ERROR: pygame is not installed - use --terminal or install it first.')
         return
     pygame.init()
     pygame.display.set_caption('Core Wars')
     # 1202px horizontal, 962px vertical needed at minimum (10px per square, 2px spacing)
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-    warriors_data = [open(file).readlines() for file in warrior_files]
+    # holding the arrow keys scrubs through cycles
+    pygame.key.set_repeat(300, 20)
     run_simulation(screen, warriors_data, args.cycles)
 
 
 def run_simulation(screen, warriors_data: List[List[str]], max_cycles: int):
-    # initialize the simulator and load up provided warriors
-    mars = MARS()
+    # initialize the simulator, reused by every round
+    mars = MARS(timeline_stride=TIMELINE_STRIDE, timeline_capacity=TIMELINE_CAPACITY,
+                undo_capacity=UNDO_CAPACITY)
+    # CTRL-R starts a new round
+    while run_round(screen, mars, warriors_data, max_cycles):
+        mars.reset()
+
+
+def run_round(screen, mars: MARS, warriors_data: List[List[str]], max_cycles: int) -> bool:
+    "Shows a single round until the window gets closed (returns False) or reset (returns True)."
+    # load up provided warriors
     mars.load_warriors(warriors_data)
-    mars.core.assign_colors(COLOURS)
+    mars.core.assign_colors(COLOURS, mars.rng)
     # initial stats display
     screen.fill((0, 0, 0))
     sidebar = pygame.Surface((SIDEBAR_WIDTH, WINDOW_HEIGHT))
     sidebar.fill(SIDEBAR_COLOUR)
     screen.blit(sidebar, (SIDEBAR_START, 0))
     # initial cell display
-    for i, _ in enumerate(mars.core):
-        cell = create_cursor_cell(BASE_CELL_COLOUR)
-        pos = get_position(i, mars.core.size)
-        screen.blit(cell, pos)
+    canvas = CoreCanvas(screen, mars.core.size)
+    canvas.draw_all()
     # initial cursor display
-    display_cursor(screen, mars)
+    canvas.draw_cursor(mars.core.current_warrior.current_pointer)
     pygame.display.flip()
     # main game loop
     loop = True
     game_ended = False
     run_again = False
-    cycles = 1
+    paused = False
     while loop:
+        # 1 - execute a single cycle, -1 - revert one
+        step = 0
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 loop = False
@@ -88,29 +146,42 @@ def run_simulation(screen, warriors_data: List[List[str]], max_cycles: int):
                 if event.key == pygame.K_r and pygame.key.get_mods() & pygame.KMOD_CTRL:
                     run_again = True
                     loop = False
-        if game_ended:
+                elif event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    paused = True
+                    step = -1 if event.key == pygame.K_LEFT else 1
+        if step == -1:
+            # remove the cursor, it gets drawn again wherever the reverted cycle started
+            canvas.draw(mars.core.current_warrior.current_pointer)
+            # cells painted by the reverted cycle look like they did before it
+            if mars.undo():
+                canvas.undo_cycle()
+            game_ended = False
+        elif game_ended or (paused and step == 0):
             # prevents closing the window after game is finished
             continue
-        # change previous cursor to warrior's colour
-        display_cursor(screen, mars)
-        # save current execution pointer to prevent erasing it afterwards
-        pointer = mars.core.current_warrior.current_pointer
-        # save current warrior's colour for later use
-        color = mars.core.current_warrior.color
-        # run simulation cycle and save accessed cells
-        addresses = mars.cycle()
+        else:
+            warrior = mars.core.current_warrior
+            pointer = warrior.current_pointer
+            canvas.begin_cycle()
+            # change previous cursor to warrior's colour
+            canvas.paint(pointer, warrior.color, False)
+            # run simulation cycle and cross out cells written to during it
+            for address in mars.cycle():
+                if address % mars.core.size != pointer:
+                    canvas.paint(address, warrior.color, True)
         # display sidebar content
         sidebar.fill((20, 20, 20))
-        write_text(sidebar, f'CYCLE {cycles + 1}', INFO_MARGIN, 20)
-        for i, warrior in enumerate(mars.core.warriors + mars.core.dead_warriors):
-            print_warrior_info(sidebar, i, warrior)
+        write_text(sidebar, f'CYCLE {mars.cycles}', INFO_MARGIN, 20)
+        print_warriors(sidebar, mars)
         # one warrior left = win
         if mars.core.warriors_count == 1:
             game_ended = True
             write_text(sidebar, f'{mars.core.current_warrior.name.upper()} WINS!',
                        INFO_MARGIN, 100, 'Gold')
         # max cycles passed = tie
-        elif cycles + 1 >= max_cycles:
+        elif mars.cycles >= max_cycles:
             game_ended = True
             write_text(sidebar, 'GAME OVER - NO WINNER.', INFO_MARGIN, 50, 'Red')
         write_text(
@@ -118,30 +189,74 @@ def run_simulation(screen, warriors_data: List[List[str]], max_cycles: int):
             f'instruction: {str(mars.core[mars.core.current_warrior.current_pointer])}',
             INFO_MARGIN, WINDOW_HEIGHT - 60
         )
-        write_text(sidebar, 'CTRL-R to reset', INFO_MARGIN, WINDOW_HEIGHT - 30)
+        write_text(sidebar, 'CTRL-R reset, SPACE pause, LEFT/RIGHT step', INFO_MARGIN, WINDOW_HEIGHT - 30)
         screen.blit(sidebar, (SIDEBAR_START, 0))
-        # cells accessed / written to during this cycle
-        if pointer in addresses:
-            addresses.remove(pointer)
-        for address in addresses:
-            cell = create_written_cell(color)
-            pos = get_position(address, mars.core.size)
-            screen.blit(cell, pos)
         # show current warrior's pointer (blink white)
-        display_cursor(screen, mars, True)
+        canvas.draw_cursor(mars.core.current_warrior.current_pointer)
         pygame.display.flip()
-        cycles += 1
-    if run_again:
-        run_simulation(screen, warriors_data, max_cycles)
+    return run_again
+
+
+class CoreCanvas():
+    """
+    Cells of the Core as drawn on the screen - untouched, filled with the colour of the warrior
+    which executed them last or crossed out by the one which wrote to them last.
+    Cells painted by each of the last 'capacity' cycles are remembered along with how they
+    looked before, so that stepping back (MARS.undo()) shows them exactly as they were.
+    """
+    def __init__(self, screen, size: int, capacity: int = UNDO_CAPACITY):
+        self.screen = screen
+        self.size = size
+        # address -> (colour, whether it was written to), None for untouched cells
+        self.cells: List[Optional[Tuple[tuple, bool]]] = [None] * size
+        # (address, previous state) of cells painted by each cycle
+        self._history = deque(maxlen=capacity)
+
+
+    def draw_all(self):
+        for address in range(self.size):
+            self.draw(address)
+
 
+    def begin_cycle(self):
+        "Starts recording the cells painted by a new cycle."
+        self._history.append([])
 
-def display_cursor(screen, mars: MARS, white=False):
-    "Displays where in the memory the current process is pointing to."
-    cursor = mars.core.current_warrior.current_pointer
-    color = (255, 255, 255) if white else mars.core.current_warrior.color
-    cell = create_cursor_cell(color)
-    pos = get_position(cursor, mars.core.size)
-    screen.blit(cell, pos)
+
+    def paint(self, address: int, color, written: bool):
+        address %= self.size
+        if self._history:
+            self._history[-1].append((address, self.cells[address]))
+        self.cells[address] = (color, written)
+        self.draw(address)
+
+
+    def undo_cycle(self) -> List[int]:
+        "Repaints cells painted by the last recorded cycle as they were before it, returns their addresses."
+        if not self._history:
+            return []
+        changes = self._history.pop()
+        # in reverse order, so that the oldest state of each cell wins
+        for address, state in reversed(changes):
+            self.cells[address] = state
+            self.draw(address)
+        return [address for address, _ in changes]
+
+
+    def draw(self, address: int):
+        state = self.cells[address % self.size]
+        if state is None:
+            cell = create_cursor_cell(BASE_CELL_COLOUR)
+        elif state[1]:
+            cell = create_written_cell(state[0])
+        else:
+            cell = create_cursor_cell(state[0])
+        self.screen.blit(cell, get_position(address, self.size))
+
+
+    def draw_cursor(self, address: int):
+        "Marks the given cell in white, until it's drawn again."
+        self.screen.blit(create_cursor_cell((255, 255, 255)), get_position(address, self.size))
 
 
 def create_cursor_cell(color):
@@ -159,6 +274,23 @@ def create_written_cell(color):
     return cell
 
 
+def print_warriors(sidebar, mars: MARS):
+    """
+    Shows information about as many warriors as fit on the sidebar.
+    In large melees only the ones with the most processes are listed, followed by a summary.
+    """
+    warriors = mars.core.warriors
+    if len(warriors) + len(mars.core.dead_warriors) <= MAX_ENTRIES:
+        warriors = warriors + mars.core.dead_warriors
+    else:
+        warriors = sorted(warriors, key=len, reverse=True)[:MAX_ENTRIES - 1]
+        hidden = mars.core.warriors_count - len(warriors)
+        write_text(sidebar, f'+ {hidden} more alive, {len(mars.core.dead_warriors)} dead',
+                   INFO_MARGIN, 200 + (MAX_ENTRIES - 1) * ENTRY_SPACING)
+    for i, warrior in enumerate(warriors):
+        print_warrior_info(sidebar, i, warrior)
+
+
 def print_warrior_info(sidebar, pos: int, warrior: CoreWarrior):
     """
     Shows information about the given warrior on the sidebar.
@@ -174,10 +306,32 @@ def print_warrior_info(sidebar, pos: int, warrior: CoreWarrior):
     if len(warrior) > 0:
         write_text(warrior_entry, f'processes: {len(warrior)}', 30, 30)
     else:
-        write_text(warrior_entry, 'processes: 0 (dead)', 30, 30)
+        write_text(warrior_entry, f'dead at cycle {warrior.death_cycle}', 30, 30)
+    if warrior.timeline is not None and len(warrior.timeline) > 1:
+        draw_timeline(warrior_entry, warrior, 30, 55)
     sidebar.blit(warrior_entry, (INFO_MARGIN, v_margin))
 
 
+def draw_timeline(surface, warrior: CoreWarrior, x: int, y: int):
+    """
+    Draws the warrior's process count history as a line chart,
+    with cycles in which processes were killed marked in red.
+    """
+    processes = warrior.timeline.processes
+    deaths = warrior.timeline.deaths
+    width = SIDEBAR_WIDTH - x - 2 * INFO_MARGIN
+    peak = max(int(processes.max()), 1)
+    step = width / (TIMELINE_CAPACITY - 1)
+    points = [
+        (x + i * step, y + TIMELINE_HEIGHT - count * TIMELINE_HEIGHT / peak)
+        for i, count in enumerate(processes)
+    ]
+    for point, died in zip(points, deaths):
+        if died:
+            pygame.draw.line(surface, pygame.Color('Red'), (point[0], y), (point[0], y + TIMELINE_HEIGHT))
+    pygame.draw.lines(surface, warrior.color, False, points)
+
+
 def write_text(screen, text: str, x: int, y: int, color='White'):
     "Shows provided text at the given position on screen."
     font = pygame.font.Font(pygame.font.get_default_font(), FONT_SIZE)
@@ -185,12 +339,12 @@ def write_text(screen, text: str, x: int, y: int, color='White'):
     screen.blit(text, (x, y))
 
 
-def get_position(address: int, core_size):
+def get_position(address: int, core_size, cell_size=CELL_SIZE, spacing=SPACING):
     "Returns on-screen position of a memory cell from the given address."
     # addresses might be passed here before Core itself normalizes them
     address = address % core_size
-    y = SPACING + (address // CELLS_PER_LINE) * (CELL_SIZE + SPACING)
-    x = SPACING + (address % CELLS_PER_LINE) * (CELL_SIZE + SPACING)
+    y = spacing + (address // CELLS_PER_LINE) * (cell_size + spacing)
+    x = spacing + (address % CELLS_PER_LINE) * (cell_size + spacing)
     return (x, y)
 
 
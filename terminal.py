@@ -0,0 +1,205 @@
+import curses
+import time
+from typing import Dict, List
+from corewars.mars import MARS
+from corewars.core import CoreWarrior
+
+
+SIDEBAR_WIDTH = 32
+EMPTY_CELL = '.'
+WRITTEN_CELL = '#'
+CURSOR_CELL = '@'
+# cycles simulated between checks whether it's time to draw the next frame
+CYCLES_PER_CHECK = 64
+
+
+def run_terminal(warriors_data: List[List[str]], max_cycles: int, fps: int):
+    "Runs the simulation in a curses-based terminal viewer, until the user quits with Q."
+    curses.wrapper(lambda screen: TerminalView(screen, warriors_data, max_cycles, fps).run())
+
+
+class TerminalView():
+    """
+    Text-mode counterpart of the pygame viewer, usable e.g. over SSH.
+    The core is mapped onto the terminal with several cells per character if it doesn't fit,
+    each character showing the warrior which wrote to its cells last. Which warrior wrote to each
+    cell (and when) is kept separately from the layout, so resizing the terminal keeps it all.
+    The simulation runs
+    at full speed between frames, which are drawn at most 'fps' times per second
+    and only redraw the characters which have changed since the previous frame.
+    """
+    def __init__(self, screen, warriors_data: List[List[str]], max_cycles: int, fps: int):
+        self.screen = screen
+        self.warriors_data = warriors_data
+        self.max_cycles = max_cycles
+        self.frame_time = 1 / fps
+        self.paused = False
+        curses.curs_set(0)
+        screen.nodelay(True)
+        self._init_colors()
+        self.mars = MARS()
+        self.new_round()
+
+
+    def new_round(self):
+        self.mars.reset()
+        self.mars.load_warriors(self.warriors_data)
+        self.mars.core.assign_colors(rng=self.mars.rng)
+        # colour pair of every warrior, by its index
+        self.pairs: Dict[int, int] = {
+            warrior.index: self._color_pair(warrior.color) for warrior in self.mars.core.warriors
+        }
+        size = self.mars.core.size
+        # warrior (index + 1) which last wrote to each cell, 0 if none did, and the cycle it happened in
+        self.cell_owners = bytearray(size) if len(self.pairs) < 255 else [0] * size
+        self.written_at = [0] * size
+        self.layout()
+
+
+    def layout(self):
+        "(Re)computes how the core is mapped onto the screen and forces a full redraw."
+        self.screen.clear()
+        rows, columns = self.screen.getmaxyx()
+        self.width = max(columns - SIDEBAR_WIDTH - 1, 1)
+        self.height = max(rows - 1, 1)
+        size = self.mars.core.size
+        # number of core cells represented by a single character
+        self.cells_per_char = -(-size // (self.width * self.height))
+        chars = -(-size // self.cells_per_char)
+        # warrior (index + 1) which last wrote to each character's cells, 0 if none did
+        self.owners = bytearray(chars) if len(self.pairs) < 255 else [0] * chars
+        for char in range(chars):
+            cells = range(char * self.cells_per_char, min((char + 1) * self.cells_per_char, size))
+            latest = max(cells, key=lambda cell: (self.cell_owners[cell] > 0, self.written_at[cell]))
+            self.owners[char] = self.cell_owners[latest]
+        # what's currently on the screen, None forces the first draw
+        self.drawn: List = [None] * chars
+        self.dirty = set(range(chars))
+        self.sidebar: List[str] = []
+        self.cursor = 0
+
+
+    def run(self):
+        next_frame = time.monotonic()
+        while True:
+            key = self.screen.getch()
+            if key in (ord('q'), ord('Q')):
+                return
+            elif key == ord(' '):
+                self.paused = not self.paused
+            elif key in (ord('r'), ord('R')):
+                self.new_round()
+            elif key == curses.KEY_RESIZE:
+                self.layout()
+            if not self.paused and not self.mars.is_over(self.max_cycles):
+                # simulate until it's time for the next frame
+                while time.monotonic() < next_frame and not self.mars.is_over(self.max_cycles):
+                    for _ in range(CYCLES_PER_CHECK):
+                        if self.mars.is_over(self.max_cycles):
+                            break
+                        self.step()
+            else:
+                # nothing to simulate - don't spin the CPU
+                time.sleep(self.frame_time)
+            self.draw()
+            next_frame = time.monotonic() + self.frame_time
+
+
+    def step(self):
+        "Runs a single cycle, marking characters whose cells have been written to."
+        warrior = self.mars.core.current_warrior
+        owner = warrior.index + 1
+        size, per_char = self.mars.core.size, self.cells_per_char
+        for address in self.mars.cycle():
+            cell = address % size
+            self.cell_owners[cell] = owner
+            self.written_at[cell] = self.mars.cycles
+            char = cell // per_char
+            if self.owners[char] != owner:
+                self.owners[char] = owner
+                self.dirty.add(char)
+
+
+    def draw(self):
+        core = self.mars.core
+        # cursor of the warrior about to move
+        self.dirty.add(self.cursor)
+        if core.current_warrior:
+            self.cursor = core.current_warrior.current_pointer // self.cells_per_char
+            self.dirty.add(self.cursor)
+        for char in self.dirty:
+            owner = self.owners[char]
+            attr = curses.color_pair(self.pairs[owner - 1]) if owner else curses.A_DIM
+            symbol = WRITTEN_CELL if owner else EMPTY_CELL
+            if char == self.cursor and core.current_warrior:
+                symbol, attr = CURSOR_CELL, curses.A_BOLD
+            if self.drawn[char] != (symbol, attr):
+                self.drawn[char] = (symbol, attr)
+                self._put(char // self.width, char % self.width, symbol, attr)
+        self.dirty = set()
+        self.draw_sidebar()
+        self.screen.refresh()
+
+
+    def draw_sidebar(self):
+        "Redraws the lines of the sidebar which have changed since the previous frame."
+        mars = self.mars
+        lines = [f'CYCLE {mars.cycles}', f'1 char = {self.cells_per_char} cells', '']
+        if mars.is_over(self.max_cycles):
+            winner = mars.result().winner
+            lines[2] = f'{winner.name.upper()} WINS!' if winner else 'GAME OVER - NO WINNER.'
+        warriors = sorted(mars.core.warriors, key=len, reverse=True) + mars.core.dead_warriors
+        for warrior in warriors[:max(self.height - 6, 0) // 2]:
+            lines += self._warrior_lines(warrior)
+        lines += [''] * (self.height - 2 - len(lines))
+        lines = lines[:self.height - 2] + ['Q quit  R reset  SPACE pause']
+        column = self.width + 1
+        for row, line in enumerate(lines):
+            line = line[:SIDEBAR_WIDTH - 1].ljust(SIDEBAR_WIDTH - 1)
+            if row >= len(self.sidebar) or self.sidebar[row] != line:
+                self._put(row, column, line, curses.A_NORMAL)
+        self.sidebar = lines
+
+
+    def _warrior_lines(self, warrior: CoreWarrior) -> List[str]:
+        if len(warrior) > 0:
+            status = f'  processes: {len(warrior)}'
+        else:
+            status = f'  dead at cycle {warrior.death_cycle}'
+        return [f'{WRITTEN_CELL} {warrior.name}', status]
+
+
+    def _put(self, row: int, column: int, text: str, attr: int):
+        try:
+            self.screen.addstr(row, column, text, attr)
+        except curses.error:
+            # writing into the bottom-right corner always 'fails' after the text gets drawn
+            pass
+
+
+    def _init_colors(self):
+        self.colors = curses.has_colors()
+        if self.colors:
+            curses.start_color()
+            curses.use_default_colors()
+        self._pairs: Dict[int, int] = {}
+
+
+    def _color_pair(self, color) -> int:
+        "Returns a colour pair closest to the given RGB colour which the terminal can show."
+        if not self.colors:
+            return 0
+        red, green, blue = (round(channel / 255 * 5) for channel in color)
+        if curses.COLORS >= 256:
+            # xterm-256 colour cube
+            terminal_color = 16 + 36 * red + 6 * green + blue
+        else:
+            # basic 8 colours - red, green and blue bits
+            terminal_color = (red > 2) | (green > 2) << 1 | (blue > 2) << 2
+        if terminal_color not in self._pairs:
+            pair = len(self._pairs) + 1
+            if pair >= curses.COLOR_PAIRS:
+                return 0
+            curses.init_pair(pair, terminal_color, -1)
+            self._pairs[terminal_color] = pair
+        return self._pairs[terminal_color]
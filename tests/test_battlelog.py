@@ -0,0 +1,75 @@
+import random
+import pytest
+from corewars.battlelog import TIE, BattleLog
+from corewars.mars import MARS
+
+
+def test_queries_match_a_full_scan(tmp_path):
+    rng = random.Random(3)
+    warriors = ['aaaa', 'bbbb', 'cccc', 'dddd']
+    rows = []
+    log = BattleLog(str(tmp_path), chunk_size=16)
+    for seed in range(100):
+        pairing = tuple(rng.sample(warriors, 2))
+        winner = rng.choice([0, 1, None])
+        cycles = rng.randrange(1, 10000)
+        log.append(pairing, seed, (0, rng.randrange(100, 7900)), winner, cycles,
+                   (None if winner != 1 else cycles, None if winner != 0 else cycles))
+        rows.append((seed, pairing, None if winner is None else pairing[winner], cycles))
+    # the last rounds are still in memory - queries see them too, and so do reopened logs after flush()
+    for reopen in (False, True):
+        if reopen:
+            log.flush()
+            log = BattleLog(str(tmp_path))
+        assert len(log) == 100
+        result = log.query('aaaa', 'bbbb', winner='bbbb', max_cycles=5000)
+        expected = [seed for seed, pairing, winner, cycles in rows
+                    if set(pairing) == {'aaaa', 'bbbb'} and winner == 'bbbb' and cycles < 5000]
+        assert result['seed'].tolist() == expected
+        assert (result['winner'] == log.warrior_id('bbbb')).all()
+        result = log.query('cccc', tie=True)
+        assert result['seed'].tolist() == [seed for seed, pairing, winner, _ in rows
+                                           if 'cccc' in pairing and winner is None]
+        assert (result['winner'] == TIE).all()
+        assert log.query()['seed'].tolist() == list(range(100))
+        assert len(log.query('eeee')['seed']) == 0
+
+
+def test_round_results(tmp_path):
+    log = BattleLog(str(tmp_path))
+    mars = MARS()
+    # fixed placement and turn order
+    random.seed(1)
+    mars.load_warriors([['MOV 0, 1'], ['DAT 0, 0']])
+    result = mars.run(100)
+    log.append_result(('imp', 'suicide'), 42, result)
+    # mirror match
+    log.append(('imp', 'imp'), 43, (0, 4000), None, 100, (None, None))
+    log.flush()
+    rounds = log.query('imp', 'suicide')
+    assert rounds['winner'].tolist() == [log.warrior_id('imp')]
+    assert rounds['second_death'].tolist() == [result.warriors[1].death_cycle]
+    assert rounds['first_death'].tolist() == [-1]
+    assert rounds['second_offset'][0] == result.warriors[1].start_address
+    assert log.query('imp')['seed'].tolist() == [42, 43]
+
+
+def test_crash_before_index_update(tmp_path, monkeypatch):
+    log = BattleLog(str(tmp_path))
+    log.append(('a', 'b'), 1, (0, 100), 0, 50, (None, 50))
+    log.flush()
+
+    def crash():
+        raise OSError('crashed')
+
+    log.append(('a', 'c'), 2, (0, 100), 1, 60, (60, None))
+    monkeypatch.setattr(log, '_write_index', crash)
+    with pytest.raises(OSError):
+        log.flush()
+    # reopened, the unlisted chunk isn't a part of the log and doesn't get in the way
+    log = BattleLog(str(tmp_path))
+    assert len(log) == 1 and log.warrior_id('c') is None
+    log.append(('a', 'd'), 3, (0, 100), None, 70, (None, None))
+    log.flush()
+    log = BattleLog(str(tmp_path))
+    assert log.query('a')['seed'].tolist() == [1, 3]
@@ -0,0 +1,52 @@
+import glob
+from corewars.conformance import ConformanceHarness, random_warrior
+from corewars.mars import MARS
+from corewars.parser import Parser
+from corewars.redcode import OpCode
+
+
+class BrokenMARS(MARS):
+    "Executes SUB as ADD."
+    def cycle(self):
+        warrior = self.core.current_warrior
+        cell = self.core[warrior.current_pointer]
+        if cell.op_code == OpCode.SUB:
+            cell.op_code = OpCode.ADD
+            written = super().cycle()
+            cell.op_code = OpCode.SUB
+            return written
+        return super().cycle()
+
+
+def load_corpus():
+    return [Parser.parse_warrior(open(path).readlines()) for path in sorted(glob.glob('warriors/*.red'))]
+
+
+def test_reference_matches_itself():
+    harness = ConformanceHarness(MARS, checkpoint_interval=50)
+    assert harness.fuzz(rounds=5, seed=1, max_cycles=300, corpus=load_corpus()) == []
+
+
+def test_divergence_is_bisected():
+    dwarf = Parser.parse_warrior(['SUB #4, 3', 'MOV 2, @2', 'JMP -2', 'DAT #0, #0'])
+    harness = ConformanceHarness(BrokenMARS, checkpoint_interval=64)
+    divergence = harness.compare([dwarf], [100], 200)
+    # SUB is the very first instruction executed
+    assert divergence.cycle == 1
+    assert 'cell 103' in divergence.describe()
+
+
+def test_divergence_found_in_soup():
+    harness = ConformanceHarness(BrokenMARS, checkpoint_interval=100)
+    divergences = harness.fuzz(rounds=20, seed=3, max_cycles=500)
+    assert divergences
+    for divergence in divergences:
+        # replaying up to the cycle before the divergence has to show identical states
+        reference, candidate = harness._replay(divergence.warriors, divergence.addresses, divergence.cycle - 1)
+        assert reference.core[0:8000] == candidate.core[0:8000]
+
+
+def test_random_warrior_covers_everything():
+    from random import Random
+    warrior = random_warrior(Random(0), 8000, 2000)
+    assert {instruction.op_code for instruction in warrior.instructions} == set(OpCode)
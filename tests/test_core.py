@@ -1,3 +1,4 @@
+import pytest
 from corewars.redcode import AddressingMode, Instruction, Modifier, OpCode, Warrior
 from corewars.core import Core, CoreInstruction, CoreWarrior
 
@@ -78,3 +79,72 @@ def test_process_queue():
     # 2 will be the only process left
     assert warrior.current_pointer == 2
     assert len(warrior) == 1
+
+
+def test_rotate_many_warriors():
+    core = Core()
+    warrior = Warrior('test', [
+        Instruction(OpCode.JMP, Modifier.B, 0, AddressingMode('$'), 0, AddressingMode('$')),
+    ])
+    for i in range(300):
+        core.load_warrior(warrior, i * 10)
+    # kill every third warrior during its own turn, in a single round
+    for i in range(300):
+        assert core.current_warrior.current_pointer == i * 10
+        if i % 3 == 0:
+            core.current_warrior.kill_current_process()
+        core.rotate_warrior()
+    assert core.warriors_count == 200
+    assert len(core.dead_warriors) == 100
+    # turns continue in load order, skipping the dead ones
+    assert core.current_warrior.current_pointer == 10
+    assert [w.current_pointer for w in core.warriors[:3]] == [10, 20, 40]
+
+
+def test_assign_colors_generates_palette():
+    core = Core()
+    warrior = Warrior('test', [
+        Instruction(OpCode.JMP, Modifier.B, 0, AddressingMode('$'), 0, AddressingMode('$')),
+    ])
+    for i in range(100):
+        core.load_warrior(warrior, i * 10)
+    core.assign_colors([(255, 0, 0), (0, 255, 0)])
+    colors = [warrior.color for warrior in core.warriors]
+    assert len(set(colors)) == 100
+    assert (255, 0, 0) in colors
+
+
+def test_reset_restores_dirty_cells():
+    core = Core(100)
+    warrior = Warrior('test', [
+        Instruction(OpCode.MOV, Modifier.I, 0, AddressingMode('$'), 1, AddressingMode('$')),
+    ])
+    loaded = [core.load_warrior(warrior, 98), core.load_warrior(warrior, 50)]
+    # changed in place - has to be reported
+    core[10].b_value = 5
+    core.mark_dirty([110])
+    cells = list(core)
+    core.reset()
+    assert core.warriors_count == 0 and core.dead_warriors == []
+    assert all(cell.op_code == OpCode.DAT and cell.a_value == cell.b_value == 0 for cell in core)
+    # all cells are given back to the shared default instruction
+    assert len({id(cell) for cell in core}) == 1
+    assert cells[10] is not cells[0]
+    # warriors are reused
+    reused = core.load_warrior(Warrior('other', warrior.instructions), 0)
+    assert reused in loaded
+    assert reused.name == 'other' and reused.processes == (0,) and reused.start_address == 0
+
+
+def test_shared_default_cell_is_frozen():
+    core = Core(10)
+    cells = core[0:5]
+    with pytest.raises(AttributeError):
+        cells[0].a_value = 3
+    with pytest.raises(AttributeError):
+        next(iter(core)).op_code = OpCode.MOV
+    assert all(cell.a_value == 0 and cell.op_code == OpCode.DAT for cell in core)
+    # accessed cells get an instance of their own
+    core[0].a_value = 3
+    assert core[0:2][0].a_value == 3 and core[0:2][1].a_value == 0 and core[9].a_value == 0
+    assert core[0:2][1] == core[9] and core[9] == core[0:2][1]
@@ -0,0 +1,91 @@
+from corewars.debugger import Debugger
+from corewars.mars import MARS, RoundResult
+from corewars.redcode import OpCode
+
+
+def get_dwarf_mars() -> MARS:
+    mars = MARS()
+    with open('tests/warriors/dwarf.red') as file:
+        mars.load_warriors([file.readlines()], 0)
+    return mars
+
+
+def test_breakpoint_stops_before_execution():
+    mars = get_dwarf_mars()
+    debugger = Debugger(mars)
+    debugger.add_breakpoint(op_code=OpCode.JMP)
+    stop = debugger.run(100)
+    assert stop.reason == 'breakpoint'
+    assert stop.cycle == 2 and mars.cycles == 2
+    assert stop.address == 2
+    # resuming executes the JMP and stops at the next one
+    stop = debugger.run(100)
+    assert stop.cycle == 5
+
+
+def test_breakpoint_by_address_and_warrior():
+    mars = get_dwarf_mars()
+    debugger = Debugger(mars)
+    debugger.add_breakpoint(address=1, warrior='Imp')
+    assert isinstance(debugger.run(20), RoundResult)
+    debugger.clear()
+    debugger.add_breakpoint(address=8001, warrior=mars.core.current_warrior)
+    assert debugger.run(40).cycle == 22
+    assert debugger.run(40).cycle == 25
+
+
+def test_watchpoints():
+    mars = get_dwarf_mars()
+    debugger = Debugger(mars)
+    # the third bomb
+    debugger.watch(15)
+    stop = debugger.run(100)
+    assert (stop.reason, stop.cycle, stop.address) == ('write', 8, 15)
+    debugger.clear()
+    # the DAT holding the bomb is read by every MOV
+    debugger.watch(3, read=True, write=False)
+    stop = debugger.run(100)
+    assert (stop.reason, stop.cycle) == ('read', 10)
+
+
+def test_jump_target_is_not_written():
+    mars = get_dwarf_mars()
+    debugger = Debugger(mars)
+    # JMP -2 points its B operand at itself, but never changes it
+    debugger.watch(2)
+    assert isinstance(debugger.run(100), RoundResult)
+    mars = MARS()
+    mars.load_warriors([['NOP 0, 1', 'JMP -1, 2', 'DAT 0, 0']], 0)
+    debugger = Debugger(mars)
+    debugger.watch(1)
+    debugger.watch(3)
+    debugger.watch(4)
+    assert isinstance(debugger.run(100), RoundResult)
+
+
+def test_process_count_condition():
+    mars = MARS()
+    mars.load_warriors([['SPL 0', 'JMP -1'], ['JMP 0']], 0)
+    debugger = Debugger(mars)
+    debugger.break_on_processes(mars.core.current_warrior.name, 10)
+    stop = debugger.run(1000)
+    assert stop.reason == 'condition'
+    assert len(stop.warrior) == 11
+
+
+def test_no_breakpoints_runs_plain_round():
+    mars = get_dwarf_mars()
+    assert Debugger(mars).run(50).cycles == 50
+
+
+def test_reads_collected_only_when_watched():
+    mars = get_dwarf_mars()
+    mars.cycle()
+    mars.cycle()
+    # nothing asked for the reads of MOV 2, @2
+    assert mars.cells_read == []
+    debugger = Debugger(mars)
+    debugger.watch(3, read=True, write=False)
+    assert debugger.run(100).reason == 'read'
+    assert 3 in mars.cells_read
+    assert not mars.record_reads
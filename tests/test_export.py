@@ -0,0 +1,123 @@
+import numpy as np
+from corewars.gif import GifWriter, lzw_encode
+from corewars.mars import MARS
+from export import BASE_CELL, CURSOR, PALETTE_SIZE, WARRIOR_COLOURS, FrameRenderer, export_battle
+
+
+def lzw_decode(data: bytes) -> bytes:
+    "Reference GIF LZW decoder, for 8-bit codes."
+    buffer = int.from_bytes(data, 'little')
+    position, width = 0, 9
+    table, output, previous = None, bytearray(), None
+    while True:
+        code = (buffer >> position) & ((1 << width) - 1)
+        position += width
+        if code == 256:
+            table, width, previous = [bytes([i]) for i in range(256)] + [b'', b''], 9, None
+            continue
+        if code == 257:
+            return bytes(output)
+        if code < len(table):
+            entry = table[code]
+            if previous is not None:
+                table.append(previous + entry[:1])
+        else:
+            entry = previous + previous[:1]
+            table.append(entry)
+        output += entry
+        previous = entry
+        if len(table) == 1 << width and width < 12:
+            width += 1
+
+
+def read_frames(path):
+    "Returns (left, top, width, height, pixels) of every frame of a GIF written by GifWriter."
+    data = open(path, 'rb').read()
+    position = 13 + 768 + 19
+    frames = []
+    while data[position] != ord(';'):
+        assert data[position:position + 3] == b'!\xf9\x04'
+        position += 8
+        left, top, width, height = (int(value) for value in np.frombuffer(data[position + 1:position + 9], dtype='<u2'))
+        position += 11
+        compressed = bytearray()
+        while data[position]:
+            compressed += data[position + 1:position + 1 + data[position]]
+            position += 1 + data[position]
+        position += 1
+        frames.append((left, top, width, height, lzw_decode(bytes(compressed))))
+    return frames
+
+
+def test_lzw_round_trip():
+    rng = np.random.default_rng(0)
+    for data in (b'', b'\x05', bytes(10000), rng.integers(0, 4, 20000, dtype=np.uint8).tobytes(),
+                 rng.integers(0, 256, 5000, dtype=np.uint8).tobytes()):
+        assert lzw_decode(lzw_encode(data)) == data
+
+
+def test_gif_encodes_changed_regions(tmp_path):
+    path = str(tmp_path / 'test.gif')
+    frame = np.zeros((20, 30), dtype=np.uint8)
+    with GifWriter(path, 30, 20, np.array([(0, 0, 0), (255, 0, 0)])) as gif:
+        gif.add_frame(frame)
+        frame[5:7, 10:12] = 1
+        gif.add_frame(frame)
+        gif.add_frame(frame)
+    frames = read_frames(path)
+    assert [f[:4] for f in frames] == [(0, 0, 30, 20), (10, 5, 2, 2), (0, 0, 1, 1)]
+    assert frames[1][4] == bytes([1] * 4)
+
+
+def test_renderer_draws_touched_cells():
+    mars = MARS()
+    core = mars.core
+    # dwarf writes to every 4th cell
+    mars.load_warriors([['ADD #4, 3', 'MOV 2, @2', 'JMP -2', 'DAT #0, #0'], ['JMP 0']], 0, 100)
+    core.assign_colors()
+    renderer = FrameRenderer(mars, cell_size=4, spacing=1)
+    assert renderer.pixels.shape == (1 + 80 * 5, 1 + 100 * 5)
+    for _ in range(30):
+        renderer.cycle()
+    pixels = renderer.frame().copy()
+    # untouched cell
+    assert (pixels[1 + 50 * 5:1 + 50 * 5 + 4, 1 + 50 * 5:1 + 50 * 5 + 4] == BASE_CELL).all()
+    # executed cells and bombs written by the dwarf
+    assert ((renderer.states >> 1) == WARRIOR_COLOURS + 0).sum() > 5
+    assert (renderer.states & 1).any()
+    # drawing everything from scratch gives the same picture
+    full = FrameRenderer(mars, cell_size=4, spacing=1)
+    full.states[:] = renderer.states
+    full._draw(np.arange(core.size))
+    cursor = core.current_warrior.current_pointer
+    x, y = 1 + (cursor % 100) * 5, 1 + (cursor // 100) * 5
+    full.pixels[y:y + 4, x:x + 4] = CURSOR
+    assert (full.pixels == pixels).all()
+
+
+def test_export_battle(tmp_path):
+    warriors = [['MOV 0, 1'], ['JMP 0']]
+    assert export_battle(warriors, str(tmp_path / 'frames'), 250, every=100, cell_size=2, spacing=0) == 4
+    assert len(list((tmp_path / 'frames').glob('*.png'))) == 4
+    assert export_battle(warriors, str(tmp_path / 'battle.gif'), 250, every=100, cell_size=2, spacing=0) == 4
+    assert len(read_frames(str(tmp_path / 'battle.gif'))) == 4
+
+
+def test_export_large_melee(tmp_path):
+    # more warriors than palette entries - the last ones reuse colours of the first ones
+    warriors = [['JMP 0']] * 300
+    mars = MARS()
+    mars.load_warriors(warriors)
+    mars.core.assign_colors()
+    renderer = FrameRenderer(mars, cell_size=2, spacing=0)
+    assert len(renderer.palette) == PALETTE_SIZE
+    by_index = {warrior.index: warrior for warrior in mars.core.turn_order}
+    for _ in range(300):
+        renderer.cycle()
+    assert renderer.frame().max() < PALETTE_SIZE
+    last = by_index[299]
+    pixel = renderer.rgb()[renderer._y[last.start_address], renderer._x[last.start_address]]
+    assert tuple(pixel) == by_index[299 - (PALETTE_SIZE - WARRIOR_COLOURS)].color
+    assert export_battle(warriors, str(tmp_path / 'melee.gif'), 500, every=250, cell_size=2, spacing=0) == 3
+    assert len(read_frames(str(tmp_path / 'melee.gif'))) == 3
+    assert export_battle(warriors, str(tmp_path / 'frames'), 500, every=250, cell_size=2, spacing=0) == 3
@@ -0,0 +1,72 @@
+import zlib
+import numpy as np
+from corewars.heatmap import Heatmap, READ, WRITE, EXECUTE
+from corewars.mars import MARS
+from corewars.parser import Parser
+from corewars.redcode import code_hash
+
+
+def run_dwarf(heatmap: Heatmap, address: int, cycles: int) -> str:
+    "Returns the dwarf's hash."
+    mars = MARS(heatmap)
+    with open('tests/warriors/dwarf.red') as file:
+        lines = file.readlines()
+    mars.load_warriors([lines], address)
+    for _ in range(cycles):
+        mars.cycle()
+    return code_hash(Parser.parse_warrior(lines))
+
+
+def test_counts_aligned_to_start_address():
+    heatmap = Heatmap()
+    # two rounds at different positions - counts should be summed up cell by cell
+    run_dwarf(heatmap, 0, 6)
+    dwarf = run_dwarf(heatmap, 7990, 6)
+    counts = heatmap.counts(dwarf)
+    # ADD, MOV, JMP executed twice per round
+    assert list(counts[EXECUTE][:4]) == [4, 4, 4, 0]
+    assert counts[EXECUTE].sum() == 12
+    # bombs dropped at +7 and +11 in each round
+    assert counts[WRITE][7] == 2
+    assert counts[WRITE][11] == 2
+    # ADD changing the DAT is the only other write - JMP doesn't write to the cell it points to
+    assert counts[WRITE][3] == 4
+    assert counts[WRITE].sum() == 8
+    # the DAT holding the bomb is read by every MOV
+    assert counts[READ][3] >= 4
+
+
+def test_export(tmp_path):
+    heatmap = Heatmap(flush_size=1)
+    dwarf = run_dwarf(heatmap, 100, 20)
+    keys = heatmap.save_npy(str(tmp_path / 'heatmap.npy'))
+    assert keys == [dwarf]
+    assert heatmap.names == {dwarf: 'Dwarf'}
+    saved = np.load(str(tmp_path / 'heatmap.npy'))
+    assert saved.shape == (1, 3, 8000)
+    assert (saved[0] == heatmap.counts(dwarf)).all()
+    heatmap.save_png(str(tmp_path / 'heatmap.png'), dwarf, scale=2)
+    data = (tmp_path / 'heatmap.png').read_bytes()
+    assert data.startswith(b'\x89PNG')
+    # decode the single IDAT chunk and make sure the executed cells are blue
+    idat = data.index(b'IDAT')
+    length = int.from_bytes(data[idat - 4:idat], 'big')
+    pixels = zlib.decompress(data[idat + 4:idat + 4 + length])
+    width = 100 * 2 * 3 + 1
+    assert len(pixels) == 80 * 2 * width
+    assert pixels[1 + 2] == 255
+
+
+def test_unnamed_warriors_counted_separately():
+    heatmap = Heatmap()
+    mars = MARS(heatmap)
+    warriors = [['JMP 0'], ['MOV 0, 1']]
+    mars.load_warriors(warriors, 0)
+    for _ in range(10):
+        mars.cycle()
+    jump, imp = [code_hash(Parser.parse_warrior(lines)) for lines in warriors]
+    assert heatmap.names == {jump: 'Warrior', imp: 'Warrior'}
+    assert heatmap.counts(jump)[EXECUTE][0] == 5
+    assert heatmap.counts(jump)[WRITE].sum() == 0
+    assert list(heatmap.counts(imp)[EXECUTE][:5]) == [1] * 5
+    assert list(heatmap.counts(imp)[WRITE][1:6]) == [1] * 5
@@ -0,0 +1,46 @@
+import pytest
+from corewars.mars import MARS
+from corewars.parser import Parser
+
+pygame = pytest.importorskip('pygame')
+from main import BASE_CELL_COLOUR, CELL_SIZE, CoreCanvas, get_position
+
+
+def colour_at(screen, address: int, size: int, offset: int = CELL_SIZE // 2):
+    x, y = get_position(address, size)
+    return tuple(screen.get_at((x + offset, y + offset)))[:3]
+
+
+def step(mars: MARS, canvas: CoreCanvas):
+    "A single cycle painted like the viewer does."
+    warrior = mars.core.current_warrior
+    pointer = warrior.current_pointer
+    canvas.begin_cycle()
+    canvas.paint(pointer, warrior.color, False)
+    for address in mars.cycle():
+        if address % mars.core.size != pointer:
+            canvas.paint(address, warrior.color, True)
+
+
+def test_undo_restores_owner_colours():
+    mars = MARS(undo_capacity=100)
+    # the imp overwrites the other warrior's code
+    imp = mars.core.load_warrior(Parser.parse_warrior(['MOV 0, 1']), 0)
+    other = mars.core.load_warrior(Parser.parse_warrior(['MOV 0, 2', 'JMP -1']), 8)
+    imp.color, other.color = (200, 0, 0), (0, 0, 200)
+    screen = pygame.Surface((1300, 1000))
+    canvas = CoreCanvas(screen, mars.core.size)
+    canvas.draw_all()
+    states = []
+    for _ in range(24):
+        states.append(list(canvas.cells))
+        step(mars, canvas)
+    assert colour_at(screen, 0, mars.core.size) == imp.color
+    assert colour_at(screen, 8, mars.core.size) == other.color
+    # the other warrior runs into the imp's code and keeps moving forward as an imp
+    assert canvas.cells[12] == (other.color, True)
+    while mars.undo():
+        canvas.undo_cycle()
+        assert canvas.cells == states.pop()
+    assert not states
+    assert all(colour_at(screen, address, mars.core.size) == BASE_CELL_COLOUR for address in range(30))
@@ -1,3 +1,6 @@
+import asyncio
+import random
+import pytest
 from typing import List
 from corewars.redcode import OpCode
 from corewars.mars import MARS
@@ -56,6 +59,21 @@ def test_instruction_spl():
     assert mars.core.current_warrior.current_pointer == 0
 
 
+def test_instruction_compare_whole():
+    # SEQ.I / SNE.I compare whole instructions, SLT.I only values
+    cases = [
+        (['SEQ.I 2, 3', 'DAT 0, 0', 'MOV 1, 2', 'MOV 1, 2'], 2),
+        (['SEQ.I 2, 3', 'DAT 0, 0', 'MOV 1, 2', 'MOV.AB 1, 2'], 1),
+        (['SNE.I 2, 3', 'DAT 0, 0', 'MOV 1, 2', 'MOV 1, 2'], 1),
+        (['SNE.I 2, 3', 'DAT 0, 0', 'MOV 1, 2', 'MOV 1, #2'], 2),
+        (['SLT.I 2, 3', 'DAT 0, 0', 'DAT 1, 2', 'MOV 2, 3'], 2),
+    ]
+    for data, pointer in cases:
+        mars = get_mars_with_warrior(data)
+        mars.cycle()
+        assert mars.core.current_warrior.current_pointer == pointer, data
+
+
 def test_imp():
     with open('tests/warriors/imp.red') as file:
         imp = file.readlines()
@@ -81,3 +99,157 @@ def test_dwarf():
     assert mars.core[ADDRESS + 3].b_value == 8
     mars.cycle()
     assert mars.core[ADDRESS + 11] == mars.core[ADDRESS + 3]
+
+
+def test_run_round():
+    with open('tests/warriors/imp.red') as file:
+        imp = file.readlines()
+    with open('tests/warriors/dwarf.red') as file:
+        dwarf = file.readlines()
+    mars = MARS()
+    mars.load_warriors([dwarf, imp])
+    result = mars.run(1000)
+    assert result.cycles <= 1000
+    assert [warrior.index for warrior in result.warriors] == [0, 1]
+    assert result.warriors[0].name == 'Dwarf'
+    if result.winner is None:
+        assert result.cycles == 1000
+    else:
+        assert result.cycles == max(warrior.death_cycle or 0 for warrior in result.warriors)
+
+
+def test_load_warriors_min_distance():
+    with open('tests/warriors/dwarf.red') as file:
+        dwarf = file.readlines()
+    mars = MARS()
+    mars.load_warriors([dwarf] * 400, 0)
+    starts = sorted(warrior.start_address for warrior in mars.core.warriors)
+    gaps = [b - a for a, b in zip(starts, starts[1:])] + [starts[0] + mars.core.size - starts[-1]]
+    assert min(gaps) >= 4
+    # 20 cells per warrior is too tight for min_distance of 25
+    with pytest.raises(ValueError):
+        MARS().load_warriors([dwarf] * 400, 0, min_distance=25)
+
+
+def test_melee():
+    with open('tests/warriors/imp.red') as file:
+        imp = file.readlines()
+    with open('tests/warriors/dwarf.red') as file:
+        dwarf = file.readlines()
+    mars = MARS()
+    mars.load_warriors([dwarf, imp] * 100)
+    result = mars.run(20000)
+    assert len(result.warriors) == 200
+    assert mars.core.warriors_count + len(mars.core.dead_warriors) == 200
+
+
+def test_reset_matches_new_simulator():
+    with open('tests/warriors/dwarf.red') as file:
+        dwarf = file.readlines()
+    with open('tests/warriors/imp.red') as file:
+        imp = file.readlines()
+    mars = MARS(undo_capacity=10)
+    mars.load_warriors([dwarf, imp], 0)
+    mars.run(3000)
+    mars.reset()
+    assert mars.cycles == 0 and len(mars.undo_log) == 0
+    # same placement in both
+    random.seed(1)
+    mars.load_warriors([imp, dwarf], 4000)
+    fresh = MARS()
+    random.seed(1)
+    fresh.load_warriors([imp, dwarf], 4000)
+    for _ in range(500):
+        mars.cycle()
+        fresh.cycle()
+    assert [str(cell) for cell in mars.core] == [str(cell) for cell in fresh.core]
+    assert [w.processes for w in mars.core.turn_order] == [w.processes for w in fresh.core.turn_order]
+
+
+def test_run_async_concurrently():
+    with open('tests/warriors/imp.red') as file:
+        imp = file.readlines()
+    battles = []
+    for _ in range(5):
+        mars = MARS()
+        mars.load_warriors([imp, imp])
+        battles.append(mars)
+    slices = []
+
+    async def watch():
+        # runs in between the slices of the battles
+        while len(slices) < 10:
+            slices.append(battles[0].cycles)
+            await asyncio.sleep(0)
+
+    async def main():
+        return await asyncio.gather(watch(), *(mars.run_async(2000, slice_cycles=100) for mars in battles))
+
+    _, *results = asyncio.run(main())
+    assert all(result.cycles == 2000 and result.winner is None for result in results)
+    # the battle has been interrupted every 100 cycles
+    assert slices[1:4] == [100, 200, 300]
+
+
+def test_run_async_timeout_and_cancel():
+    async def main():
+        mars = MARS()
+        mars.load_warriors([['JMP 0'], ['JMP 0']])
+        with pytest.raises(asyncio.TimeoutError):
+            await mars.run_async(10 ** 9, slice_cycles=10, timeout=0.05)
+        assert 0 < mars.cycles < 10 ** 9
+        # the simulation can still be continued
+        cycles = mars.cycles
+        assert (await mars.run_async(cycles + 10)).cycles == cycles + 10
+        task = asyncio.ensure_future(mars.run_async(10 ** 9, slice_cycles=10))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+
+def test_run_async_invalid_arguments():
+    async def main():
+        mars = MARS()
+        mars.load_warriors([['JMP 0'], ['JMP 0']])
+        for max_cycles, slice_cycles in ((100, 0), (100, -5), (0, 10), (-1, 10)):
+            with pytest.raises(ValueError):
+                await mars.run_async(max_cycles, slice_cycles)
+        assert mars.cycles == 0
+
+    asyncio.run(main())
+
+
+def test_results_kept_across_rounds():
+    mars = MARS()
+    mars.load_warriors([['JMP 0'], ['DAT 0, 0']], 0)
+    first = mars.run(100)
+    before = [(warrior.index, warrior.death_cycle, warrior.start_address) for warrior in first.warriors]
+    assert first.winner is first.warriors[0]
+    # the second round reuses the CoreWarriors of the first one, results mustn't change
+    mars.reset()
+    mars.load_warriors([['DAT 0, 0'], ['JMP 0']], 4000)
+    second = mars.run(100)
+    assert [(warrior.index, warrior.death_cycle, warrior.start_address) for warrior in first.warriors] == before
+    assert first.winner.index == 0 and second.winner.index == 1
+
+
+def test_seeded_placement():
+    warriors = [['MOV 0, 1'], ['DAT 0, 0'], ['JMP 0']]
+    state = random.getstate()
+    placements = []
+    for mars in (MARS(seed=5), MARS(rng=random.Random(5))):
+        mars.load_warriors(warriors)
+        placements.append([(w.index, w.start_address) for w in mars.core.turn_order])
+    assert placements[0] == placements[1]
+    # a round replayed from its seed is placed the same way
+    mars.reset(7)
+    mars.load_warriors(warriors)
+    first = [(w.index, w.start_address) for w in mars.core.turn_order]
+    mars.reset(7)
+    mars.load_warriors(warriors)
+    assert [(w.index, w.start_address) for w in mars.core.turn_order] == first
+    # the global random module is left alone
+    assert random.getstate() == state
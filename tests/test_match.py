@@ -0,0 +1,36 @@
+from corewars.match import run_match, wilson_interval
+
+
+def test_wilson_interval():
+    lower, upper = wilson_interval(10, 10, 0.99)
+    assert 0.5 < lower < 1 and upper == 1
+    lower, upper = wilson_interval(50, 100, 0.95)
+    assert abs(lower - (1 - upper)) < 1e-9
+    assert wilson_interval(0, 0, 0.95) == (0.0, 1.0)
+
+
+def test_lopsided_match_stops_early():
+    imp = ['MOV 0, 1']
+    suicide = ['DAT 0, 0']
+    result = run_match(imp, suicide, max_cycles=100)
+    assert result.decided
+    assert result.losses == result.ties == 0
+    assert result.rounds < 20
+    result = run_match(suicide, imp, max_cycles=100)
+    assert result.decided and result.wins == 0
+
+
+def test_even_match_hits_cap():
+    # two imps never kill each other - every round is a tie
+    imp = ['MOV 0, 1']
+    result = run_match(imp, imp, max_rounds=5, batch_size=2, max_cycles=50)
+    assert not result.decided
+    assert result.ties == result.rounds == 5
+    assert result.score == 0.5
+
+
+def test_seeded_match_is_reproducible():
+    dwarf = open('warriors/dwarf.red').readlines()
+    mice = open('warriors/mice.red').readlines()
+    results = [run_match(dwarf, mice, max_rounds=6, max_cycles=2000, seed=3) for _ in range(2)]
+    assert results[0] == results[1]
@@ -0,0 +1,41 @@
+import glob
+from corewars.core import Core, CoreWarrior
+from corewars.memory import bytes_per_battle
+from corewars.pool import MARSPool
+
+
+def load_sources():
+    return [open(path).readlines() for path in sorted(glob.glob('warriors/*.red'))]
+
+
+def test_battle_budget():
+    sources = load_sources()
+    # an 8000-cell core with both warriors loaded, before and after they've spread around
+    assert bytes_per_battle(sources, battles=20, cycles=0) < 100_000
+    assert bytes_per_battle(sources, battles=20, cycles=1000) < 300_000
+    pool = MARSPool()
+    bytes_per_battle(sources, battles=20, cycles=0, pool=pool)
+    assert bytes_per_battle(sources, battles=20, cycles=0, pool=pool) < 20_000
+
+
+def test_no_instance_dicts():
+    core = Core(10)
+    assert not hasattr(core[0], '__dict__')
+    assert not hasattr(CoreWarrior(core, 'test', 0), '__dict__')
+
+
+def test_pool_reuses_simulators():
+    sources = load_sources()
+    pool = MARSPool(max_idle=1)
+    with pool.battle() as mars:
+        mars.load_warriors(sources[:2])
+        mars.run(100)
+    assert len(pool) == 1
+    with pool.battle() as reused:
+        assert reused is mars
+        assert reused.cycles == 0 and reused.core.warriors_count == 0
+        other = pool.acquire()
+        assert other is not mars
+        pool.release(other)
+    # only one is kept
+    assert len(pool) == 1
@@ -0,0 +1,19 @@
+import pstats
+from corewars.profiling import folded_stacks, format_summary, profile_rounds, top_functions
+
+
+def test_profile_rounds(tmp_path):
+    warriors = [open('warriors/dwarf.red').readlines(), open('warriors/imp.red').readlines()]
+    path = str(tmp_path / 'profiles' / 'round')
+    stats = profile_rounds(warriors, path, rounds=2, max_cycles=500)
+    assert pstats.Stats(f'{path}.pstats').total_calls == stats.total_calls
+    names = [entry[0] for entry in top_functions(stats)]
+    assert any(name.startswith('cycle (mars.py') for name in names)
+    assert 'cycle (mars.py' in format_summary(stats)
+    with open(f'{path}.folded') as file:
+        lines = file.read().splitlines()
+    assert lines == folded_stacks(stats)
+    # the own time of every function is split between its stacks, none gets lost
+    total = sum(int(line.rsplit(' ', 1)[1]) for line in lines)
+    assert abs(total / 1e6 - stats.total_tt) < 0.01 * stats.total_tt + 1e-3
+    assert any(line.startswith('run (mars.py') and ';cycle (mars.py' in line for line in lines)
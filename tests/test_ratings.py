@@ -0,0 +1,95 @@
+import pytest
+from corewars.mars import MARS
+from corewars.parser import Parser
+from corewars.ratings import Elo, RatingEngine
+from corewars.redcode import code_hash
+
+
+def test_ratings_follow_results():
+    engine = RatingEngine()
+    for _ in range(20):
+        engine.add_result('strong', 'weak', 1)
+        engine.add_result('weak', 'average', 0.5)
+    ranking = [warrior for warrior, _ in engine.leaderboard()]
+    assert ranking[0] == 'strong'
+    assert engine.rating('strong').games == 20
+    assert engine.record('weak', 'strong') == (0, 20, 0)
+    assert engine.record('average', 'weak') == (0, 0, 20)
+    # repeated games make the rating more certain
+    assert engine.rating('weak').deviation < 100
+
+
+def test_elo_is_zero_sum():
+    engine = RatingEngine(Elo())
+    engine.add_result('a', 'b', 1)
+    engine.add_result('b', 'c', 0)
+    total = sum(rating.value for _, rating in engine.leaderboard())
+    assert round(total) == 3 * 1500
+
+
+def test_sparse_pairings():
+    engine = RatingEngine()
+    for i in range(1000):
+        engine.add_warrior(i)
+    engine.add_result(1, 2, 1)
+    assert engine.opponents(1) == {2}
+    assert len(engine._pairings) == 1
+    pairings = engine.next_pairings(50, window=4)
+    assert len(pairings) == 50
+    assert len(set(pairings)) == 50
+    # the one pair which already played is the least informative one
+    assert (1, 2) not in pairings and (2, 1) not in pairings
+
+
+def test_consume_round_results():
+    with open('tests/warriors/imp.red') as file:
+        imp = file.readlines()
+    with open('tests/warriors/dwarf.red') as file:
+        dwarf = file.readlines()
+    engine = RatingEngine()
+    for _ in range(3):
+        mars = MARS()
+        mars.load_warriors([dwarf, imp])
+        engine.consume(mars.run(2000))
+    dwarf, imp = code_hash(Parser.parse_warrior(dwarf)), code_hash(Parser.parse_warrior(imp))
+    wins, losses, ties = engine.record(dwarf, imp)
+    assert wins + losses + ties == 3
+
+
+def test_warriors_are_told_apart_by_code():
+    engine = RatingEngine()
+    # mirror match - no games at all
+    mars = MARS()
+    mars.load_warriors([['JMP 0'], ['JMP 0']])
+    engine.consume(mars.run(100))
+    assert engine.leaderboard() == []
+    # unnamed warriors with different code
+    warriors = [['MOV 0, 1'], ['DAT 0, 0'], ['MOV 0, 1']]
+    mars = MARS()
+    mars.load_warriors(warriors)
+    engine.consume(mars.run(100))
+    imp, suicide = (code_hash(Parser.parse_warrior(lines)) for lines in warriors[:2])
+    assert engine.record(imp, suicide) == (2, 0, 0)
+    assert engine.opponents(imp) == {suicide}
+    with pytest.raises(ValueError):
+        engine.add_result(imp, imp, 1)
+
+
+class Entrant():
+    "Key with the same representation for all instances."
+    def __repr__(self):
+        return 'Entrant'
+
+
+def test_pairs_of_any_keys():
+    engine = RatingEngine()
+    first, second = Entrant(), Entrant()
+    engine.add_result(first, second, 1)
+    engine.add_result(second, first, 0.5)
+    assert engine.record(first, second) == (1, 0, 1)
+    assert len(engine._pairings) == 1
+    # keys of different types
+    engine.add_result(1, 'a', 0)
+    engine.add_result('a', 1, 0)
+    assert engine.record(1, 'a') == (1, 1, 0)
+    assert engine._pair('b', 'a') == engine._pair('a', 'b') == ('a', 'b')
@@ -0,0 +1,38 @@
+import pytest
+from corewars.parser import Parser
+from corewars.redcode import (
+    AddressingMode, Instruction, Modifier, OpCode, code_hash, pack_instruction, pack_warrior,
+    unpack_instruction, unpack_warrior
+)
+
+
+def test_pack_round_trip():
+    for op_code in OpCode:
+        for modifier in Modifier:
+            for a_mode, b_mode in zip(AddressingMode, reversed(list(AddressingMode))):
+                for a_value, b_value in ((0, 0), (-1, 7999), (-2 ** 23, 2 ** 23 - 1)):
+                    instruction = Instruction(op_code, modifier, a_value, a_mode, b_value, b_mode)
+                    assert unpack_instruction(pack_instruction(instruction)) == instruction
+
+
+def test_packed_equality():
+    instruction = Instruction(OpCode.MOV, Modifier.I, 0, AddressingMode.DIRECT, 1, AddressingMode.DIRECT)
+    other = Instruction(OpCode.MOV, Modifier.I, 0, AddressingMode.DIRECT, 1, AddressingMode.DIRECT)
+    assert pack_instruction(instruction) == pack_instruction(other)
+    other.b_mode = AddressingMode.B_INDIRECT
+    assert pack_instruction(instruction) != pack_instruction(other)
+    assert 0 <= pack_instruction(other) < 2 ** 64
+    with pytest.raises(ValueError):
+        pack_instruction(Instruction(OpCode.DAT, Modifier.F, 2 ** 23, AddressingMode.DIRECT, 0,
+                                     AddressingMode.DIRECT))
+
+
+def test_pack_warrior():
+    warrior = Parser.parse_warrior([';name Dwarf', 'ADD #4, 3', 'MOV 2, @2', 'JMP -2', 'DAT #0, #0'])
+    data = pack_warrior(warrior)
+    assert len(data) == 4 * 8
+    assert unpack_warrior(data, 'Dwarf') == warrior
+    # formatting, comments and default modifiers don't matter
+    same = Parser.parse_warrior(['ADD.AB #4, $3 ; step', 'MOV.I $2, @2', 'JMP -2', 'DAT.F #0, #0'])
+    assert code_hash(same) == code_hash(warrior)
+    assert code_hash(Parser.parse_warrior(['JMP 0'])) != code_hash(warrior)
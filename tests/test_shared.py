@@ -0,0 +1,53 @@
+from multiprocessing import get_context
+import pytest
+from corewars.redcode import AddressingMode, Instruction, Modifier, OpCode
+from corewars.core import Core
+from corewars.mars import MARS
+from corewars.shared import SharedCoreView
+
+
+def read_cell(name: str, address: int) -> str:
+    with SharedCoreView(name) as view:
+        return str(view[address])
+
+
+def test_view_follows_core():
+    core = Core(100, shared=True)
+    try:
+        with SharedCoreView(core.shared_memory_name) as view:
+            assert view.size == 100
+            assert view[5] == Instruction(OpCode.DAT, Modifier.F, 0, AddressingMode('$'), 0, AddressingMode('$'))
+            core[5].op_code = OpCode.MOV
+            core[5].b_value = -1
+            assert view[5].op_code == OpCode.MOV
+            # values are normalized before being stored
+            assert view.b_values[5] == 99
+            core[7] = Instruction(OpCode.SPL, Modifier.B, 2, AddressingMode('@'), 3, AddressingMode('<'))
+            assert str(view[107]) == 'SPL.B @2, <3'
+    finally:
+        core.close()
+
+
+def test_view_is_read_only():
+    core = Core(10, shared=True)
+    try:
+        with SharedCoreView(core.shared_memory_name) as view:
+            with pytest.raises(TypeError):
+                view.a_values[0] = 1
+    finally:
+        core.close()
+
+
+def test_shared_simulation():
+    mars = MARS(shared=True)
+    with open('tests/warriors/dwarf.red') as file:
+        mars.load_warriors([file.readlines()], 0)
+    try:
+        for _ in range(5):
+            mars.cycle()
+        # observed from a separate process
+        with get_context('spawn').Pool(1) as pool:
+            assert pool.apply(read_cell, (mars.core.shared_memory_name, 11)) == str(mars.core[11])
+        assert str(mars.core[11]) == 'DAT.F #0, #8'
+    finally:
+        mars.core.close()
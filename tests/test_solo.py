@@ -0,0 +1,52 @@
+import glob
+from corewars.conformance import ConformanceHarness
+from corewars.heatmap import Heatmap
+from corewars.match import run_match
+from corewars.mars import MARS
+from corewars.parser import Parser
+from corewars.solo import SoloCache, SoloMARS, position_sweep
+
+
+def load_sources():
+    return [open(path).readlines() for path in sorted(glob.glob('warriors/*.red'))]
+
+
+def test_matches_reference():
+    cache = SoloCache()
+    harness = ConformanceHarness(lambda: SoloMARS(cache=cache), checkpoint_interval=400)
+    corpus = [Parser.parse_warrior(lines) for lines in load_sources()]
+    for warriors in (1, 2, 3):
+        assert harness.fuzz(rounds=4, seed=warriors, max_cycles=1200, warriors_per_round=warriors,
+                            corpus=corpus) == []
+
+
+def test_sweep_same_as_mars():
+    dwarf_lines, imp_lines = ['ADD #4, 3', 'MOV 2, @2', 'JMP -2', 'DAT 0, 0'], ['MOV 0, 1']
+    dwarf, imp = Parser.parse_warrior(dwarf_lines), Parser.parse_warrior(imp_lines)
+    offsets = [100, 2000, 4000, 7990]
+    expected = []
+    mars = MARS()
+    for offset in offsets:
+        mars.reset()
+        mars.core.load_warrior(dwarf, 0).index = 0
+        mars.core.load_warrior(imp, offset).index = 1
+        result = mars.run(3000)
+        expected.append((offset, result.winner and result.winner.index, result.cycles))
+    cache = SoloCache()
+    assert position_sweep(dwarf_lines, imp_lines, offsets, 3000, cache) == expected
+    assert len(cache) == 2
+
+
+def test_trajectories_reused_by_rounds():
+    sources = load_sources()
+    mars = SoloMARS()
+    result = run_match(sources[0], sources[1], max_rounds=4, max_cycles=2000, mars_factory=lambda: mars)
+    assert result.rounds == 4
+    assert len(mars.cache) == 2
+
+
+def test_same_arguments_as_mars():
+    heatmap = Heatmap()
+    mars = SoloMARS(heatmap, None, 512, seed=3)
+    assert mars.heatmap is heatmap and isinstance(mars.cache, SoloCache)
+    assert mars.timeline_capacity == 512
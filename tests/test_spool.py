@@ -0,0 +1,128 @@
+import os
+from corewars.battlelog import BattleLog
+from corewars.spool import (
+    claim_job, create_jobs, log_results, merge_results, requeue_stale, run_job, run_worker, status, warrior_hash
+)
+
+
+def write_warriors(tmp_path):
+    imp = tmp_path / 'imp.red'
+    imp.write_text(';name Imp\nMOV 0, 1\n')
+    suicide = tmp_path / 'suicide.red'
+    suicide.write_text(';name Suicide\nDAT 0, 0\n')
+    return [str(imp), str(suicide)]
+
+
+def claimed_path(spool, job):
+    return os.path.join(spool, 'claimed', f'{job["id"]}.{job["claim"]}.json')
+
+
+def test_warrior_hash_ignores_whitespace():
+    assert warrior_hash(['MOV 0, 1\n', '\n']) == warrior_hash(['  MOV 0, 1'])
+    assert warrior_hash(['MOV 0, 1']) != warrior_hash(['MOV 0, 2'])
+
+
+def test_jobs_are_claimed_once_and_merged(tmp_path):
+    spool = str(tmp_path / 'spool')
+    assert create_jobs(spool, write_warriors(tmp_path), rounds=5, rounds_per_job=2, max_cycles=100) == 3
+    job = claim_job(spool)
+    assert status(spool) == {'pending': 2, 'claimed': 1, 'done': 0}
+    run_job(spool, job)
+    # two workers sharing the rest
+    assert run_worker(spool, 'a', max_jobs=1) + run_worker(spool, 'b') == 2
+    assert claim_job(spool) is None
+    assert status(spool) == {'pending': 0, 'claimed': 0, 'done': 3}
+    table = merge_results(spool)
+    assert [entry['name'] for entry in table] == ['Imp', 'Suicide']
+    assert table[0]['wins'] == table[1]['losses'] == 5
+    assert table[0]['score'] == 15
+
+
+def test_jobs_added_to_existing_spool(tmp_path):
+    spool = str(tmp_path / 'spool')
+    warriors = write_warriors(tmp_path)
+    create_jobs(spool, warriors, rounds=4, rounds_per_job=2, max_cycles=100)
+    run_job(spool, claim_job(spool))
+    claim_job(spool)
+    assert create_jobs(spool, warriors, rounds=2, rounds_per_job=1, max_cycles=100) == 2
+    assert status(spool) == {'pending': 2, 'claimed': 1, 'done': 1}
+    assert sorted(os.listdir(os.path.join(spool, 'pending'))) == ['job-000002.json', 'job-000003.json']
+
+
+def test_seeds_are_deterministic(tmp_path):
+    warriors = write_warriors(tmp_path)
+    create_jobs(str(tmp_path / 'a'), warriors, rounds=3, seed=7)
+    create_jobs(str(tmp_path / 'b'), warriors, rounds=3, seed=7)
+    create_jobs(str(tmp_path / 'c'), warriors, rounds=3, seed=8)
+    jobs = [claim_job(str(tmp_path / spool)) for spool in 'abc']
+    assert jobs[0]['seeds'] == jobs[1]['seeds'] != jobs[2]['seeds']
+    assert len(set(jobs[0]['seeds'])) == 3
+
+
+def test_stale_claims_are_requeued(tmp_path):
+    spool = str(tmp_path / 'spool')
+    create_jobs(spool, write_warriors(tmp_path), rounds=2, rounds_per_job=1, max_cycles=100)
+    crashed = claim_job(spool)
+    finished_late = claim_job(spool)
+    run_job(spool, finished_late)
+    # worker crashed after writing results, before moving its claim
+    os.rename(os.path.join(spool, 'done', f'{finished_late["id"]}.json'), claimed_path(spool, finished_late))
+    assert requeue_stale(spool, timeout=60) == []
+    old = os.path.getmtime(claimed_path(spool, crashed)) - 120
+    for job in (crashed, finished_late):
+        os.utime(claimed_path(spool, job), (old, old))
+    assert requeue_stale(spool, timeout=60) == [crashed['id']]
+    assert status(spool) == {'pending': 1, 'claimed': 0, 'done': 1}
+    assert run_worker(spool) == 1
+    assert sum(entry['wins'] + entry['ties'] for entry in merge_results(spool)) == 2
+
+
+def test_fresh_claims_are_not_requeued(tmp_path):
+    spool = str(tmp_path / 'spool')
+    create_jobs(spool, write_warriors(tmp_path), rounds=1, max_cycles=100)
+    # created long before it's claimed
+    pending = os.path.join(spool, 'pending', 'job-000000.json')
+    os.utime(pending, (0, 0))
+    job = claim_job(spool)
+    assert requeue_stale(spool, timeout=60) == []
+    assert run_job(spool, job) is not None
+
+
+def test_lost_claims_are_abandoned(tmp_path):
+    spool = str(tmp_path / 'spool')
+    create_jobs(spool, write_warriors(tmp_path), rounds=2, rounds_per_job=1, max_cycles=100)
+    job = claim_job(spool)
+    # the worker looked dead for a moment
+    assert requeue_stale(spool, timeout=0) == [job['id']]
+    assert run_job(spool, job) is None
+    assert not os.path.exists(os.path.join(spool, 'results', f'{job["id"]}.json'))
+    assert status(spool) == {'pending': 2, 'claimed': 0, 'done': 0}
+    assert run_worker(spool) == 2
+    assert status(spool) == {'pending': 0, 'claimed': 0, 'done': 2}
+
+
+def test_requeued_claims_taken_again_are_abandoned(tmp_path):
+    spool = str(tmp_path / 'spool')
+    create_jobs(spool, write_warriors(tmp_path), rounds=1, max_cycles=100)
+    slow = claim_job(spool, 'slow')
+    assert requeue_stale(spool, timeout=0) == [slow['id']]
+    fast = claim_job(spool, 'fast')
+    assert fast['id'] == slow['id'] and fast['claim'] != slow['claim']
+    # the slow worker mustn't keep running (or finish) the job claimed by the fast one
+    assert run_job(spool, slow, 'slow') is None
+    assert status(spool) == {'pending': 0, 'claimed': 1, 'done': 0}
+    assert run_job(spool, fast, 'fast')['worker'] == 'fast'
+    assert status(spool) == {'pending': 0, 'claimed': 0, 'done': 1}
+
+
+def test_results_are_logged(tmp_path):
+    spool = str(tmp_path / 'spool')
+    create_jobs(spool, write_warriors(tmp_path), rounds=3, max_cycles=100)
+    run_worker(spool)
+    log = BattleLog(str(tmp_path / 'log'))
+    assert log_results(spool, log) == 3
+    imp, suicide = warrior_hash(['MOV 0, 1']), warrior_hash(['DAT 0, 0'])
+    assert len(log.query(imp, suicide, winner=imp)['seed']) == 3
+    # nothing is logged twice
+    assert log_results(spool, log) == 0
+    assert len(BattleLog(str(tmp_path / 'log'))) == 3
@@ -0,0 +1,79 @@
+import curses
+import pytest
+from terminal import CURSOR_CELL, EMPTY_CELL, SIDEBAR_WIDTH, WRITTEN_CELL, TerminalView
+
+
+class StubWindow():
+    "Stands in for a curses window, keeping the characters drawn at each position."
+    def __init__(self, rows: int, columns: int):
+        self.rows, self.columns = rows, columns
+        self.chars = {}
+
+
+    def getmaxyx(self):
+        return self.rows, self.columns
+
+
+    def addstr(self, row: int, column: int, text: str, attr: int):
+        if row >= self.rows or column + len(text) > self.columns:
+            raise curses.error
+        for i, char in enumerate(text):
+            self.chars[row, column + i] = char
+
+
+    def clear(self):
+        self.chars = {}
+
+
+    def nodelay(self, flag: bool):
+        pass
+
+
+    def refresh(self):
+        pass
+
+
+@pytest.fixture
+def headless(monkeypatch):
+    # curses itself needs a real terminal
+    monkeypatch.setattr(curses, 'curs_set', lambda visibility: None)
+    monkeypatch.setattr(curses, 'has_colors', lambda: False)
+    monkeypatch.setattr(curses, 'color_pair', lambda pair: pair << 8)
+
+
+def shown_owners(view: TerminalView, screen: StubWindow):
+    "Returns the owner of each character drawn as written to, by the first cell it stands for."
+    owners = {}
+    for char in range(len(view.owners)):
+        symbol = screen.chars.get((char // view.width, char % view.width))
+        assert symbol in (EMPTY_CELL, WRITTEN_CELL, CURSOR_CELL)
+        if symbol == WRITTEN_CELL:
+            owners[char * view.cells_per_char] = view.owners[char]
+    return owners
+
+
+def test_render_and_resize(headless):
+    warriors = [['ADD #4, 3', 'MOV 2, @2', 'JMP -2', 'DAT #0, #0'], ['MOV 0, 1']]
+    screen = StubWindow(30, 80)
+    view = TerminalView(screen, warriors, 1000, 20)
+    assert (view.width, view.height) == (80 - SIDEBAR_WIDTH - 1, 29)
+    assert view.cells_per_char == -(-8000 // (view.width * view.height))
+    for _ in range(300):
+        view.step()
+    view.draw()
+    assert ''.join(screen.chars[0, view.width + 1 + i] for i in range(9)) == 'CYCLE 300'
+    before = shown_owners(view, screen)
+    assert set(before.values()) == {1, 2}
+    # a bigger terminal shows every cell on its own - who wrote to them is kept
+    screen.rows, screen.columns = 100, 250
+    view.layout()
+    view.draw()
+    assert view.cells_per_char == 1
+    written = {cell: owner for cell, owner in enumerate(view.cell_owners) if owner}
+    cursor = view.mars.core.current_warrior.current_pointer
+    assert shown_owners(view, screen) == {cell: owner for cell, owner in written.items() if cell != cursor}
+    # and back, the same characters are drawn as before
+    screen.rows, screen.columns = 30, 80
+    view.layout()
+    view.draw()
+    assert shown_owners(view, screen) == before
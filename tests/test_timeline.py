@@ -0,0 +1,38 @@
+from corewars.mars import MARS
+from corewars.timeline import Timeline
+
+
+def test_ring_buffer_keeps_latest_samples():
+    mars = MARS(timeline_stride=1, timeline_capacity=4)
+    mars.load_warriors([['SPL 0', 'SPL 0']], 0)
+    timeline = mars.core.current_warrior.timeline
+    for _ in range(10):
+        mars.cycle()
+    assert len(timeline) == 4
+    assert list(timeline.cycles) == [7, 8, 9, 10]
+    changes = timeline.births - timeline.deaths
+    assert list(changes[1:]) == list(timeline.processes[1:] - timeline.processes[:-1])
+
+
+def test_stride_and_death():
+    mars = MARS(timeline_stride=3)
+    # dies after 3 cycles, first killing its second process
+    mars.load_warriors([['SPL 2', 'DAT 0, 0', 'NOP 0', 'DAT 0, 0']], 0)
+    result = mars.run(100)
+    warrior = result.warriors[0]
+    assert result.cycles == 4
+    assert warrior.death_cycle == 4
+    samples = warrior.timeline.to_dict()
+    # first turn, then every 3rd cycle and the death itself
+    assert list(samples['cycles']) == [1, 4]
+    assert list(samples['processes']) == [2, 0]
+    assert list(samples['deaths']) == [0, 2]
+    assert samples['regions'][-1] == -1
+
+
+def test_timeline_disabled_by_default():
+    mars = MARS()
+    mars.load_warriors([['JMP 0']], 0)
+    mars.run(10)
+    assert mars.core.current_warrior.timeline is None
+    assert len(Timeline()) == 0
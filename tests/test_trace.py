@@ -0,0 +1,70 @@
+import glob
+import random
+from corewars.conformance import ConformanceHarness
+from corewars.mars import MARS
+from corewars.parser import Parser
+from corewars.trace import TraceMARS
+
+
+def load_corpus():
+    return [Parser.parse_warrior(open(path).readlines()) for path in sorted(glob.glob('warriors/*.red'))]
+
+
+def test_matches_reference():
+    harness = ConformanceHarness(TraceMARS, checkpoint_interval=250)
+    corpus = load_corpus()
+    # alone (fused loops) and against others (single compiled instructions)
+    for warriors in (1, 2, 3):
+        assert harness.fuzz(rounds=5, seed=warriors, max_cycles=600, warriors_per_round=warriors,
+                            corpus=corpus) == []
+
+
+def test_self_modifying_loops():
+    harness = ConformanceHarness(TraceMARS, checkpoint_interval=100)
+    warriors = [
+        # ADD keeps changing the JMP of its own loop
+        ['ADD.AB #1, 1', 'JMP -1, 0'],
+        # the loop gets broken out of by its own decrements
+        ['DJN 0, #300', 'MOV 0, 1'],
+        # MOV.I overwrites the loop's first instruction
+        ['MOV.I 3, -1', 'ADD #1, -1', 'JMP -2', 'DAT 0, 0', 'JMP -1'],
+    ]
+    for data in warriors:
+        assert harness.compare([Parser.parse_warrior(data)], [7990], 600) is None
+
+
+def test_loops_get_fused():
+    with open('warriors/dwarf.red') as file:
+        dwarf = file.readlines()
+    mars = TraceMARS()
+    mars.load_warriors([dwarf])
+    result = mars.run(5000)
+    assert result.cycles == 5000
+    assert len(mars._traces) == 1
+
+
+def test_only_written_cells_get_reset():
+    with open('warriors/dwarf.red') as file:
+        dwarf = file.readlines()
+    mars = TraceMARS()
+    mars.load_warriors([dwarf], 0)
+    mars.run(400)
+    # the dwarf's code and one bomb per 3 cycles, not the whole core
+    assert len(mars.core._dirty) == 4 + 400 // 3
+    assert mars.core[403].b_value == 400
+    mars.reset()
+    assert not mars.core._dirty
+    assert all(cell is mars.core._blank for cell in mars.core._instructions)
+
+
+def test_same_results_as_mars():
+    corpus = [open(path).readlines() for path in sorted(glob.glob('warriors/*.red'))]
+    for seed in range(4):
+        results = []
+        for engine in (MARS, TraceMARS):
+            random.seed(seed)
+            mars = engine()
+            mars.load_warriors(random.sample(corpus, 2))
+            result = mars.run(3000)
+            results.append((result.cycles, result.winner and result.winner.index, [str(cell) for cell in mars.core]))
+        assert results[0] == results[1]
@@ -0,0 +1,50 @@
+from random import Random
+from corewars.conformance import random_warrior, snapshot
+from corewars.core import Core
+from corewars.mars import MARS
+
+
+def test_undo_restores_every_cycle():
+    rng = Random(5)
+    for _ in range(10):
+        mars = MARS(undo_capacity=300)
+        mars.core = Core(800)
+        for index in range(3):
+            mars.core.load_warrior(random_warrior(rng, mars.core.size, 10), rng.randrange(800)).index = index
+        states = [snapshot(mars)]
+        while mars.cycles < 300 and mars.core.warriors_count > 0:
+            mars.cycle()
+            states.append(snapshot(mars))
+        while states:
+            assert snapshot(mars) == states.pop()
+            mars.undo()
+        assert mars.cycles == 0
+
+
+def test_undo_log_is_bounded():
+    mars = MARS(undo_capacity=10)
+    mars.load_warriors([['SPL 0', 'MOV 0, 1']], 0)
+    for _ in range(50):
+        mars.cycle()
+    state = snapshot(mars)
+    for _ in range(10):
+        assert mars.undo()
+    assert mars.cycles == 40
+    assert not mars.undo()
+    # replaying gets us back to the same state
+    for _ in range(10):
+        mars.cycle()
+    assert snapshot(mars) == state
+
+
+def test_undo_revives_warrior():
+    mars = MARS(undo_capacity=5)
+    mars.load_warriors([['DAT 0, 0'], ['JMP 0']], 0)
+    mars.run()
+    assert mars.core.warriors_count == 1
+    dead = mars.core.dead_warriors[0]
+    mars.undo()
+    assert mars.core.warriors_count == 2
+    assert dead.death_cycle is None
+    assert mars.core.current_warrior is dead
+    assert not MARS().undo()